@@ -0,0 +1,52 @@
+"""测量import biosim的耗时和常驻内存
+
+每次在新的解释器中导入，取多次的中位数，同时列出导入后已加载的可视化和日志依赖以及是否已读取配置文件，
+这些都应在使用时才加载。
+
+    python benchmarks/startup.py --repeat 10
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+LAZY = ("cv2", "matplotlib", "loguru", "tqdm")
+
+PROBE = f"""
+import json, resource, sys, time
+start = time.perf_counter()
+import biosim
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "loaded": [name for name in {LAZY!r} if name in sys.modules],
+    "config_loaded": bool(biosim._config.get_config.cache_info().currsize),
+}}))
+"""
+
+
+def measure(repeat: int = 5) -> dict:
+    """在repeat个新进程中导入biosim，返回耗时和内存的中位数"""
+    runs = [
+        json.loads(subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, check=True).stdout)
+        for _ in range(repeat)
+    ]
+    return {
+        "import_seconds": statistics.median(run["seconds"] for run in runs),
+        "max_rss_mb": statistics.median(run["max_rss_kb"] for run in runs) / 1024,
+        "loaded": runs[0]["loaded"],
+        "config_loaded": runs[0]["config_loaded"],
+    }
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(measure(args.repeat), indent=2))
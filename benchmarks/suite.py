@@ -0,0 +1,373 @@
+"""基准测试：测量模拟各部分的吞吐量、延迟和峰值内存，结果写入JSON，并可比较两次结果以发现性能退化
+
+每个用例在新的进程中运行，峰值内存和缓存互不影响。指标名以_per_s结尾的和speedup越大越好，其余越小越好。
+
+    python benchmarks/suite.py run --sizes 128 512 --init-counts 500 5000 --seeds 1 --output base.json
+    python benchmarks/suite.py compare base.json new.json --threshold 0.1
+
+equilibrium用例比较使用和不使用食物密度场时到达稳定所需的模拟年数，例如
+
+    python benchmarks/suite.py run --only equilibrium --sizes 512 --init-counts 100 400 --repeat 4
+
+scaling用例测量tiled引擎的吞吐量随进程数的变化，分块固定，不同进程数的模拟结果相同，例如
+
+    python benchmarks/suite.py run --only scaling --sizes 2048 --init-counts 200000 --workers 1 2 4 8 --tiles 4 4
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+
+from biosim import Genome, World, config  # noqa: E402
+from biosim._coordinate import Coordinate  # noqa: E402
+from biosim._engine import scan as scan_many  # noqa: E402
+from biosim._genome import GenomePool, TraitDecoder  # noqa: E402
+from biosim._neighborhood import BLANK, FOOD, offset_table, scan  # noqa: E402
+
+
+def best(func: Callable[[], Any], repeat: int) -> float:
+    """运行repeat次，返回最短的耗时"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_world(engine: str, size: int, init_count: int, seed: int, years: int, repeat: int) -> dict[str, float]:
+    """World.step的吞吐量，object引擎的单个生物耗时即Creature.step的延迟"""
+    config.update({"world.width": size, "world.height": size, "world.init_count": init_count})
+    results = []
+    for _ in range(repeat):
+        config.set_seed(seed)
+        world = World(engine, headless=True)
+        world.run(2)  # 预热
+        start = time.perf_counter()
+        world.run(years)
+        elapsed = time.perf_counter() - start
+        steps = int(world.statistics["population"][-years:].sum())
+        world.close()
+        results.append((elapsed, steps))
+    elapsed, steps = min(results)
+    return {
+        "creature_steps_per_s": steps / elapsed,
+        "us_per_creature_step": elapsed / max(steps, 1) * 1e6,
+        "seconds_per_year": elapsed / years,
+    }
+
+
+def bench_scaling(
+    size: int, init_count: int, workers: int, tiles: list[int], seed: int, years: int, repeat: int
+) -> dict[str, float]:
+    """tiled引擎的吞吐量，speedup为相对同一分块下单进程的加速比
+
+    main_share为主进程占用的CPU时间与模拟用时之比，即不随进程数减少的串行部分的上限。
+    """
+    config.update(
+        {"world.width": size, "world.height": size, "world.init_count": init_count, "world.tiles": tuple(tiles)}
+    )
+    rates = {}
+    for count in sorted({1, workers}):
+        config.update({"world.workers": count})
+        results = []
+        for _ in range(repeat):
+            config.set_seed(seed)
+            world = World("tiled", headless=True)
+            world.run(2)  # 预热
+            start, cpu = time.perf_counter(), time.process_time()
+            world.run(years)
+            elapsed = time.perf_counter() - start
+            results.append((elapsed, int(world.statistics["population"][-years:].sum()), time.process_time() - cpu))
+            world.close()
+        elapsed, steps, cpu = min(results)
+        rates[count] = (steps / elapsed, elapsed / years, cpu / elapsed)
+    return {
+        "creature_steps_per_s": rates[workers][0],
+        "seconds_per_year": rates[workers][1],
+        "speedup": rates[workers][0] / rates[1][0],
+        "main_share": rates[workers][2],
+    }
+
+
+def equilibrium_years(foods: np.ndarray, window: int = 10) -> float:
+    """食物存量达到稳定所需的年数
+
+    种群随进化缓慢变化，因此以地图上的食物数量判断：其滑动平均达到峰值的年数，加上峰值之后超出最后1/5年份
+    平均水平的面积除以峰值超出的量，即按指数衰减时的时间常数。
+    """
+    average = np.convolve(foods, np.ones(window) / window, mode="valid")
+    peak = int(average.argmax())
+    final = average[-len(average) // 5 :].mean()
+    excess = average[peak] - final
+    return peak + window + (np.maximum(average[peak:] - final, 0).sum() / excess if excess > 0 else 0)
+
+
+def bench_equilibrium(
+    size: int, init_count: int, food_rate: float, food_field: int, seed: int, years: int, repeat: int
+) -> dict[str, float]:
+    """从初始状态到稳定所需的模拟年数，使用vector引擎，取seed开始的repeat个种子的平均值"""
+    config.update(
+        {
+            "world.width": size,
+            "world.height": size,
+            "world.init_count": init_count,
+            "world.food_rate": food_rate,
+            "world.food_field": food_field,
+        }
+    )
+    results = []
+    for i in range(repeat):
+        config.set_seed(seed + i)
+        world = World("vector", headless=True)
+        world.run(years)
+        statistics = world.statistics
+        results.append((equilibrium_years(statistics["foods"]), statistics["population"][-years // 5 :].mean()))
+        world.close()
+    equilibrium, population = np.mean(results, axis=0)
+    return {"years_to_equilibrium": float(equilibrium), "final_population": float(population)}
+
+
+def bench_refresh(size: int, seed: int, repeat: int) -> dict[str, float]:
+    """在空地图上刷新一次食物的耗时"""
+    config.update({"world.width": size, "world.height": size, "world.init_count": 0})
+    config.set_seed(seed)
+    world = World("vector", headless=True)
+    times = []
+    for _ in range(repeat):
+        world.assign(np.flatnonzero(np.asarray(world._map).reshape(-1) == FOOD), BLANK)
+        times.append(best(world.refresh_food, 1))
+    return {"seconds_per_refresh": min(times)}
+
+
+def bench_scan(size: int, perception: int, seed: int, repeat: int) -> dict[str, float]:
+    """邻域查询：逐个查询的次数和向量化扫描的格子数"""
+    rng = np.random.RandomState(seed)
+    _map = rng.choice([0, 1, 2], size=(size, size), p=[0.8, 0.1, 0.1]).astype(np.int8)
+    x, y = rng.randint(0, size, 4096), rng.randint(0, size, 4096)
+    centers = [Coordinate(int(i), int(j)) for i, j in zip(x[:1000], y[:1000])]
+    radius = np.full(len(x), perception)
+    offset_table(perception)
+    single = best(lambda: [scan(_map, center, perception) for center in centers], repeat)
+    many = best(lambda: scan_many(_map, x, y, radius), repeat)
+    return {
+        "queries_per_s": len(centers) / single,
+        "cells_per_s": len(x) * 4 * perception * (perception + 1) / many,
+    }
+
+
+def bench_genome(seed: int, repeat: int) -> dict[str, float]:
+    """Genome.traits解码和重组的速率，以及基因池整体解码和重组的速率"""
+    config.set_seed(seed)
+    genomes = [Genome() for _ in range(1000)]
+
+    def decode():
+        for genome in genomes:
+            genome._cache = None
+            genome.traits
+
+    pool = GenomePool(config.gene.base_num, 1 << 14)
+    words = np.random.randint(0, 1 << 62, (1 << 14, pool.words.shape[1])).astype(np.uint64)
+    rows = pool.allocate(words)
+    decoder = TraitDecoder.get(pool.base_num)
+    half = len(rows) // 2
+
+    def recombine_pool():
+        pool.release(pool.recombine(rows[:half], rows[half:]))
+
+    return {
+        "decodes_per_s": len(genomes) / best(decode, repeat),
+        "recombines_per_s": 500 / best(lambda: [a & b for a, b in zip(genomes[:500], genomes[500:])], repeat),
+        "pool_decodes_per_s": len(rows) / best(lambda: decoder.decode(pool.words[rows]), repeat),
+        "pool_recombines_per_s": half / best(recombine_pool, repeat),
+    }
+
+
+def bench_startup(repeat: int) -> dict[str, float]:
+    from startup import measure
+
+    result = measure(repeat)
+    return {"import_seconds": result["import_seconds"], "import_rss_mb": result["max_rss_mb"]}
+
+
+LARGER_IS_BETTER = ("_per_s", "speedup")  # 以这些结尾的指标越大越好
+
+BENCHMARKS: dict[str, Callable[..., dict[str, float]]] = {
+    "world": bench_world,
+    "equilibrium": bench_equilibrium,
+    "scaling": bench_scaling,
+    "refresh": bench_refresh,
+    "scan": bench_scan,
+    "genome": bench_genome,
+    "startup": bench_startup,
+}
+
+
+def cases(args) -> list[tuple[str, dict[str, Any]]]:
+    """按命令行参数展开所有用例"""
+    grids = {
+        "world": {"engine": args.engines, "size": args.sizes, "init_count": args.init_counts, "seed": args.seeds},
+        "equilibrium": {
+            "size": args.sizes,
+            "init_count": args.init_counts,
+            "food_rate": args.food_rates,
+            "food_field": args.food_fields,
+            "seed": args.seeds,
+        },
+        "scaling": {
+            "size": args.sizes,
+            "init_count": args.init_counts,
+            "workers": args.workers,
+            "tiles": [args.tiles],
+            "seed": args.seeds,
+        },
+        "refresh": {"size": args.sizes, "seed": args.seeds},
+        "scan": {"size": args.sizes, "perception": args.perceptions, "seed": args.seeds},
+        "genome": {"seed": args.seeds},
+        "startup": {},
+    }
+    result = []
+    for name in args.only or list(BENCHMARKS):
+        grid = grids[name]
+        for values in itertools.product(*grid.values()):
+            params = dict(zip(grid, values))
+            if name in ("world", "equilibrium", "scaling"):
+                if params["init_count"] >= params["size"] ** 2:
+                    continue
+                params["years"] = args.equilibrium_years if name == "equilibrium" else args.years
+            params["repeat"] = args.repeat
+            result.append((name, params))
+    return result
+
+
+def run_case(case: tuple[str, dict[str, Any]]) -> dict[str, Any]:
+    name, params = case
+    metrics = BENCHMARKS[name](**params)
+    metrics["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"name": name, "params": params, "metrics": metrics}
+
+
+def metadata() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": multiprocessing.cpu_count(),
+    }
+
+
+def run(args) -> dict[str, Any]:
+    results = []
+    # 每个用例使用新的进程，不使用守护进程，以便tiled引擎创建工作进程
+    for case in cases(args):
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = executor.submit(run_case, case).result()
+        metrics = {k: round(v, 4) for k, v in result["metrics"].items()}
+        print(result["name"], result["params"], metrics, file=sys.stderr)
+        results.append(result)
+    return {"meta": metadata(), "results": results}
+
+
+def compare(base: dict[str, Any], new: dict[str, Any], threshold: float = 0.1) -> list[dict[str, Any]]:
+    """比较两次结果中相同用例的指标，返回所有变化，变差超过threshold的标记为regression"""
+
+    def key(result: dict[str, Any]) -> tuple[str, str]:
+        # 重复次数不影响用例本身
+        params = {k: v for k, v in result["params"].items() if k != "repeat"}
+        return result["name"], json.dumps(params, sort_keys=True)
+
+    old = {key(result): result["metrics"] for result in base["results"]}
+    changes = []
+    for result in new["results"]:
+        before = old.get(key(result))
+        if before is None:
+            continue
+        for metric, value in result["metrics"].items():
+            if metric not in before or not before[metric]:
+                continue
+            change = value / before[metric] - 1
+            worse = -change if metric.endswith(LARGER_IS_BETTER) else change
+            changes.append(
+                {
+                    "name": result["name"],
+                    "params": result["params"],
+                    "metric": metric,
+                    "before": before[metric],
+                    "after": value,
+                    "change": change,
+                    "regression": worse > threshold,
+                }
+            )
+    return changes
+
+
+def main(argv: list[str] | None = None) -> int:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="运行基准测试")
+    run_parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="只运行指定的基准测试")
+    run_parser.add_argument("--engines", nargs="+", default=["object", "vector"])
+    run_parser.add_argument("--sizes", nargs="+", type=int, default=[128, 512])
+    run_parser.add_argument("--init-counts", nargs="+", type=int, default=[500, 5000])
+    run_parser.add_argument("--perceptions", nargs="+", type=int, default=[2, 5, 10])
+    run_parser.add_argument("--seeds", nargs="+", type=int, default=[1])
+    run_parser.add_argument("--years", type=int, default=10, help="每个世界计时的年数")
+    run_parser.add_argument("--food-rates", nargs="+", type=float, default=[0.002, 0.007])
+    run_parser.add_argument("--food-fields", nargs="+", type=int, default=[0, 16], help="食物密度场的块边长，0为不使用")
+    run_parser.add_argument("--equilibrium-years", type=int, default=250, help="测量稳定所需年数时模拟的年数")
+    run_parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4], help="tiled引擎的进程数")
+    run_parser.add_argument("--tiles", nargs=2, type=int, default=[4, 4], help="tiled引擎分块的行数和列数")
+    run_parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最好的一次")
+    run_parser.add_argument("--output", default=None, help="结果文件，默认输出到标准输出")
+    compare_parser = commands.add_parser("compare", help="比较两次结果")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="变差超过该比例时视为退化")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        text = json.dumps(run(args), indent=2)
+        if args.output:
+            Path(args.output).write_text(text, encoding="utf-8")
+        else:
+            print(text)
+        return 0
+
+    base, new = (json.loads(Path(path).read_text(encoding="utf-8")) for path in (args.base, args.new))
+    changes = compare(base, new, args.threshold)
+    for change in changes:
+        flag = "REGRESSION" if change["regression"] else ""
+        print(
+            f"{change['name']:8} {json.dumps(change['params'], sort_keys=True)} {change['metric']:24} "
+            f"{change['before']:.4g} -> {change['after']:.4g} ({change['change']:+.1%}) {flag}"
+        )
+    return 1 if any(change["regression"] for change in changes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
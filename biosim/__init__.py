@@ -1,7 +1,26 @@
 from ._config import config
-from ._coordinate import Coordinate
+from ._coordinate import Coordinate, Coordinates
 from ._creature import Creature
-from ._genome import Genome
+from ._events import EventLog, read_events, read_snapshots
+from ._genome import Genome, GenomePool
+from ._history import MapHistory, read_history
+from ._lineage import Lineage
 from ._world import World
+from ._batch import WorldBatch
 
-__all__ = ["config", "Coordinate", "Genome", "World", "Creature"]
+__all__ = [
+    "config",
+    "Coordinate",
+    "Coordinates",
+    "Genome",
+    "GenomePool",
+    "World",
+    "WorldBatch",
+    "Creature",
+    "Lineage",
+    "EventLog",
+    "read_events",
+    "read_snapshots",
+    "MapHistory",
+    "read_history",
+]
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import copy
+import random
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from ._config import config
+from ._engine import CHUNK_SIZE, MAX_RADIUS, VectorEngine, plan
+from ._lineage import Lineage
+from ._neighborhood import BLANK, FOOD
+from ._statistics import Statistics
+from ._streams import draw, generator
+from ._world import World, food_rate, place_food
+
+PAD = MAX_RADIUS  # 相邻世界之间的隔离带宽度，扫描不会越过隔离带
+
+
+class BatchEngine(VectorEngine):
+    """同时模拟WorldBatch中所有世界的向量化引擎
+
+    所有世界纵向排列在同一张地图上，彼此之间以取值为-1的隔离带分开，扫描、移动等规则与VectorEngine完全相同。
+    随机数按世界分组，由各自的随机数生成器按单独运行时的顺序生成，因此每个世界的结果与单独运行时一致。
+    使用keyed随机数时每个世界以自己的种子生成，与VectorEngine相同。
+    """
+
+    world: WorldBatch
+
+    def _groups(self, rows: np.ndarray) -> Iterator[tuple[np.random.RandomState, np.ndarray]]:
+        """将rows按所属世界分组，组内保持原有顺序，返回每个非空组的随机数生成器和在rows中的序号"""
+        batch = self.y[rows] // self.world.stride
+        order = np.argsort(batch, kind="stable")
+        bounds = np.searchsorted(batch[order], np.arange(len(self.world) + 1))
+        for b, rng in enumerate(self.world.rngs):
+            if bounds[b] < bounds[b + 1]:
+                yield rng, order[bounds[b] : bounds[b + 1]]
+
+    def _draw(self, n: int) -> np.ndarray:
+        batch = self.y[:n] // self.world.stride
+        return draw(self.world.seeds[batch], self.year, self.ids[:n])
+
+    def _random(self, rows: np.ndarray) -> np.ndarray:
+        if self.draws is not None:
+            return super()._random(rows)
+        result = np.empty(len(rows))
+        for rng, index in self._groups(rows):
+            result[index] = rng.random_sample(len(index))
+        return result
+
+    def _recombine(self, rows: np.ndarray, others: np.ndarray) -> np.ndarray:
+        if self.draws is not None:
+            return super()._recombine(rows, others)
+        position = np.empty(len(rows), dtype=np.int64)
+        for rng, index in self._groups(rows):
+            position[index] = rng.randint(0, self.base_num, len(index)) // 3 * 3
+        return self.pool.recombine(self.genome[rows], self.genome[others], position)
+
+    def _mutate(self, rows: np.ndarray) -> np.ndarray:
+        if self.draws is not None:
+            return super()._mutate(rows)
+        hits = [index[self.pool.mutate(self.genome[rows[index]], rng)] for rng, index in self._groups(rows)]
+        return rows[np.sort(np.concatenate([np.empty(0, dtype=np.int64), *hits]))]
+
+    def _register(self, rows: np.ndarray, others: np.ndarray) -> np.ndarray:
+        # 子代登记到所属世界的谱系中
+        ids = np.empty(len(rows), dtype=np.int64)
+        batch = self.y[rows] // self.world.stride
+        for b, lineage in enumerate(self.world.lineages):
+            index = np.flatnonzero(batch == b)
+            if len(index):
+                ids[index] = lineage.add(self.year, self.ids[rows[index]], self.ids[others[index]])
+        return ids
+
+    def _plan_all(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self.draws is not None:
+            return super()._plan_all(rows)
+        # 按单独运行时的分块顺序预先生成每个世界的随机数
+        draws = np.empty((2, len(rows)))
+        for rng, index in self._groups(rows):
+            for start in range(0, len(index), CHUNK_SIZE):
+                chunk = index[start : start + CHUNK_SIZE]
+                draws[0, chunk], draws[1, chunk] = rng.random_sample(len(chunk)), rng.random_sample(len(chunk))
+        food, creature, outer = (np.full(len(rows), -1, dtype=np.int64) for _ in range(3))
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            uniform = iter(draws[:, chunk])
+            food[chunk], creature[chunk], outer[chunk] = plan(
+                self.world._map,
+                self.x[rows[chunk]],
+                self.y[rows[chunk]],
+                self.perception[rows[chunk]],
+                self.movement[rows[chunk]],
+                lambda _: next(uniform),
+            )
+        return food, creature, outer
+
+
+class WorldBatch:
+    """一批相互独立的同尺寸世界，在同一组向量化运算中同时模拟，适合用不同种子重复实验
+
+    每个世界由自己的种子初始化并拥有独立的随机数生成器，结果与用该种子单独创建并运行的World("vector")一致。
+    不支持食物密度场，world.food_field不为0时结果与单独运行时不同。
+
+    Attributes:
+        seeds (np.ndarray): 每个世界的种子，传入0的世界为取系统熵生成的种子
+        maps (np.ndarray): (B, height + PAD, width)，每个世界的地图，末尾PAD行为隔离带
+        statistics (list[Statistics]): 每个世界的统计信息
+        lineages (list[Lineage]): 每个世界的谱系
+    """
+
+    def __init__(self, seeds: Sequence[int]) -> None:
+        """
+        Args:
+            seeds: 每个世界的随机种子，不能重复，0表示取系统熵生成新的种子。创建后全局随机数状态和config.seed不变
+
+        Raises:
+            ValueError: 非0的种子重复
+        """
+        self.shape = (config.world.height, config.world.width)
+        self.stride = self.shape[0] + PAD
+        seeds = [int(seed) for seed in seeds]
+        fixed = [seed for seed in seeds if seed]
+        if len(set(fixed)) < len(fixed):
+            raise ValueError(f"种子重复：{seeds}")
+        entropy = random.SystemRandom()
+        for b in range(len(seeds)):
+            while not seeds[b]:
+                seed = entropy.randrange(1, 1 << 32)
+                seeds[b] = 0 if seed in seeds else seed
+        self.seeds = np.array(seeds, dtype=np.int64)
+        self.maps = np.full((len(seeds), self.stride, self.shape[1]), -1, dtype=np.int8)
+        # 引擎使用的二维视图
+        self._map = self.maps.reshape(-1, self.shape[1])
+        self.rngs: list[np.random.RandomState] = []
+        # 每个世界各类格子的数量，按格子的值索引
+        self.counts = np.zeros((len(seeds), 3), dtype=np.int64)
+        self.year = 0
+        self.events = self.metrics = None  # 批量模拟不记录事件和指标
+        self.food_field = None  # 也不使用食物密度场
+        self.lineages: list[Lineage] = []
+        self.statistics = [Statistics() for _ in seeds]
+        engines = []
+        # 依次用每个世界的种子设置全局随机数创建世界，之后恢复原来的状态
+        state, np_state, config_seed = random.getstate(), np.random.get_state(), config.seed
+        try:
+            for b, seed in enumerate(seeds):
+                config.set_seed(seed)
+                world = World("vector", headless=True)
+                self.maps[b, : self.shape[0]] = world._map
+                self.counts[b] = world.counts
+                rng = np.random.RandomState()
+                rng.set_state(np.random.get_state())
+                self.rngs.append(rng)
+                self.lineages.append(world.lineage)
+                engines.append(world.engine)
+        finally:
+            random.setstate(state)
+            np.random.set_state(np_state)
+            config.seed = config_seed
+        self.engine = BatchEngine.from_columns(
+            self,
+            np.concatenate([e.x for e in engines]),
+            np.concatenate([e.y + b * self.stride for b, e in enumerate(engines)]),
+            np.concatenate([e.food for e in engines]),
+            np.concatenate([e.life for e in engines]),
+            np.concatenate([e.pool.words[e.genome] for e in engines]),
+            np.concatenate([e.ids for e in engines]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.maps)
+
+    @property
+    def batch(self) -> np.ndarray:
+        """每个生物所属的世界"""
+        return self.engine.y // self.stride
+
+    def populations(self) -> np.ndarray:
+        return np.bincount(self.batch, minlength=len(self))
+
+    def assign(self, cells: np.ndarray, value: int):
+        """同World.assign，分别更新每个世界的格子数量"""
+        flat = self._map.reshape(-1)
+        batch = cells // self.maps[0].size
+        size = self.counts.size
+        self.counts -= np.bincount(batch * 3 + flat[cells], minlength=size).reshape(self.counts.shape)
+        flat[cells] = value
+        self.counts[:, value] += np.bincount(batch, minlength=len(self))
+
+    def refresh_food(self, rate: float | None = None):
+        # 每个世界使用自己的随机数，规则同World.refresh_food
+        rate = config.world.food_rate if rate is None else rate
+        for b, rng in enumerate(self.rngs):
+            if config.world.random == "keyed":
+                rng = generator(int(self.seeds[b]), self.year)
+            placed = place_food(self.maps[b, : self.shape[0]], int(self.counts[b, BLANK]), rate, rng)
+            self.counts[b, [BLANK, FOOD]] += -placed, placed
+
+    def step(self, i: int):
+        """模拟第i年"""
+        self.year = i
+        engine = self.engine
+        engine.step(i)
+        rate = food_rate(i)
+        if rate:
+            self.refresh_food(rate)
+        n = engine.stepped
+        batch = engine.y[:n] // self.stride
+        for b, statistics in enumerate(self.statistics):
+            rows = np.flatnonzero(batch == b)
+            statistics.record(
+                i,
+                int(self.counts[b, FOOD]),
+                engine.traits[rows],
+                engine.sex[rows],
+                engine.life[rows],
+                engine.food[rows],
+            )
+
+    def run(self, years: int) -> int:
+        """连续模拟years年后返回当前年份"""
+        for _ in range(years):
+            self.year += 1
+            self.step(self.year)
+        return self.year
+
+    def extract(self, b: int, headless: bool = True) -> World:
+        """取出第b个世界作为单独的World，并将全局随机数设置为该世界的状态，之后继续运行的结果与留在批次中一致"""
+        world = World.__new__(World)
+        world._setup(self.shape, headless)
+        world._map[:] = self.maps[b, : self.shape[0]]
+        world.recount()
+        world.year = self.year
+        world.statistics = copy.deepcopy(self.statistics[b])
+        world.lineage = copy.deepcopy(self.lineages[b])
+        engine = self.engine
+        rows = np.flatnonzero(self.batch == b)
+        world.engine = VectorEngine.from_columns(
+            world,
+            engine.x[rows],
+            engine.y[rows] - b * self.stride,
+            engine.food[rows],
+            engine.life[rows],
+            engine.pool.words[engine.genome[rows]],
+            engine.ids[rows],
+        )
+        np.random.set_state(self.rngs[b].get_state())
+        return world
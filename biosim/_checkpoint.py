@@ -0,0 +1,163 @@
+"""世界状态的二进制快照
+
+文件格式：
+    MAGIC | 头部长度(uint64) | JSON头部 | 按ALIGN字节对齐的连续数组
+
+JSON头部记录年份、引擎、配置、随机数状态中的标量部分，以及每个数组的dtype、shape和相对数据区的偏移。
+读取时通过np.memmap映射整个文件，数组直接从映射中切片，不需要解析。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from ._world import World
+
+from ._chunked import ChunkedMap
+from ._config import config
+from ._coordinate import Coordinate
+from ._creature import Creature
+from ._genome import Genome, GenomePool
+from ._lineage import Lineage
+
+MAGIC = b"BIOSIMCK\x01"
+ALIGN = 64
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+def _columns(world: World) -> dict[str, np.ndarray]:
+    """生物的列数据，逐个模拟时额外保存槽位和空闲列表以复现模拟顺序"""
+    engine = world.engine
+    if engine is not None:
+        return {
+            "x": engine.x,
+            "y": engine.y,
+            "food": engine.food,
+            "life": engine.life,
+            "ids": engine.ids,
+            "genome": engine.pool.words[engine.genome],
+        }
+    creatures = world.creatures
+    pool = GenomePool.shared(config.gene.base_num)
+    return {
+        "x": np.array([c._loc.x for c in creatures], dtype=np.int32),
+        "y": np.array([c._loc.y for c in creatures], dtype=np.int32),
+        "food": np.array([c.food for c in creatures], dtype=np.float64),
+        "life": np.array([c.life for c in creatures], dtype=np.int32),
+        "ids": np.array([c.id for c in creatures], dtype=np.int64),
+        "genome": pool.words[[c._genome._row for c in creatures]].reshape(-1, pool.words.shape[1]),
+        "slot": np.array([c.slot for c in creatures], dtype=np.int32),
+        "free": np.array(world._free, dtype=np.int32),
+        "slots": np.array([len(world._slots)], dtype=np.int32),
+    }
+
+
+def save(world: World, path: str | Path):
+    """将世界状态写入path，先写临时文件再替换，中途失败不会破坏已有的快照"""
+    version, mt, gauss = random.getstate()
+    _, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    if isinstance(world._map, ChunkedMap):
+        # 稀疏地图只保存有内容的块
+        chunks, blocks = world._map.chunks()
+        arrays = {"map.keys": chunks, "map.blocks": blocks, **_columns(world)}
+    else:
+        arrays = {"map": world._map, **_columns(world)}
+    arrays["lineage.parents"], arrays["lineage.birth"] = world.lineage.parents, world.lineage.birth
+    arrays["random"] = np.array(mt, dtype=np.uint32)
+    arrays["np_random"] = keys
+    for field in world.statistics.dtype.names:
+        arrays[f"statistics.{field}"] = world.statistics[field]
+
+    header = {
+        "year": world.year,
+        "engine": "object" if world.engine is None else world.engine.name,
+        "shape": world._map.shape,
+        "config": config.model_dump(),
+        "random": [version, gauss],
+        "np_random": [pos, has_gauss, cached_gaussian],
+        "arrays": {},
+    }
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": array.shape, "offset": offset}
+        offset += _aligned(array.nbytes)
+    head = json.dumps(header, ensure_ascii=False).encode()
+    start = _aligned(len(MAGIC) + 8 + len(head))
+
+    path = Path(path)
+    temp = path.with_name(path.name + ".tmp")
+    with temp.open("wb") as fp:
+        fp.write(MAGIC + np.uint64(len(head)).tobytes() + head)
+        for name, array in arrays.items():
+            fp.seek(start + header["arrays"][name]["offset"])
+            fp.write(np.ascontiguousarray(array).data)
+        fp.truncate(start + offset)
+    os.replace(temp, path)
+
+
+def read(path: str | Path) -> tuple[dict, dict[str, np.ndarray]]:
+    """映射快照文件，返回头部和只读的数组视图"""
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buffer[: len(MAGIC)]) != MAGIC:
+        raise ValueError(f"不是有效的快照文件：{path}")
+    size = int(buffer[len(MAGIC) : len(MAGIC) + 8].view(np.uint64)[0])
+    header = json.loads(bytes(buffer[len(MAGIC) + 8 : len(MAGIC) + 8 + size]))
+    start = _aligned(len(MAGIC) + 8 + size)
+    arrays = {}
+    for name, meta in header["arrays"].items():
+        dtype, shape = np.dtype(meta["dtype"]), tuple(meta["shape"])
+        begin = start + meta["offset"]
+        end = begin + dtype.itemsize * int(np.prod(shape))
+        arrays[name] = buffer[begin:end].view(dtype).reshape(shape)
+    return header, arrays
+
+
+def load(path: str | Path, headless: bool = False) -> World:
+    """从快照恢复世界，同时恢复快照中的配置和随机数状态，之后的模拟与保存时继续运行的结果一致"""
+    from ._world import ENGINES, World
+
+    header, arrays = read(path)
+    config.update(header["config"])
+
+    world = World.__new__(World)
+    shape = tuple(header["shape"])
+    world._setup(shape, headless)
+    if isinstance(world._map, ChunkedMap):
+        world._map = ChunkedMap.from_chunks(shape, config.world.chunk_size, arrays["map.keys"], arrays["map.blocks"])
+    else:
+        world._map[:] = arrays["map"]
+    world.recount()
+    world.year = header["year"]
+    world.statistics.restore(
+        {name.split(".", 1)[1]: array for name, array in arrays.items() if name.startswith("statistics.")}
+    )
+    world.lineage = Lineage.restore(arrays["lineage.parents"], arrays["lineage.birth"])
+    x, y, food, life, words, ids = (arrays[name] for name in ("x", "y", "food", "life", "genome", "ids"))
+    if header["engine"] != "object":
+        world.engine = ENGINES[header["engine"]].from_columns(world, x, y, food, life, words, ids)
+    else:
+        pool = GenomePool.shared(config.gene.base_num)
+        world._slots = [None] * int(arrays["slots"][0])
+        world._free = arrays["free"].tolist()
+        for i, row in enumerate(pool.allocate(words)):
+            creature = Creature(Coordinate(int(x[i]), int(y[i])), world, Genome._from_row(pool, row))
+            creature.food, creature.life, creature.id = float(food[i]), int(life[i]), int(ids[i])
+            creature.slot = int(arrays["slot"][i])
+            world._slots[creature.slot] = creature
+            world.place(creature)
+
+    version, gauss = header["random"]
+    random.setstate((version, tuple(arrays["random"].tolist()), gauss))
+    pos, has_gauss, cached_gaussian = header["np_random"]
+    np.random.set_state(("MT19937", np.array(arrays["np_random"]), pos, has_gauss, cached_gaussian))
+    return world
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+class ChunkedMap:
+    """分块保存的稀疏地图，只保存含有非默认值格子的块，内存占用与有内容的面积成正比
+
+    支持二维np.ndarray的常用接口：shape、size、按一维索引批量读写的take/put、按[y, x]读写单个格子、
+    按切片读取窗口，以及通过np.asarray转换为稠密数组。
+
+    块按(块行, 块列)编号为一维键，键有序保存以便用searchsorted批量查找所在的块。
+
+    Attributes:
+        chunk (int): 块的边长
+        keys (np.ndarray): 有序的块编号
+        slots (np.ndarray): 每个块在blocks中的行号
+        blocks (np.ndarray): (capacity, chunk * chunk)，块的内容
+        used (np.ndarray): 每个块中非默认值格子的数量，为0时释放该块
+    """
+
+    def __init__(self, shape: tuple[int, int], dtype=np.int8, fill: int = 0, chunk: int = 16) -> None:
+        self.shape = tuple(shape)
+        self.size = self.shape[0] * self.shape[1]
+        self.dtype = np.dtype(dtype)
+        self.fill = fill
+        self.chunk = chunk
+        self._columns = -(-self.shape[1] // chunk)  # 每行的块数
+        self.keys = np.empty(0, dtype=np.int64)
+        self.slots = np.empty(0, dtype=np.int64)
+        self.blocks = np.full((16, chunk * chunk), fill, dtype=self.dtype)
+        self.used = np.zeros(16, dtype=np.int64)
+        self._free = list(range(15, -1, -1))
+
+    @property
+    def nbytes(self) -> int:
+        return self.blocks.nbytes + self.used.nbytes + self.keys.nbytes + self.slots.nbytes
+
+    def _locate(self, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """一维索引所在块的编号、块内序号和块的行号，块不存在时行号为-1"""
+        y, x = np.divmod(cells, self.shape[1])
+        key = (y // self.chunk) * self._columns + x // self.chunk
+        local = (y % self.chunk) * self.chunk + x % self.chunk
+        pos = np.minimum(np.searchsorted(self.keys, key), max(len(self.keys) - 1, 0))
+        found = (self.keys[pos] == key) if len(self.keys) else np.zeros(key.shape, dtype=bool)
+        return key, local, np.where(found, self.slots[pos] if len(self.keys) else -1, -1)
+
+    def _allocate(self, keys: np.ndarray):
+        """为新的块分配行号"""
+        while len(self._free) < len(keys):
+            capacity = len(self.blocks)
+            self.blocks = np.concatenate([self.blocks, np.full_like(self.blocks, self.fill)])
+            self.used = np.concatenate([self.used, np.zeros_like(self.used)])
+            self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+        slots = np.array([self._free.pop() for _ in range(len(keys))], dtype=np.int64)
+        keys = np.concatenate([self.keys, keys])
+        order = np.argsort(keys, kind="stable")
+        self.keys, self.slots = keys[order], np.concatenate([self.slots, slots])[order]
+
+    def take(self, cells) -> np.ndarray:
+        """按一维索引读取格子，同np.ndarray.take"""
+        cells = np.asarray(cells, dtype=np.int64)
+        _, local, slot = self._locate(cells)
+        values = np.full(cells.shape, self.fill, dtype=self.dtype)
+        found = slot >= 0
+        values[found] = self.blocks[slot[found], local[found]]
+        return values
+
+    def put(self, cells, value):
+        """按一维索引写入格子，同np.ndarray.put，cells中不能有重复"""
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1)
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), cells.shape)
+        key, local, slot = self._locate(cells)
+        missing = (slot < 0) & (value != self.fill)
+        if missing.any():
+            self._allocate(np.unique(key[missing]))
+            key, local, slot = self._locate(cells)
+        # 写入默认值且块不存在的格子无需处理
+        found = slot >= 0
+        slot, local, value = slot[found], local[found], value[found]
+        old = self.blocks[slot, local]
+        self.blocks[slot, local] = value
+        np.add.at(self.used, slot, (value != self.fill).astype(np.int64) - (old != self.fill))
+        empty = np.unique(slot[self.used[slot] == 0])
+        if len(empty):
+            keep = ~np.isin(self.slots, empty)
+            self.keys, self.slots = self.keys[keep], self.slots[keep]
+            self._free.extend(empty.tolist())
+
+    def _cells(self, key: tuple) -> np.ndarray:
+        rows, columns = (
+            np.arange(*k.indices(n)) if isinstance(k, slice) else np.asarray(k)
+            for k, n in zip(key, self.shape)
+        )
+        return rows[..., None] * self.shape[1] + columns if rows.ndim else rows * self.shape[1] + columns
+
+    def __getitem__(self, key: tuple):
+        values = self.take(self._cells(key))
+        return values[()] if values.ndim == 0 else values
+
+    def __setitem__(self, key: tuple, value):
+        self.put(self._cells(key), value)
+
+    def bincount(self, minlength: int = 0) -> np.ndarray:
+        """各取值的格子数量，同np.bincount，只适用于非负的取值"""
+        counts = np.bincount(self.blocks[self.slots].reshape(-1), minlength=minlength)
+        # 块中超出地图的部分和未保存的块都是默认值
+        counts[self.fill] = self.size - (counts.sum() - counts[self.fill])
+        return counts
+
+    def flatnonzero(self, value) -> np.ndarray:
+        """取值为value的格子的一维索引，value不能是默认值"""
+        keys, blocks = self.chunks()
+        chunk, local = np.nonzero(blocks == value)
+        row, column = np.divmod(keys[chunk], self._columns)
+        y, x = row * self.chunk + local // self.chunk, column * self.chunk + local % self.chunk
+        return np.sort(y * self.shape[1] + x)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        """转换为稠密数组"""
+        c = self.chunk
+        rows = -(-self.shape[0] // c)
+        dense = np.full((rows * c, self._columns * c), self.fill, dtype=self.dtype)
+        view = dense.reshape(rows, c, self._columns, c).transpose(0, 2, 1, 3)
+        row, column = np.divmod(self.keys, self._columns)
+        view[row, column] = self.blocks[self.slots].reshape(-1, c, c)
+        dense = dense[: self.shape[0], : self.shape[1]]
+        return dense if dtype is None else dense.astype(dtype)
+
+    @classmethod
+    def from_chunks(
+        cls, shape: tuple[int, int], chunk: int, keys: np.ndarray, blocks: np.ndarray, fill: int = 0
+    ) -> ChunkedMap:
+        """由chunks()返回的块恢复"""
+        order = np.argsort(keys)
+        keys, blocks = np.asarray(keys, dtype=np.int64)[order], np.asarray(blocks)[order]
+        result = cls(shape, blocks.dtype, fill, chunk)
+        result._allocate(keys)
+        result.blocks[result.slots] = blocks
+        result.used[result.slots] = (blocks != fill).sum(axis=1)
+        return result
+
+    def chunks(self) -> tuple[np.ndarray, np.ndarray]:
+        """所有块的编号和内容"""
+        return self.keys.copy(), self.blocks[self.slots]
@@ -1,14 +1,19 @@
 import random
+from functools import cache
 from pathlib import Path
 from pprint import pprint
-from typing import Literal, TypeAlias
+from typing import Any, Literal, TypeAlias
 
+import numpy as np
 import rtoml
 from pydantic import BaseModel, ValidationError, computed_field, model_validator
 
 ROOT = Path(__file__).parent
 
 Trait: TypeAlias = Literal["", "智力", "体力", "外貌", "幸运"]
+Engine: TypeAlias = Literal["object", "vector", "tiled"]
+Storage: TypeAlias = Literal["dense", "sparse"]
+RandomSource: TypeAlias = Literal["global", "keyed"]
 
 
 class WorldConfig(BaseModel):
@@ -19,8 +24,18 @@ class WorldConfig(BaseModel):
     food_cost_rate: int = 2  # 食物消耗频率
     food_rate: float = 0.1  # 食物生成率
     food_refresh_year: int = 10  # 食物刷新间隔
+    food_refresh_spread: int = 1  # 每次刷新分摊到的年数，用于平滑刷新造成的耗时波动
     init_count: int = 100  # 初始生物数量
     year_per_second: int = 30  # 每秒回合数
+    engine: Engine = "object"  # 模拟引擎：object逐个生物模拟，vector整体向量化模拟，tiled分块多进程模拟
+    tiles: tuple[int, int] = (2, 2)  # tiled引擎的分块行数和列数
+    workers: int = 0  # tiled引擎的进程数，0表示CPU核数
+    storage: Storage = "dense"  # 地图存储方式：dense按格子保存，sparse只保存有内容的块，适合大而空的地图
+    chunk_size: int = 16  # sparse地图的块边长
+    # 随机数来源：global使用全局随机数，keyed按(种子, 年份, 生物编号, 用途)生成，结果与生物的顺序和分块无关
+    random: RandomSource = "global"
+    food_field: int = 0  # 食物密度场的块边长，0表示不使用；使用时闲逛的生物朝周围食物最多的块移动
+    jit: bool = False  # object引擎使用numba编译的内核逐个模拟，结果与Python实现相同，未安装numba或sparse地图时忽略
 
     @model_validator(mode="after")
     def check_init_num(self) -> "WorldConfig":
@@ -29,6 +44,13 @@ class WorldConfig(BaseModel):
         ), f"初始生物数量过多：{self.init_count} >= {self.width} * {self.height}"
         return self
 
+    @model_validator(mode="after")
+    def check_refresh_spread(self) -> "WorldConfig":
+        assert (
+            1 <= self.food_refresh_spread <= self.food_refresh_year
+        ), f"食物刷新分摊年数应在1到{self.food_refresh_year}之间：{self.food_refresh_spread}"
+        return self
+
     @computed_field
     @property
     def second_per_year(self) -> float:
@@ -85,6 +107,29 @@ class Config(BaseModel):
         self.seed = seed or self.seed
         if self.seed:
             random.seed(self.seed)
+            np.random.seed(self.seed)
+
+    def update(self, overrides: dict[str, Any]) -> "Config":
+        """就地更新配置并重新校验，已导入的config对象随之生效
+
+        Args:
+            overrides: 键为"world.food_rate"形式的路径，值为字典时与原配置合并
+        """
+        values = self.model_dump()
+        for key, value in overrides.items():
+            *sections, name = key.split(".")
+            target = values
+            for section in sections:
+                target = target.get(section)
+                if not isinstance(target, dict):
+                    raise KeyError(f"未知配置项：{key}")
+            if name not in target:
+                raise KeyError(f"未知配置项：{key}")
+            target[name] = {**target[name], **value} if isinstance(value, dict) else value
+        updated = self.model_validate(values)
+        for name in type(self).model_fields:
+            setattr(self, name, getattr(updated, name))
+        return self
 
     @classmethod
     def load(cls, config_file: str = "user-config.toml"):
@@ -97,10 +142,35 @@ class Config(BaseModel):
         return cls.model_validate(user_config)
 
 
-try:
-    config = Config.load()
+@cache
+def get_config() -> Config:
+    """第一次调用时解析配置文件并设置随机种子，之后返回同一个对象"""
+    try:
+        config = Config.load()
+    except ValidationError as e:
+        print("配置文件错误：")
+        pprint(e.errors())
+        exit()
     config.set_seed()
-except ValidationError as e:
-    print("配置文件错误：")
-    pprint(e.errors())
-    exit()
+    return config
+
+
+class _LazyConfig:
+    """第一次访问时才解析配置文件，读写都转发给get_config()返回的Config
+
+    导入biosim时不读取配置文件，也不设置随机种子，种子在第一次访问配置时设置一次。
+    """
+
+    model_fields = Config.model_fields
+
+    def __getattr__(self, name: str):
+        return getattr(get_config(), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(get_config(), name, value)
+
+    def __repr__(self) -> str:
+        return repr(get_config())
+
+
+config = _LazyConfig()
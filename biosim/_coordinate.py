@@ -1,4 +1,7 @@
-from functools import cache
+from __future__ import annotations
+
+import numpy as np
+
 from ._config import config
 
 
@@ -12,8 +15,7 @@ class Coordinate:
         self.y = y
 
     @property
-    @cache
-    def index(self):
+    def index(self) -> int:
         return self.x + self.y * config.world.width
 
     def distance(self, other: "Coordinate") -> int:
@@ -42,3 +44,73 @@ class Coordinate:
 
     def __str__(self) -> str:
         return f"({self.x}, {self.y})"
+
+
+class Coordinates:
+    """一批坐标，x和y分别保存为int64数组，运算均按元素进行，另一方可以是Coordinate或等长的Coordinates
+
+    Attributes:
+        x, y (np.ndarray): 坐标
+    """
+
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y) -> None:
+        self.x, self.y = np.broadcast_arrays(np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64))
+
+    @classmethod
+    def from_index(cls, index, width: int | None = None) -> "Coordinates":
+        """由一维索引转换，width默认为配置中的地图宽度"""
+        y, x = np.divmod(np.asarray(index, dtype=np.int64), width or config.world.width)
+        return cls(x, y)
+
+    @classmethod
+    def of(cls, coordinates: "list[Coordinate]") -> "Coordinates":
+        return cls([c.x for c in coordinates], [c.y for c in coordinates])
+
+    def index(self, width: int | None = None) -> np.ndarray:
+        """一维索引，width默认为配置中的地图宽度"""
+        return self.y * (width or config.world.width) + self.x
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, key) -> "Coordinate | Coordinates":
+        """整数下标返回Coordinate，切片、掩码等返回Coordinates"""
+        if isinstance(key, (int, np.integer)):
+            return Coordinate(int(self.x[key]), int(self.y[key]))
+        return Coordinates(self.x[key], self.y[key])
+
+    def __iter__(self):
+        for x, y in zip(self.x.tolist(), self.y.tolist()):
+            yield Coordinate(x, y)
+
+    def __add__(self, other: "Coordinate | Coordinates") -> "Coordinates":
+        return Coordinates(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other: "Coordinate | Coordinates") -> "Coordinates":
+        return Coordinates(self.x - other.x, self.y - other.y)
+
+    def __eq__(self, other: "Coordinate | Coordinates") -> np.ndarray:
+        return (self.x == other.x) & (self.y == other.y)
+
+    __hash__ = None
+
+    def distance(self, other: "Coordinate | Coordinates") -> np.ndarray:
+        """曼哈顿距离"""
+        return np.abs(self.x - other.x) + np.abs(self.y - other.y)
+
+    def radius(self, other: "Coordinate | Coordinates") -> np.ndarray:
+        """切比雪夫距离，即所在圈的半径"""
+        return np.maximum(np.abs(self.x - other.x), np.abs(self.y - other.y))
+
+    def inside(self, shape: tuple[int, int]) -> np.ndarray:
+        """是否在(height, width)的地图内"""
+        return (0 <= self.x) & (self.x < shape[1]) & (0 <= self.y) & (self.y < shape[0])
+
+    def clip(self, shape: tuple[int, int]) -> "Coordinates":
+        """将超出(height, width)的坐标移到最近的边界上"""
+        return Coordinates(np.clip(self.x, 0, shape[1] - 1), np.clip(self.y, 0, shape[0] - 1))
+
+    def __str__(self) -> str:
+        return f"Coordinates({len(self)})"
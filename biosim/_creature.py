@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-from functools import cache
 from random import choice, random
 from typing import TYPE_CHECKING
 
@@ -10,8 +9,10 @@ if TYPE_CHECKING:
 
 from ._config import config
 from ._coordinate import Coordinate
+from ._events import BIRTH, EAT, FIGHT
 from ._genome import Genome
-from .utils import spiral_scan
+from ._neighborhood import BLANK, scan
+from ._streams import PICK_BLANK, PICK_CREATURE, RECOMBINE, ROLL
 
 
 class Creature:
@@ -24,7 +25,7 @@ class Creature:
         food (int): 食物量(0~3[5])，每点体力增加1点上限
     """
 
-    __slots__ = ("_genome", "_loc", "food", "life", "map")
+    __slots__ = ("_genome", "_loc", "food", "id", "life", "map", "slot")
 
     def __init__(self, location: Coordinate, map: World, genome: Genome | None = None) -> None:
         self._loc = location
@@ -32,6 +33,8 @@ class Creature:
         self.food = 0
         self.life = 0
         self.map = map
+        self.slot = -1  # 在World中的槽位号
+        self.id = -1  # 在World.lineage中的编号
 
     def __eq__(self, other: "Creature") -> int:
         return self._genome == other._genome
@@ -54,23 +57,19 @@ class Creature:
         self.life = min(state["life"], 80)
 
     @property
-    @cache
     def sex(self):
-        return self._genome._gene.bit_count() % 2
+        return self._genome.sex
 
     @property
-    @cache
     def perception(self):
         """感知范围"""
         return min(1 + self._genome.traits["智力"], 10)
 
     @property
-    @cache
     def movement(self):
         return min(1 + self._genome.traits["体力"], 10)
 
     @property
-    @cache
     def charm(self):
         """魅力值，影响生育。越高生育率越高"""
         return (
@@ -78,7 +77,6 @@ class Creature:
         ) / config.gene.init_gene_count
 
     @property
-    @cache
     def food_cost(self):
         return (
             self.traits["体力"] + self.traits["智力"] - 0.5 * self.traits["外貌"]
@@ -93,15 +91,23 @@ class Creature:
 
     def roll(self):
         """生成随机点数，点数越小，某件事成功率越高"""
-        return random() - self.traits["幸运"] * 0.01
+        draws = self.map.draws
+        uniform = random() if draws is None else draws[self.slot, ROLL]
+        return uniform - self.traits["幸运"] * 0.01
+
+    def choose(self, candidates, purpose: int):
+        """随机选择一个候选，使用keyed随机数时由purpose对应的随机数决定"""
+        draws = self.map.draws
+        if draws is None:
+            return choice(candidates)
+        return candidates[int(draws[self.slot, purpose] * len(candidates))]
 
     def search_blank(self) -> Coordinate | None:
         """扫描自身周围的空地"""
-        location = self._loc
-        for _, direction in spiral_scan(self.perception):
-            location += direction
-            if self.map[location] == 0:
-                return location
+        near = scan(self.map._map, self._loc, self.perception)
+        blanks = near.blanks()
+        if len(blanks):
+            return near.location(blanks[0])
 
     def mate(self, other: "Creature"):
         if self.roll() > self.charm:
@@ -109,15 +115,25 @@ class Creature:
         child_loc = other.search_blank() or self.search_blank()
         if child_loc is None:
             return
-        child = Creature(child_loc, self.map, self._genome & other._genome)
+        draws = self.map.draws
+        position = None if draws is None else int(draws[self.slot, RECOMBINE] * self._genome._base_num) // 3 * 3
+        child = Creature(child_loc, self.map, self._genome.recombine(other._genome, position))
+        child.id = int(self.map.lineage.add(self.map.year, self.id, other.id)[0])
         self.map.add_creature(child)
+        self.map.record_event(BIRTH, child_loc, self._loc)
+        if self.map.metrics is not None:
+            self.map.metrics.count("births")
 
     def fight(self, other: "Creature"):
+        if self.map.metrics is not None:
+            self.map.metrics.count("fights")
         if self.roll() < 0.5:
+            self.map.record_event(FIGHT, self._loc, other._loc, food=other.food)
             other.life += 5
             other.food = 0
             self.food += other.food
         else:
+            self.map.record_event(FIGHT, other._loc, self._loc, food=self.food)
             self.life += 5
             other.food += self.food
             self.food = 0
@@ -132,7 +148,21 @@ class Creature:
         else:
             self.mate(other)
 
+    def uphill(self) -> Coordinate | None:
+        """沿食物密度场移动的目标：朝食物最多的方向走满移动范围，目标不是空地或没有密度场时为None"""
+        field = self.map.food_field
+        if field is None:
+            return None
+        dx, dy = field.direction(self._loc.x, self._loc.y)
+        if not (dx or dy):
+            return None
+        radius = min(self.perception, self.movement)
+        location = Coordinate(self._loc.x + dx * radius, self._loc.y + dy * radius)
+        return location if self.map[location] == BLANK else None
+
     def move(self, location: Coordinate):
+        if self.map.metrics is not None:
+            self.map.metrics.count("moves")
         self._loc = location
         self.map[location] = 2
 
@@ -141,33 +171,30 @@ class Creature:
         如果周围存在食物则移动到最远的食物处，否则随机移动到一个最远的位置
         寿命减1，食物不足时额外减1
         """
-        location = self._loc  # 扫描起始位置
-        foods, creatures, outer = [], [], []
-        max_radiums = min(self.perception, self.movement)
         # 扫描周围
-        for radiums, direction in spiral_scan(self.perception):
-            location += direction
-            match self.map[location]:
-                case 0 if radiums == max_radiums:
-                    outer.append((radiums, location))
-                case 1:
-                    foods.append((radiums, location))
-                case 2:
-                    creatures.append((radiums, location))
-                case _:
-                    pass
-
-        if foods and self.food <= config.creature.max_food // 2:
-            _, location = max(foods, key=lambda x: x[0])
+        metrics = self.map.metrics
+        near = scan(self.map._map, self._loc, self.perception)
+        foods, creatures = near.foods(), near.creatures()
+        outer = near.blanks(min(self.perception, self.movement))
+        if metrics is not None:
+            metrics.lap("scan", scanned=4 * self.perception * (self.perception + 1))
+
+        if len(foods) and self.food <= config.creature.max_food // 2:
+            # 半径最大的食物中扫描顺序最靠前的一个
+            location = near.location(foods[near.radius[foods].argmax()])
             self.food += 1
             self.move(location)
-        elif creatures and self.life >= config.creature.adult_age and self.food:
-            _, location = choice(creatures)
-            creatures = self.map.creatures[location]
-            self.interact(creatures)
-        elif outer:
-            _, location = choice(outer)
-            self.move(location)
+            self.map.record_event(EAT, location, food=self.food)
+        elif len(creatures) and self.life >= config.creature.adult_age and self.food:
+            location = near.location(self.choose(creatures, PICK_CREATURE))
+            self.interact(self.map.creature_at(location))
+            if metrics is not None:
+                metrics.lap("interact")
+        elif len(outer):
+            self.move(self.uphill() or near.location(self.choose(outer, PICK_BLANK)))
+        if metrics is not None:
+            metrics.lap("move")
         self.food = max(0, self.food - self.food_cost)
         self.life += 1 + (self.food == 0) * 10
-        self._genome.mutate()
+        if metrics is not None:
+            metrics.lap("age")
@@ -0,0 +1,416 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Iterable
+
+import numpy as np
+from numpy.random import random
+
+from ._config import config
+from ._events import BIRTH, DEATH, EAT, FIGHT
+from ._genome import TRAITS, GenomePool, TraitDecoder, pack_genes, popcount
+from ._neighborhood import BLANK, CREATURE, offset_table
+from ._streams import MUTATE, PICK_BLANK, PICK_CREATURE, POSITION, RECOMBINE, ROLL, draw
+
+if TYPE_CHECKING:
+    from ._creature import Creature
+    from ._statistics import Statistics
+    from ._world import World
+
+INTELLIGENCE, STRENGTH, LOOKS, LUCK = (TRAITS.index(t) for t in ("智力", "体力", "外貌", "幸运"))
+MAX_RADIUS = 10  # 感知范围和移动力的上限
+CHUNK_SIZE = 4096  # 分块扫描时每块的生物数量，限制临时矩阵的大小
+
+
+def first_claims(cells: np.ndarray) -> np.ndarray:
+    """冲突处理：多个生物争夺同一格子时，只有第一个（序号最小的）生物获胜，返回获胜者的掩码"""
+    won = np.zeros(len(cells), dtype=bool)
+    _, first = np.unique(cells, return_index=True)
+    won[first] = True
+    return won
+
+
+def scan(_map: np.ndarray, x: np.ndarray, y: np.ndarray, radius: np.ndarray):
+    """以螺旋顺序扫描每个坐标周围radius范围内的格子
+
+    Returns:
+        cells: (n, k) 格子在一维地图中的索引，超出地图或半径的格子为-1
+        values: (n, k) 格子的值，无效格子为-1
+        rings: (k,) 每列所在圈的半径
+    """
+    height, width = _map.shape
+    dx, dy, rings = offset_table(max(int(radius.max(initial=1)), 1))
+    nx = x[:, None] + dx
+    ny = y[:, None] + dy
+    valid = (0 <= nx) & (nx < width) & (0 <= ny) & (ny < height) & (rings <= radius[:, None])
+    cells = np.where(valid, ny * width + nx, -1)
+    values = np.where(valid, _map.take(cells), -1)
+    return cells, values, rings
+
+
+def choice(cells: np.ndarray, mask: np.ndarray, uniform: np.ndarray) -> np.ndarray:
+    """每行在mask为True的格子中按uniform随机选择一个，没有可选格子时为-1"""
+    count = mask.sum(axis=1)
+    pick = (uniform * count).astype(np.int64)
+    column = (mask.cumsum(axis=1) > pick[:, None]).argmax(axis=1)
+    return np.where(count > 0, cells[np.arange(len(cells)), column], -1)
+
+
+def plan(
+    _map: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    perception: np.ndarray,
+    movement: np.ndarray,
+    random: Callable[[int], np.ndarray] = random,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """扫描周围，返回最远的食物、随机选择的生物和最外圈随机空地所在格子，不存在时为-1
+
+    Args:
+        random: 生成[0, 1)均匀分布随机数的函数，默认使用全局随机数
+    """
+    max_radius = np.minimum(perception, movement)
+    cells, values, rings = scan(_map, x, y, perception)
+    k = np.arange(cells.shape[1])
+    # 最远的食物：半径最大者中扫描顺序最靠前的一个
+    foods = values == 1
+    score = np.where(foods, rings * (len(k) + 1) - k, -1)
+    food = np.where(foods.any(axis=1), cells[np.arange(len(cells)), score.argmax(axis=1)], -1)
+    # 指定半径内随机选择
+    creature = choice(cells, values == 2, random(len(cells)))
+    outer = choice(cells, (values == 0) & (rings == max_radius[:, None]), random(len(cells)))
+    return food, creature, outer
+
+
+def search_blank(
+    _map: np.ndarray, x: np.ndarray, y: np.ndarray, perception: np.ndarray, allowed: np.ndarray | None = None
+) -> np.ndarray:
+    """扫描每个坐标周围第一个空地，不存在时为-1，allowed为每行额外视为空地的格子"""
+    result = np.full(len(x), -1, dtype=np.int64)
+    for start in range(0, len(x), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        cells, values, _ = scan(_map, x[chunk], y[chunk], perception[chunk])
+        blank = values == 0
+        if allowed is not None:
+            blank |= (cells == allowed[chunk, None]) & (cells >= 0)
+        column = blank.argmax(axis=1)
+        result[chunk] = np.where(blank.any(axis=1), cells[np.arange(len(cells)), column], -1)
+    return result
+
+
+class VectorEngine:
+    """以结构化数组（SoA）保存所有生物，并以整体数组运算完成每年的扫描、觅食、移动、衰老和死亡。
+
+    行为规则与Creature.step一致，移动分为若干轮，每轮尚未移动的生物基于本轮开始时的地图做出决策。
+    多个生物争夺同一格子时，序号小（更早加入世界）的生物获胜，其余生物在下一轮基于更新后的地图重新决策，
+    相当于逐个模拟时后模拟的生物看到先模拟的生物移动后的地图。每轮的战斗和交配在下一轮之前完成，
+    新生的生物立即出现在地图上，当年不衰老、不突变。
+
+    Attributes:
+        x, y (np.ndarray): 坐标
+        food (np.ndarray): 食物量
+        life (np.ndarray): 年龄
+        ids (np.ndarray): 在谱系world.lineage中的编号
+        sex (np.ndarray): 性别，1为雄性
+        traits (np.ndarray): (n, len(TRAITS))，各性状的基因数量
+        genome (np.ndarray): 基因组在基因池pool中的行号
+        draws (np.ndarray | None): 使用keyed随机数时，本年参与模拟的生物预先生成的各用途随机数，见_streams
+    """
+
+    name = "vector"
+
+    def __init__(self, world: World, creatures: Iterable[Creature] = ()) -> None:
+        self.world = world
+        self.base_num = config.gene.base_num
+        creatures = list(creatures)
+        self.x = np.array([c._loc.x for c in creatures], dtype=np.int32)
+        self.y = np.array([c._loc.y for c in creatures], dtype=np.int32)
+        self.food = np.array([c.food for c in creatures], dtype=np.float64)
+        self.life = np.array([c.life for c in creatures], dtype=np.int32)
+        self.ids = np.array([c.id for c in creatures], dtype=np.int64)
+        self.pool = GenomePool(self.base_num, capacity=max(2 * len(creatures), 1024))
+        genes = pack_genes((c._genome._gene for c in creatures), self.base_num)
+        self.genome = self.pool.allocate(genes)
+        self.sex = np.zeros(len(creatures), dtype=np.int8)
+        self.traits = np.zeros((len(creatures), len(TRAITS)), dtype=np.int32)
+        self._decode(np.arange(len(creatures)))
+        self.stepped = len(creatures)  # 本年参与模拟的生物数量，不含新出生的生物
+        self.year = world.year  # 正在模拟的年份，由step设置
+        self.draws: np.ndarray | None = None
+
+    @classmethod
+    def from_columns(
+        cls,
+        world: World,
+        x: np.ndarray,
+        y: np.ndarray,
+        food: np.ndarray,
+        life: np.ndarray,
+        words: np.ndarray,
+        ids: np.ndarray,
+    ) -> VectorEngine:
+        """由列数据恢复引擎，words为打包后的基因，ids为谱系中的编号"""
+        engine = cls(world)
+        engine.x, engine.y = np.array(x, dtype=np.int32), np.array(y, dtype=np.int32)
+        engine.food, engine.life = np.array(food, dtype=np.float64), np.array(life, dtype=np.int32)
+        engine.ids = np.array(ids, dtype=np.int64)
+        engine.genome = engine.pool.allocate(words)
+        engine.sex = np.zeros(len(x), dtype=np.int8)
+        engine.traits = np.zeros((len(x), len(TRAITS)), dtype=np.int32)
+        engine._decode(np.arange(len(x)))
+        engine.stepped = len(x)
+        return engine
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def close(self):
+        """释放引擎占用的资源"""
+
+    def summarize(self, statistics: Statistics) -> np.ndarray:
+        """本年参与模拟的生物的统计，见Statistics.summarize"""
+        n = self.stepped
+        return statistics.summarize(self.traits[:n], self.sex[:n], self.life[:n], self.food[:n])
+
+    @property
+    def perception(self) -> np.ndarray:
+        return np.minimum(1 + self.traits[:, INTELLIGENCE], MAX_RADIUS)
+
+    @property
+    def movement(self) -> np.ndarray:
+        return np.minimum(1 + self.traits[:, STRENGTH], MAX_RADIUS)
+
+    @property
+    def charm(self) -> np.ndarray:
+        traits = self.traits
+        return (
+            traits[:, LOOKS] * 2 + 0.5 * traits[:, STRENGTH] + 0.5 * traits[:, INTELLIGENCE]
+        ) / config.gene.init_gene_count
+
+    @property
+    def food_cost(self) -> np.ndarray:
+        traits = self.traits
+        return (
+            traits[:, STRENGTH] + traits[:, INTELLIGENCE] - 0.5 * traits[:, LOOKS]
+        ) / config.gene.init_gene_count
+
+    @property
+    def cells(self) -> np.ndarray:
+        """生物所在格子在一维地图中的索引"""
+        return self.y * self.world._map.shape[1] + self.x
+
+    def _decode(self, rows: np.ndarray):
+        """根据基因重新计算指定生物的性状和性别"""
+        words = self.pool.words[self.genome[rows]]
+        self.traits[rows] = TraitDecoder.get(self.base_num).decode(words)
+        self.sex[rows] = popcount(words) % 2
+
+    def _take(self, keep: np.ndarray):
+        for name in ("x", "y", "food", "life", "ids", "sex", "traits", "genome"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def _append(self, cells: np.ndarray, genome: np.ndarray, ids: np.ndarray):
+        """在指定格子加入新生物，食物和年龄均为0"""
+        width = self.world._map.shape[1]
+        n = len(cells)
+        self.x = np.concatenate([self.x, (cells % width).astype(np.int32)])
+        self.y = np.concatenate([self.y, (cells // width).astype(np.int32)])
+        self.food = np.concatenate([self.food, np.zeros(n)])
+        self.life = np.concatenate([self.life, np.zeros(n, dtype=np.int32)])
+        self.ids = np.concatenate([self.ids, ids])
+        self.genome = np.concatenate([self.genome, genome])
+        self.sex = np.concatenate([self.sex, np.zeros(n, dtype=np.int8)])
+        self.traits = np.concatenate([self.traits, np.zeros((n, len(TRAITS)), dtype=np.int32)])
+        self._decode(np.arange(len(self) - n, len(self)))
+
+    def _plan(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        columns = (self.world._map, self.x[rows], self.y[rows], self.perception[rows], self.movement[rows])
+        if self.draws is None:
+            return plan(*columns)
+        uniform = iter(self.draws[rows][:, [PICK_CREATURE, PICK_BLANK]].T)
+        return plan(*columns, lambda _: next(uniform))
+
+    def _plan_all(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """分块扫描指定生物，返回其觅食、交互和移动的目标格子"""
+        food, creature, outer = (np.full(len(rows), -1, dtype=np.int64) for _ in range(3))
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            food[chunk], creature[chunk], outer[chunk] = self._plan(rows[chunk])
+        return food, creature, outer
+
+    def _uphill(self, rows: np.ndarray, outer: np.ndarray) -> np.ndarray:
+        """闲逛的生物改为沿食物密度场移动，规则同Creature.uphill，返回新的移动目标"""
+        x, y = self.x[rows], self.y[rows]
+        dx, dy = self.world.food_field.directions(x, y)
+        radius = np.minimum(self.perception[rows], self.movement[rows])
+        tx, ty = x + dx * radius, y + dy * radius
+        height, width = self.world._map.shape
+        cells = ty * width + tx
+        # 同Creature.step，最外圈没有空地时不移动
+        valid = (outer >= 0) & ((dx != 0) | (dy != 0)) & (0 <= tx) & (tx < width) & (0 <= ty) & (ty < height)
+        valid[valid] = self.world._map.take(cells[valid]) == BLANK
+        return np.where(valid, cells, outer)
+
+    def _search_blank(self, rows: np.ndarray, allowed: np.ndarray | None = None) -> np.ndarray:
+        """扫描指定生物周围第一个空地，allowed为额外视为空地的格子"""
+        return search_blank(self.world._map, self.x[rows], self.y[rows], self.perception[rows], allowed)
+
+    def _draw(self, n: int) -> np.ndarray:
+        """为前n个生物生成本年的keyed随机数"""
+        return draw(config.seed, self.year, self.ids[:n])
+
+    def _random(self, rows: np.ndarray) -> np.ndarray:
+        """为每个指定生物生成一个[0, 1)均匀分布的随机数"""
+        return random(len(rows)) if self.draws is None else self.draws[rows, ROLL]
+
+    def _position(self, rows: np.ndarray) -> np.ndarray | None:
+        """指定生物作为主动方重组基因时的断点，None表示由基因池随机选择"""
+        if self.draws is None:
+            return None
+        return (self.draws[rows, RECOMBINE] * self.base_num).astype(np.int64) // 3 * 3
+
+    def _recombine(self, rows: np.ndarray, others: np.ndarray) -> np.ndarray:
+        """指定生物两两重组基因，返回子代基因组的行号"""
+        return self.pool.recombine(self.genome[rows], self.genome[others], self._position(rows))
+
+    def _mutate(self, rows: np.ndarray) -> np.ndarray:
+        """指定生物的基因组突变，返回发生突变的生物"""
+        draws = None if self.draws is None else self.draws[rows][:, [MUTATE, POSITION]]
+        return rows[self.pool.mutate(self.genome[rows], draws=draws)]
+
+    def _register(self, rows: np.ndarray, others: np.ndarray) -> np.ndarray:
+        """在谱系中登记指定生物两两所生的子代，返回子代编号"""
+        return self.world.lineage.add(self.year, self.ids[rows], self.ids[others])
+
+    def _interact(self, actors: np.ndarray, others: np.ndarray):
+        """同性战斗，异性交配，规则同Creature.fight和Creature.mate"""
+        roll = self._random(actors) - self.traits[actors, LUCK] * 0.01
+        same = self.sex[actors] == self.sex[others]
+        # 战斗：败者年龄增加5，主动方获胜时对方食物清零，落败时食物归对方
+        win = same & (roll < 0.5)
+        lose = same & ~win
+        loot = self.food[actors[lose]]
+        events = self.world.events
+        if events is not None:
+            winners, losers = np.concatenate([actors[win], others[lose]]), np.concatenate([others[win], actors[lose]])
+            year, x, y = self.year, self.x, self.y
+            events.extend(FIGHT, year, x[winners], y[winners], x[losers], y[losers], food=self.food[losers])
+        np.add.at(self.life, others[win], 5)
+        self.food[others[win]] = 0
+        np.add.at(self.food, others[lose], loot)
+        self.life[actors[lose]] += 5
+        self.food[actors[lose]] = 0
+        # 交配：优先在对方周围生育，其次在自身周围
+        mate = ~same & (roll <= self.charm[actors])
+        selves, partners = actors[mate], others[mate]
+        child = self._search_blank(partners)
+        child = np.where(child >= 0, child, self._search_blank(selves))
+        born = child >= 0
+        born[born] &= first_claims(child[born])
+        genome = self._recombine(selves[born], partners[born])
+        ids = self._register(selves[born], partners[born])
+        if events is not None:
+            width = self.world._map.shape[1]
+            parents = selves[born]
+            events.extend(
+                BIRTH, self.year, child[born] % width, child[born] // width, self.x[parents], self.y[parents]
+            )
+        return child[born], genome, ids
+
+    def _move(
+        self, rows: np.ndarray, food: np.ndarray, creature: np.ndarray, outer: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """一轮移动：按Creature.step的优先级决策，处理冲突后移动获胜者
+
+        Returns:
+            movers: 移动的生物，按序号排列
+            partner: 每个移动的生物的交互对象，不交互时为-1
+            eat, meet: 每个移动的生物是否觅食、交互
+            losers: 争夺格子失败的生物
+        """
+        world = self.world
+        if world.food_field is not None:
+            outer = self._uphill(rows, outer)
+        eat = (food >= 0) & (self.food[rows] <= config.creature.max_food // 2)
+        meet = ~eat & (creature >= 0) & (self.life[rows] >= config.creature.adult_age) & (self.food[rows] != 0)
+        wander = ~eat & ~meet & (outer >= 0)
+        cells = self.cells
+        partner = np.full(len(rows), -1, dtype=np.int64)
+        if meet.any():
+            # 按格子查找交互对象
+            order = np.argsort(cells)
+            found = order[np.minimum(np.searchsorted(cells[order], creature[meet]), len(cells) - 1)]
+            partner[meet] = np.where(cells[found] == creature[meet], found, -1)
+            meet &= partner >= 0
+        target = np.full(len(rows), -1, dtype=np.int64)
+        target[eat] = food[eat]
+        target[wander] = outer[wander]
+        # 交互时移动到对方周围的空地，自身所在格子也视为空地
+        target[meet] = self._search_blank(partner[meet], allowed=cells[rows[meet]])
+        # 冲突处理后移动
+        claims = np.flatnonzero(target >= 0)
+        won = first_claims(target[claims])
+        index = claims[won]
+        movers = rows[index]
+        world.assign(cells[movers], BLANK)
+        world.assign(target[index], CREATURE)
+        self.x[movers] = target[index] % world._map.shape[1]
+        self.y[movers] = target[index] // world._map.shape[1]
+        return movers, partner[index], eat[index], meet[index], rows[claims[~won]]
+
+    def step(self, year: int):
+        """模拟第year年：死亡 -> 扫描 -> 分轮觅食/交互/移动/出生 -> 衰老 -> 突变，事件、谱系和随机数都使用year"""
+        self.year = year
+        world = self.world
+        metrics = world.metrics
+        # 死亡
+        alive = self.life < config.creature.life
+        if world.events is not None:
+            dead = ~alive
+            world.events.extend(
+                DEATH, self.year, self.x[dead], self.y[dead], life=self.life[dead], food=self.food[dead]
+            )
+        world.assign(self.cells[~alive], BLANK)
+        self.pool.release(self.genome[~alive])
+        self._take(alive)
+        n = self.stepped = len(self)
+        if metrics is not None:
+            metrics.lap("death", deaths=len(alive) - n)
+        self.draws = self._draw(n) if config.world.random == "keyed" else None
+        if not n:
+            return
+        # 扫描
+        pending = np.arange(n)
+        plans = self._plan_all(pending)
+        if metrics is not None:
+            radius = self.perception
+            metrics.lap("scan", scanned=int((4 * radius * (radius + 1)).sum()))
+        # 分轮移动，每轮的交互和出生在下一轮决策前完成，新生的生物可以成为之后各轮的交互对象。
+        # 争夺格子失败的生物在下一轮重新决策，每轮至少有一个生物移动
+        while len(pending):
+            movers, partner, eat, meet, pending = self._move(pending, *plans)
+            self.food[movers[eat]] += 1
+            if world.events is not None:
+                eaten = movers[eat]
+                world.events.extend(EAT, self.year, self.x[eaten], self.y[eaten], food=self.food[eaten])
+            if metrics is not None:
+                metrics.lap("move", moves=len(movers))
+            actors, partners = movers[meet], partner[meet]
+            children, genome, ids = self._interact(actors, partners)
+            if metrics is not None:
+                fights = np.count_nonzero(self.sex[actors] == self.sex[partners])
+                metrics.lap("interact", fights=int(fights), births=len(children))
+            world.assign(children, CREATURE)
+            self._append(children, genome, ids)
+            if metrics is not None:
+                metrics.lap("birth")
+            if len(pending):
+                plans = self._plan_all(pending)
+        # 衰老，当年出生的生物不衰老
+        self.food[:n] = np.maximum(0, self.food[:n] - self.food_cost[:n])
+        self.life[:n] += 1 + (self.food[:n] == 0) * 10
+        if metrics is not None:
+            metrics.lap("age")
+        mutated = self._mutate(np.arange(n))
+        self._decode(mutated)
+        if metrics is not None:
+            metrics.lap("mutate", mutations=len(mutated))
@@ -0,0 +1,197 @@
+"""事件日志：记录出生、死亡、战斗、进食和定期的种群快照，供模拟结束后分析
+
+日志目录结构：
+    events/events-{首年}-{末年}.npy      按年份排序的事件，每个文件是一个EVENT_DTYPE结构化数组
+    snapshots/snapshot-{年份}.npy        该年年末所有生物的SNAPSHOT_DTYPE结构化数组
+
+写入在后台线程中进行，读取时按文件名中的年份选择文件并以内存映射方式打开。
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from ._genome import TRAITS
+
+BIRTH, DEATH, FIGHT, EAT = range(4)
+EVENT_KINDS = ("birth", "death", "fight", "eat")
+
+# x, y为事件发生的位置，other_x, other_y为另一方的位置，没有时为-1
+#   birth: 子代位置，other为发起交配的一方
+#   death: 死亡位置，life和food为死亡时的年龄和食物
+#   fight: 胜者位置，other为败者，food为败者失去的食物
+#   eat: 进食位置，food为进食后的食物量
+EVENT_DTYPE = np.dtype(
+    [
+        ("year", np.int32),
+        ("kind", np.int8),
+        ("x", np.int32),
+        ("y", np.int32),
+        ("other_x", np.int32),
+        ("other_y", np.int32),
+        ("life", np.int32),
+        ("food", np.float32),
+    ]
+)
+SNAPSHOT_DTYPE = np.dtype(
+    [
+        ("x", np.int32),
+        ("y", np.int32),
+        ("food", np.float32),
+        ("life", np.int32),
+        ("id", np.int64),
+        ("sex", np.int8),
+        ("traits", np.int32, (len(TRAITS),)),
+    ]
+)
+
+
+def event_rows(kind: int, year: int, x: np.ndarray, y: np.ndarray, other_x=-1, other_y=-1, life=0, food=0.0):
+    """由各列组成EVENT_DTYPE数组，除year外的参数都可以是数组，除x和y外的参数也可以是标量"""
+    rows = np.empty(len(x), dtype=EVENT_DTYPE)
+    rows["year"], rows["kind"], rows["x"], rows["y"] = year, kind, x, y
+    rows["other_x"], rows["other_y"], rows["life"], rows["food"] = other_x, other_y, life, food
+    return rows
+
+
+class EventLog:
+    """事件日志的写入端，事件攒够chunk_size条后交给后台线程写入一个文件
+
+    待写入的文件数不超过max_pending，写入跟不上时模拟会在提交时等待，以限制内存占用。
+    """
+
+    def __init__(
+        self, path: str | Path, snapshot_every: int = 10, chunk_size: int = 1 << 16, max_pending: int = 8
+    ) -> None:
+        self.path = Path(path)
+        for directory in ("events", "snapshots"):
+            (self.path / directory).mkdir(parents=True, exist_ok=True)
+        self.snapshot_every = snapshot_every
+        self.chunk_size = chunk_size
+        self._chunks: list[np.ndarray] = []
+        self._rows: list[tuple] = []  # 逐个添加的事件
+        self._size = 0
+        self._first_year: int | None = None
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def add(self, kind: int, year: int, x: int, y: int, other_x=-1, other_y=-1, life=0, food=0.0):
+        """添加一条事件"""
+        self._rows.append((year, kind, x, y, other_x, other_y, life, food))
+        self._size += 1
+
+    def extend(self, kind: int, year: int, x: np.ndarray, y: np.ndarray, other_x=-1, other_y=-1, life=0, food=0.0):
+        """批量添加事件，参数同event_rows"""
+        if len(x):
+            self.append(event_rows(kind, year, x, y, other_x, other_y, life, food))
+
+    def append(self, rows: np.ndarray):
+        """添加EVENT_DTYPE数组中的事件"""
+        if not len(rows):
+            return
+        self._collect()
+        self._chunks.append(rows)
+        self._size += len(rows)
+
+    def _collect(self):
+        if self._rows:
+            self._chunks.append(np.array(self._rows, dtype=EVENT_DTYPE))
+            self._rows.clear()
+
+    def end_year(self, year: int, columns: dict[str, np.ndarray] | None = None):
+        """年末调用，事件足够多时提交写入，到达快照年份时提交columns作为快照"""
+        if self._first_year is None:
+            self._first_year = year
+        if self._size >= self.chunk_size:
+            self.flush(year)
+        if columns is not None:
+            snapshot = np.empty(len(columns["x"]), dtype=SNAPSHOT_DTYPE)
+            for field in SNAPSHOT_DTYPE.names:
+                snapshot[field] = columns[field]
+            self._submit(Path("snapshots", f"snapshot-{year:08d}.npy"), snapshot)
+
+    def snapshot_due(self, year: int) -> bool:
+        return bool(self.snapshot_every) and year % self.snapshot_every == 0
+
+    def flush(self, year: int):
+        """提交截至year年的所有事件"""
+        self._collect()
+        if self._chunks:
+            events = np.concatenate(self._chunks)
+            first = self._first_year if self._first_year is not None else int(events["year"][0])
+            self._submit(Path("events", f"events-{first:08d}-{year:08d}.npy"), events)
+        self._chunks.clear()
+        self._size = 0
+        self._first_year = None
+
+    def _submit(self, name: Path, data: np.ndarray):
+        if self._error is not None:
+            raise RuntimeError("事件日志写入失败") from self._error
+        self._queue.put((name, data))
+
+    def _write(self):
+        while (item := self._queue.get()) is not None:
+            name, data = item
+            try:
+                # 先写临时文件，读取端不会看到不完整的文件
+                temp = self.path / name.with_suffix(".tmp")
+                with temp.open("wb") as fp:
+                    np.save(fp, data)
+                os.replace(temp, self.path / name)
+            except BaseException as e:
+                self._error = e
+
+    def close(self, year: int | None = None):
+        """提交剩余事件并等待写入完成"""
+        if self._thread.is_alive():
+            if year is not None:
+                self.flush(year)
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("事件日志写入失败") from self._error
+
+
+def _files(path: Path, pattern: str) -> list[tuple[int, int, Path]]:
+    files = []
+    for file in path.glob(pattern):
+        years = [int(part) for part in file.stem.split("-")[1:]]
+        files.append((years[0], years[-1], file))
+    return sorted(files)
+
+
+def read_events(
+    path: str | Path, start: int | None = None, stop: int | None = None, kind: int | None = None
+) -> np.ndarray:
+    """读取[start, stop)年内的事件，只打开年份范围重叠的文件
+
+    Args:
+        kind: 事件类型，默认返回所有类型
+    """
+    start = -(1 << 31) if start is None else start
+    stop = (1 << 31) - 1 if stop is None else stop
+    parts = [np.empty(0, dtype=EVENT_DTYPE)]
+    for first, last, file in _files(Path(path) / "events", "events-*.npy"):
+        if last < start or first >= stop:
+            continue
+        events = np.load(file, mmap_mode="r")
+        lo, hi = np.searchsorted(events["year"], [start, stop])
+        parts.append(events[lo:hi])
+    events = np.concatenate(parts)
+    return events if kind is None else events[events["kind"] == kind]
+
+
+def read_snapshots(path: str | Path, start: int | None = None, stop: int | None = None) -> dict[int, np.ndarray]:
+    """读取[start, stop)年内的快照，返回年份到内存映射数组的字典"""
+    return {
+        year: np.load(file, mmap_mode="r")
+        for year, _, file in _files(Path(path) / "snapshots", "snapshot-*.npy")
+        if (start is None or year >= start) and (stop is None or year < stop)
+    }
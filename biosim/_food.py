@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import numpy as np
+
+from ._chunked import ChunkedMap
+from ._neighborhood import FOOD
+
+# 查询方向时比较的块相对所在块的偏移(dy, dx)，所在块在最前，食物数量相同时靠前者优先
+NEIGHBORS = ((0, 0), (-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+NEIGHBOR_Y, NEIGHBOR_X = (np.array(offsets) for offsets in zip(*NEIGHBORS))
+SCALE = 4  # 粗一层的块边长是细一层的倍数
+
+
+class FoodField:
+    """粗粒度的食物密度场：将地图划分为block * block的块，记录每块中的食物数量
+
+    刷新食物后由地图重建，之后随格子的修改增量更新。闲逛的生物查询所在块及周围8块中食物最多的一块，
+    朝其中心移动；这9块都没有食物时改为查询块边长为SCALE倍的粗一层，从食物耗尽的区域走向远处的食物。
+    查询最多读取18个计数。
+
+    Attributes:
+        block (int): 块的边长
+        padded (np.ndarray): (块行数 + 2, 块列数 + 2)，四周各多一圈值为-1的块，查询时不需要判断边界
+        centers (tuple[np.ndarray, np.ndarray]): 每块行、每块列的中心坐标y和x，边缘不完整的块取地图内部分的中心
+        coarse (FoodField | None): 粗一层的密度场，本身是粗一层时为None
+    """
+
+    def __init__(self, shape: tuple[int, int], block: int, coarse: bool = True) -> None:
+        self.shape = tuple(shape)
+        self.block = block
+        self.coarse = FoodField(shape, block * SCALE, coarse=False) if coarse else None
+        rows, columns = -(-self.shape[0] // block), -(-self.shape[1] // block)
+        self.padded = np.full((rows + 2, columns + 2), -1, dtype=np.int32)
+        self.padded[1:-1, 1:-1] = 0
+        top, left = np.arange(rows) * block, np.arange(columns) * block
+        self.centers = (
+            (top + np.minimum(top + block, self.shape[0]) - 1) // 2,
+            (left + np.minimum(left + block, self.shape[1]) - 1) // 2,
+        )
+
+    @property
+    def counts(self) -> np.ndarray:
+        """每块中的食物数量"""
+        return self.padded[1:-1, 1:-1]
+
+    def _blocks(self, cells: np.ndarray) -> np.ndarray:
+        """一维索引所在块在padded中的一维索引"""
+        y, x = np.divmod(np.asarray(cells, dtype=np.int64), self.shape[1])
+        return (y // self.block + 1) * self.padded.shape[1] + x // self.block + 1
+
+    def rebuild(self, _map: np.ndarray | ChunkedMap):
+        """由地图重新统计每块的食物数量"""
+        if isinstance(_map, ChunkedMap):
+            cells = _map.flatnonzero(FOOD)
+        else:
+            cells = np.flatnonzero(_map.reshape(-1) == FOOD)
+        for field in self._levels():
+            counts = np.bincount(field._blocks(cells), minlength=field.padded.size).reshape(field.padded.shape)
+            field.counts[:] = counts[1:-1, 1:-1]
+
+    def update(self, cells: np.ndarray, delta: int | np.ndarray):
+        """一维索引cells处的食物数量变化delta"""
+        for field in self._levels():
+            np.add.at(field.padded.reshape(-1), field._blocks(cells), delta)
+
+    def _levels(self) -> tuple[FoodField, ...]:
+        return (self,) if self.coarse is None else (self, self.coarse)
+
+    def direction(self, x: int, y: int) -> tuple[int, int]:
+        """(x, y)朝食物最多的一块中心的方向，各分量为-1、0或1，两层的周围9块都没有食物时为(0, 0)"""
+        x, y = int(x), int(y)
+        by, bx = y // self.block + 1, x // self.block + 1
+        padded, best, target = self.padded, 0, None
+        for oy, ox in NEIGHBORS:
+            value = padded[by + oy, bx + ox]
+            if value > best:
+                best, target = value, (by + oy - 1, bx + ox - 1)
+        if target is None:
+            return (0, 0) if self.coarse is None else self.coarse.direction(x, y)
+        dx, dy = int(self.centers[1][target[1]]) - x, int(self.centers[0][target[0]]) - y
+        return (dx > 0) - (dx < 0), (dy > 0) - (dy < 0)
+
+    def directions(self, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """批量计算direction"""
+        by, bx = y // self.block, x // self.block
+        values = self.padded[by[:, None] + NEIGHBOR_Y + 1, bx[:, None] + NEIGHBOR_X + 1]
+        best = values.argmax(axis=1)
+        found = values[np.arange(len(values)), best] > 0
+        ty, tx = np.where(found, by + NEIGHBOR_Y[best], 0), np.where(found, bx + NEIGHBOR_X[best], 0)
+        dx = np.where(found, np.sign(self.centers[1][tx] - x), 0)
+        dy = np.where(found, np.sign(self.centers[0][ty] - y), 0)
+        if self.coarse is not None and not found.all():
+            dx[~found], dy[~found] = self.coarse.directions(x[~found], y[~found])
+        return dx, dy
@@ -1,29 +1,170 @@
 from collections import defaultdict
 import random
-from functools import cache
+from functools import lru_cache
+from typing import ClassVar, Iterable, get_args
 
-from ._config import config
+import numpy as np
 
-MASK = 2**config.gene.coden_length - 1  # 密码子掩码
+from ._config import Trait, config
+
+TRAITS: tuple[Trait, ...] = get_args(Trait)  # 性状顺序，批量计算时性状矩阵的列顺序
+
+
+class GenomePool:
+    """基因池，以uint64矩阵保存大量基因组，每行一个基因组，支持批量突变和重组。释放的行通过空闲列表复用。
+
+    Attributes:
+        base_num (int): 碱基数
+        words (np.ndarray): (capacity, word_count)，基因矩阵，低位在前
+        alive (np.ndarray): 每行是否正在使用
+        version (np.ndarray): 每行的修改次数，基因变化时增加，用于判断缓存是否失效
+    """
+
+    _shared: ClassVar[dict[int, "GenomePool"]] = {}
+
+    def __init__(self, base_num: int | None = None, capacity: int = 1024) -> None:
+        self.base_num = base_num or config.gene.base_num
+        self.words = np.zeros((capacity, word_count(self.base_num)), dtype=np.uint64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.version = np.zeros(capacity, dtype=np.uint32)
+        self._free: list[int] = []
+        self._size = 0  # 已分配过的行数
+
+    @classmethod
+    def shared(cls, base_num: int) -> "GenomePool":
+        """Genome默认使用的基因池，每种碱基数一个"""
+        if base_num not in cls._shared:
+            cls._shared[base_num] = cls(base_num)
+        return cls._shared[base_num]
+
+    def __len__(self) -> int:
+        return self._size - len(self._free)
+
+    def allocate(self, words: np.ndarray) -> np.ndarray:
+        """保存一批基因组，返回其行号"""
+        reuse = self._free[len(self._free) - len(words) :] if len(words) else []
+        del self._free[len(self._free) - len(reuse) :]
+        fresh = np.arange(self._size, self._size + len(words) - len(reuse))
+        self._size += len(fresh)
+        if self._size > len(self.words):
+            capacity = max(self._size, 2 * len(self.words))
+            for name in ("words", "alive", "version"):
+                old = getattr(self, name)
+                new = np.zeros((capacity, *old.shape[1:]), dtype=old.dtype)
+                new[: len(old)] = old
+                setattr(self, name, new)
+        rows = np.concatenate([np.array(reuse, dtype=np.int64), fresh])
+        self.words[rows] = words
+        self.alive[rows] = True
+        self.version[rows] += 1
+        return rows
+
+    def release(self, rows: np.ndarray | int):
+        rows = np.atleast_1d(rows)
+        self.alive[rows] = False
+        self._free.extend(rows.tolist())
+
+    def get(self, row: int) -> int:
+        return unpack_gene(self.words[row])
+
+    def set(self, row: int, gene: int):
+        self.words[row] = pack_genes([gene], self.base_num)[0]
+        self.version[row] += 1
+
+    def mutate(
+        self,
+        rows: np.ndarray | list[int] | None = None,
+        rng: np.random.RandomState | None = None,
+        draws: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """以二项分布抽取本次的突变个数，只对抽中的基因组随机翻转一位碱基
+
+        Args:
+            rows: 参与突变的行，默认为所有正在使用的行
+            rng: 随机数生成器，默认使用全局随机数
+            draws: (len(rows), 2)，每行预先生成的两个[0, 1)随机数，分别决定是否突变和突变的位置，不为None时不使用rng
+        Returns:
+            rows中发生突变的序号
+        """
+        rng = np.random if rng is None else rng
+        rows = np.flatnonzero(self.alive) if rows is None else np.asarray(rows, dtype=np.int64)
+        if draws is not None:
+            index = np.flatnonzero(draws[:, 0] < config.gene.mutation_rate)
+            position = (draws[index, 1] * self.base_num).astype(np.int64)
+        else:
+            count = rng.binomial(len(rows), config.gene.mutation_rate)
+            if not count:
+                return np.empty(0, dtype=np.int64)
+            index = rng.choice(len(rows), count, replace=False)
+            position = rng.randint(0, self.base_num, count)
+        hit = rows[index]
+        self.words[hit, position // 64] ^= np.uint64(1) << (position % 64).astype(np.uint64)
+        self.version[hit] += 1
+        return index
+
+    def recombine(
+        self, rows: np.ndarray, others: np.ndarray, position: np.ndarray | None = None
+    ) -> np.ndarray:
+        """批量基因重组，规则同Genome.recombine，返回子代所在的行
+
+        Args:
+            rows, others: 父母双方所在的行，子代保留rows中position及以上的碱基，其余碱基取自others
+            position: 每对父母的断点，默认随机选择
+        """
+        rows, others = np.asarray(rows, dtype=np.int64), np.asarray(others, dtype=np.int64)
+        if position is None:
+            position = np.random.randint(0, self.base_num, len(rows)) // 3 * 3
+        return self.allocate(recombine_words(self.words[rows], self.words[others], position))
 
 
 class Genome:
-    """基因组信息
+    """基因组信息，是基因池中一行的视图
 
     Attributes:
         _gene (int): 基因信息，用数字表示，每个bit位表示一个碱基，coden_length个碱基表示一个性状
         _base_num (int): 碱基数（比特数），可以通过竞争获取他人基因来增加碱基数
-        _cached_traits (dict): 缓存的性状
+        _pool (GenomePool): 保存基因的基因池
+        _row (int): 在基因池中的行号
+        _cache (tuple): 缓存的(版本号, 性状, 性别)，版本号与基因池中不一致时失效
     """
 
-    __slots__ = "_gene", "_base_num"
+    __slots__ = "_pool", "_row", "_base_num", "_cache"
 
-    def __init__(self, gene: int = 0):
-        self._base_num = config.gene.base_num
+    def __init__(self, gene: int = 0, pool: GenomePool | None = None):
+        self._pool = GenomePool.shared(config.gene.base_num) if pool is None else pool
+        self._base_num = self._pool.base_num
         if gene:
-            self._gene = min(gene, 2**self._base_num - 1)
+            gene = min(gene, 2**self._base_num - 1)
         else:
-            self._gene = random.randint(1, 2**self._base_num - 1)
+            gene = random.randint(1, 2**self._base_num - 1)
+        self._row = int(self._pool.allocate(pack_genes([gene], self._base_num))[0])
+        self._cache = None
+
+    @classmethod
+    def _from_row(cls, pool: GenomePool, row: int) -> "Genome":
+        """接管基因池中已分配的一行"""
+        genome = cls.__new__(cls)
+        genome._pool, genome._row, genome._base_num = pool, int(row), pool.base_num
+        genome._cache = None
+        return genome
+
+    def __del__(self):
+        # 释放所在行以便复用
+        try:
+            self._pool.release(self._row)
+        except AttributeError:  # 初始化未完成
+            pass
+
+    def __reduce__(self):
+        return Genome, (self._gene,)
+
+    @property
+    def _gene(self) -> int:
+        return self._pool.get(self._row)
+
+    @_gene.setter
+    def _gene(self, gene: int):
+        self._pool.set(self._row, gene)
 
     def __str__(self) -> str:
         return f"{self._gene:0{self._base_num}b}"
@@ -39,27 +180,126 @@ class Genome:
         self._gene ^= 1 << position
         return True
 
-    def recombine(self, other: "Genome") -> "Genome":
-        """基因重组，将两个基因组以基因为单位进行随机重组"""
-        position = random.randint(0, self._base_num - 1) // 3 * 3
+    def recombine(self, other: "Genome", position: int | None = None) -> "Genome":
+        """基因重组，将两个基因组以基因为单位进行随机重组，position为断点，默认随机选择"""
+        if position is None:
+            position = random.randint(0, self._base_num - 1) // 3 * 3
         # 保留position左边的基因，右边的基因从other中获取
-        new_gene = (self._gene >> position << position) | (other._gene & (2**position - 1))
-        return Genome(new_gene)
+        (row,) = self._pool.recombine([self._row], [other._row], np.array([position]))
+        return Genome._from_row(self._pool, row)
 
     __and__ = recombine
 
+    def _decode(self) -> tuple[int, defaultdict[str, int], int]:
+        version = int(self._pool.version[self._row])
+        if self._cache is None or self._cache[0] != version:
+            words = self._pool.words[self._row : self._row + 1]
+            counts = TraitDecoder.get(self._base_num).decode(words)[0]
+            traits = defaultdict(int, {t: int(c) for t, c in zip(TRAITS, counts) if c})
+            self._cache = version, traits, int(popcount(words)[0]) % 2
+        return self._cache
+
     @property
-    @cache
     def traits(self) -> defaultdict[str, int]:
-        """根据基因获取性状, 并缓存。计算方法为基因不断右移，通过掩码获取密码子，再根据密码子表获取性状。
+        """根据基因获取性状，结果缓存在实例中，基因突变后自动失效。计算方法见TraitDecoder"""
+        return self._decode()[1]
+
+    @property
+    def sex(self) -> int:
+        return self._decode()[2]
+
+
+class TraitDecoder:
+    """查表计算性状。
+
+    基因不断右移，通过掩码获取密码子，再根据密码子表获取性状。例如gene = 0b111101, coden_length = 3时，
+    第一个性状为 gene >> 0 & 0b111 = 0b101 = 5，取密码子表索引为5的性状；
+    第二个性状为 gene >> 3 & 0b111 = 0b111 = 7，取密码子表索引为7的性状。
+
+    为了避免逐个密码子计算，将基因按window位（coden_length的整数倍，不超过16位）分段，
+    预先计算每种分段取值包含的各性状数量，计算时每段只需查一次表。
+
+    Attributes:
+        window (int): 每段的比特数
+        table (np.ndarray): (2**window, len(TRAITS))，每种分段取值对应的各性状数量
+    """
+
+    def __init__(self, base_num: int, coden_length: int, coden_table: tuple[Trait, ...]) -> None:
+        self.base_num = base_num
+        self.window = coden_length * max(16 // coden_length, 1)
+        codens = self.window // coden_length
+        values = np.arange(2**self.window)
+        shifts = np.arange(codens) * coden_length
+        trait_index = np.array([TRAITS.index(trait) for trait in coden_table])
+        traits = trait_index[values[:, None] >> shifts & (2**coden_length - 1)]
+        self.table = (traits[..., None] == np.arange(len(TRAITS))).sum(axis=1, dtype=np.int32)
+        # 最后一段超出碱基数的部分为0，会被当作密码子0计数，需要扣除
+        self.offsets = np.arange(0, base_num, self.window)
+        self.padding = np.zeros(len(TRAITS), dtype=np.int32)
+        self.padding[trait_index[0]] = len(self.offsets) * codens - base_num // coden_length
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _get(base_num: int, coden_length: int, coden_table: tuple[Trait, ...]) -> "TraitDecoder":
+        return TraitDecoder(base_num, coden_length, coden_table)
 
-        例子:
-            gene = 0b111101, coden_length = 3
-            第一个性状为 gene >> 0 & MASK = 0b101 = 5，取密码子表索引为5的性状。
-            第二个性状为 gene >> 3 & MASK = 0b111 = 7，取密码子表索引为7的性状。
+    @classmethod
+    def get(cls, base_num: int) -> "TraitDecoder":
+        """获取当前配置对应的解码器，查找表只构建一次"""
+        return cls._get(base_num, config.gene.coden_length, tuple(config.gene.coden_table))
+
+    def decode(self, words: np.ndarray) -> np.ndarray:
+        """批量计算性状
+
+        Args:
+            words: (n, word_count)，每行为一个基因组
+        Returns:
+            (n, len(TRAITS))，每列为对应性状的基因数量
         """
-        traits = defaultdict(int)
-        for i in range(0, self._base_num, config.gene.coden_length):
-            trait = config.gene.coden_table[self._gene >> i & MASK]
-            traits[trait] += 1
-        return traits
+        words = np.asarray(words, dtype=np.uint64)
+        index, shift = self.offsets // 64, (self.offsets % 64).astype(np.uint64)
+        values = words[:, index] >> shift
+        # 跨越两个word的分段需要拼接下一个word的低位
+        cross = (self.offsets % 64 + self.window > 64) & (index + 1 < words.shape[1])
+        if cross.any():
+            high = words[:, index[cross] + 1] << (np.uint64(64) - shift[cross])
+            values[:, cross] |= high
+        values &= np.uint64(2**self.window - 1)
+        return self.table[values.astype(np.intp)].sum(axis=1, dtype=np.int32) - self.padding
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """每行基因组中1的个数"""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    as_bytes = np.ascontiguousarray(words, dtype="<u8").view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1, dtype=np.int64)
+
+
+def word_count(base_num: int) -> int:
+    """保存base_num个碱基所需的uint64个数"""
+    return (base_num + 63) // 64
+
+
+def pack_genes(genes: Iterable[int], base_num: int) -> np.ndarray:
+    """将整数表示的基因打包为uint64矩阵，每行一个基因组，低位在前"""
+    n_bytes = word_count(base_num) * 8
+    buffer = b"".join(gene.to_bytes(n_bytes, "little") for gene in genes)
+    return np.frombuffer(buffer, dtype="<u8").reshape(-1, n_bytes // 8).astype(np.uint64)
+
+
+def unpack_gene(words: np.ndarray) -> int:
+    """将一行uint64还原为整数表示的基因"""
+    return int.from_bytes(words.astype("<u8").tobytes(), "little")
+
+
+def recombine_words(words: np.ndarray, others: np.ndarray, position: np.ndarray) -> np.ndarray:
+    """按断点两两重组打包后的基因，保留words中position及以上的碱基，其余碱基取自others"""
+    # 每个word中取自others的低位数量
+    low = np.clip(np.asarray(position)[:, None] - 64 * np.arange(words.shape[1]), 0, 64)
+    mask = np.where(
+        low == 64,
+        ~np.uint64(0),
+        (np.uint64(1) << np.minimum(low, 63).astype(np.uint64)) - np.uint64(1),
+    )
+    return (words & ~mask) | (others & mask)
@@ -0,0 +1,242 @@
+"""地图历史：按年记录地图的变化，之后可以不重新模拟而还原任意一年的地图并回放
+
+目录结构：
+    history.json    地图大小和关键帧间隔
+    frames.bin      依次追加的压缩记录
+    index.bin       每条记录一个INDEX_DTYPE，记录所在的年份、类型以及在frames.bin中的位置
+
+每条记录是一组格子的一维索引和新的值：关键帧为整张地图上所有非空地的格子，相当于相对空白地图的变化，
+其余为相对上一条记录的变化。索引保存为与前一个索引的差，和值一起用zlib压缩。写入在后台线程中进行，
+读取时以内存映射方式打开两个文件，从不晚于目标年份的最近关键帧开始依次应用变化。
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from ._chunked import ChunkedMap
+from ._neighborhood import BLANK, CREATURE, FOOD
+from .utils import Drawer
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("year", np.int32),
+        ("keyframe", np.bool_),
+        ("changes", np.int64),  # 变化的格子数量
+        ("offset", np.int64),
+        ("size", np.int64),
+    ]
+)
+
+
+def _cell_dtype(shape: tuple[int, int]) -> np.dtype:
+    """保存索引差所用的类型"""
+    return np.dtype(np.uint32 if shape[0] * shape[1] <= 1 << 32 else np.uint64)
+
+
+def _occupied(_map: np.ndarray | ChunkedMap) -> tuple[np.ndarray, np.ndarray]:
+    """所有非空地格子的有序一维索引和值"""
+    if isinstance(_map, ChunkedMap):
+        cells = np.sort(np.concatenate([_map.flatnonzero(FOOD), _map.flatnonzero(CREATURE)]))
+        return cells, _map.take(cells)
+    cells = np.flatnonzero(_map.reshape(-1) != BLANK)
+    return cells, _map.reshape(-1)[cells]
+
+
+class MapHistory:
+    """地图历史的写入端，每年年末调用record
+
+    第一条记录和每keyframe_every年写入关键帧，变化超过地图上非空地格子数量时也写入关键帧，
+    回放任意一年时最多应用keyframe_every条变化。待写入的记录数不超过max_pending。
+
+    path中已有记录时在其后追加，第一次record时删除年份不早于该年的记录，从快照恢复后可以继续写入同一目录。
+    """
+
+    def __init__(
+        self, path: str | Path, shape: tuple[int, int], keyframe_every: int = 100, level: int = 1, max_pending: int = 8
+    ) -> None:
+        """
+        Args:
+            level: zlib压缩等级
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.shape = tuple(shape)
+        self.keyframe_every = keyframe_every
+        self.level = level
+        meta = self.path / "history.json"
+        if meta.exists() and tuple(json.loads(meta.read_text())["shape"]) != self.shape:
+            raise ValueError(f"{self.path}中的地图大小与{self.shape}不一致")
+        meta.write_text(json.dumps({"shape": self.shape, "keyframe_every": keyframe_every}))
+        self._index = (self.path / "index.bin").open("ab")
+        self._frames = (self.path / "frames.bin").open("ab")
+        self._cell_dtype = _cell_dtype(self.shape)
+        # 上一条记录后的地图：稠密地图保存副本，稀疏地图保存非空地格子
+        self._last: np.ndarray | tuple[np.ndarray, np.ndarray] | None = None
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def record(self, year: int, _map: np.ndarray | ChunkedMap):
+        """记录year年年末的地图"""
+        if self._last is None:
+            self._truncate(year)
+        if isinstance(_map, ChunkedMap):
+            current = _occupied(_map)
+            cells, values = current if self._last is None else self._diff(*self._last, *current)
+        else:
+            current = _map.copy()
+            if self._last is None:
+                cells, values = _occupied(_map)
+            else:
+                cells = np.flatnonzero(self._last.reshape(-1) != current.reshape(-1))
+                values = current.reshape(-1)[cells]
+        keyframe = self._last is None or (bool(self.keyframe_every) and year % self.keyframe_every == 0)
+        if not keyframe:
+            occupied = len(current[0]) if isinstance(current, tuple) else np.count_nonzero(current)
+            keyframe = len(cells) > occupied
+        if keyframe and self._last is not None:
+            cells, values = current if isinstance(current, tuple) else _occupied(current)
+        self._last = current
+        if self._error is not None:
+            raise RuntimeError("地图历史写入失败") from self._error
+        self._queue.put((year, keyframe, cells, values))
+
+    @staticmethod
+    def _diff(
+        cells: np.ndarray, values: np.ndarray, new_cells: np.ndarray, new_values: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """两组非空地格子之间变化的格子和新的值"""
+        union = np.union1d(cells, new_cells)
+        old, new = np.zeros((2, len(union)), dtype=np.int8)
+        old[np.searchsorted(union, cells)] = values
+        new[np.searchsorted(union, new_cells)] = new_values
+        changed = old != new
+        return union[changed], new[changed]
+
+    def _truncate(self, year: int):
+        """删除年份不早于year的记录"""
+        self._index.flush()
+        index = np.fromfile(self.path / "index.bin", dtype=INDEX_DTYPE)
+        position = int(np.searchsorted(index["year"], year))
+        if position < len(index):
+            self._index.truncate(position * INDEX_DTYPE.itemsize)
+            self._frames.truncate(int(index["offset"][position]))
+
+    def _write(self):
+        while (item := self._queue.get()) is not None:
+            year, keyframe, cells, values = item
+            try:
+                gaps = np.diff(cells, prepend=0).astype(self._cell_dtype)
+                data = zlib.compress(gaps.tobytes() + values.astype(np.int8).tobytes(), self.level)
+                # 先写数据再写索引，读取端只会看到完整的记录
+                offset = self._frames.seek(0, 2)
+                self._frames.write(data)
+                self._frames.flush()
+                row = np.array([(year, keyframe, len(cells), offset, len(data))], dtype=INDEX_DTYPE)
+                self._index.write(row.tobytes())
+                self._index.flush()
+            except BaseException as e:
+                self._error = e
+
+    def close(self):
+        """等待写入完成"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self._index.close()
+            self._frames.close()
+        if self._error is not None:
+            raise RuntimeError("地图历史写入失败") from self._error
+
+
+class History:
+    """地图历史的读取端，按年份还原地图
+
+    Attributes:
+        shape (tuple[int, int]): 地图大小
+        index (np.ndarray): 所有记录的INDEX_DTYPE数组
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.shape = tuple(json.loads((self.path / "history.json").read_text())["shape"])
+        self._cell_dtype = _cell_dtype(self.shape)
+        self.index = self._map_file("index.bin", INDEX_DTYPE)
+        self._frames = self._map_file("frames.bin", np.uint8)
+
+    def _map_file(self, name: str, dtype) -> np.ndarray:
+        """以内存映射方式打开文件，忽略末尾不完整的记录"""
+        file, dtype = self.path / name, np.dtype(dtype)
+        count = file.stat().st_size // dtype.itemsize
+        return np.memmap(file, dtype, "r", shape=(count,)) if count else np.empty(0, dtype=dtype)
+
+    @property
+    def years(self) -> np.ndarray:
+        return self.index["year"]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, year: int) -> bool:
+        position = np.searchsorted(self.years, year)
+        return bool(position < len(self) and self.years[position] == year)
+
+    def _changes(self, position: int) -> tuple[np.ndarray, np.ndarray]:
+        """第position条记录的格子和值"""
+        record = self.index[position]
+        data = zlib.decompress(self._frames[record["offset"] : record["offset"] + record["size"]])
+        n = int(record["changes"])
+        gaps = np.frombuffer(data, dtype=self._cell_dtype, count=n)
+        return np.cumsum(gaps, dtype=np.int64), np.frombuffer(data, dtype=np.int8, offset=n * gaps.itemsize)
+
+    def __getitem__(self, year: int) -> np.ndarray:
+        """year年年末的地图"""
+        if year not in self:
+            raise KeyError(f"没有第{year}年的记录")
+        return next(self.frames(year, year + 1))[1]
+
+    def frames(self, start: int | None = None, stop: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+        """依次还原[start, stop)年内每条记录的年份和地图，地图为同一个数组，就地更新"""
+        years = self.years
+        first = 0 if start is None else int(np.searchsorted(years, start))
+        last = len(self) if stop is None else int(np.searchsorted(years, stop))
+        if first >= last:
+            return
+        # 从不晚于第一条记录的最近关键帧开始
+        keyframes = np.flatnonzero(self.index["keyframe"][: first + 1])
+        _map = np.zeros(self.shape, dtype=np.int8)
+        flat = _map.reshape(-1)
+        for position in range(int(keyframes[-1]), last):
+            if self.index["keyframe"][position]:
+                flat[:] = BLANK
+            cells, values = self._changes(position)
+            flat[cells] = values
+            if position >= first:
+                yield int(years[position]), _map
+
+    def replay(self, drawer: Drawer, start: int | None = None, stop: int | None = None, delay: int = 1) -> int:
+        """将[start, stop)年的地图依次交给Drawer或FrameWriter绘制，返回提交的帧数
+
+        Drawer繁忙时等待而不是丢弃，回放的速度由绘制速度和每帧的延迟delay毫秒决定。绘制进程退出时停止回放。
+        """
+        count = 0
+        for _, _map in self.frames(start, stop):
+            if not drawer.process.is_alive():
+                break
+            counts = np.bincount(_map.reshape(-1), minlength=3)
+            count += drawer.draw(_map, delay, int(counts[FOOD]), int(counts[CREATURE]), block=True)
+        return count
+
+
+def read_history(path: str | Path) -> History:
+    """打开MapHistory写入的目录"""
+    return History(path)
@@ -0,0 +1,431 @@
+"""object引擎的编译内核：用numba将World.step中逐个生物的循环编译为机器码
+
+内核按槽位顺序逐个模拟生物，每个生物都能看到之前的生物对地图的修改，扫描、进食、随机移动、战斗、交配和衰老
+的规则与Creature完全相同。Python的random通过预先取出的Mersenne Twister输出在内核中复现，
+random()、choice和randint的取值方式与CPython一致，因此相同种子的结果与Python实现逐位相同。
+使用keyed随机数时直接读取World.draws。
+
+年初从Creature收集坐标、食物、年龄和基因组到按槽位排列的数组，内核直接修改地图、槽位网格和格子数量，
+年末再将结果写回Creature并创建新生的生物。只在World.step中按需导入，未安装numba时不使用。
+"""
+
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ._config import config
+from ._coordinate import Coordinate
+from ._creature import Creature
+from ._engine import MAX_RADIUS
+from ._events import BIRTH, DEATH, EAT, FIGHT
+from ._food import NEIGHBOR_X, NEIGHBOR_Y, SCALE
+from ._genome import TRAITS, Genome, GenomePool, TraitDecoder
+from ._neighborhood import BLANK, CREATURE, FOOD, offset_table
+from ._streams import PICK_BLANK, PICK_CREATURE, PURPOSES, RECOMBINE, ROLL
+
+if TYPE_CHECKING:
+    from ._world import World
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+available = njit is not None
+_jit = njit(cache=True) if available else (lambda func: func)
+
+# ints的列
+X, Y, LIFE, ID, PERCEPTION, MOVEMENT, SEX, LUCK = range(8)
+# floats的列
+FOOD_, CHARM, COST = range(3)
+# state中的计数，FREE为空闲槽位栈的长度，SLOTS为槽位列表的长度
+FREE, SLOTS, NEXT_ID, BIRTHS, EVENTS, CURSOR, SCANNED, MOVES, FIGHTS, DEATHS = range(10)
+MARGIN = 64  # 每个生物开始模拟前至少剩余的随机数个数
+DRAWS_PER_CREATURE = 8  # 每次预取的随机数个数按剩余生物数估计
+
+_INT, _PHYSIQUE, _LOOKS, _LUCK = (TRAITS.index(trait) for trait in ("智力", "体力", "外貌", "幸运"))
+
+
+@_jit
+def _word(draws, state):
+    """下一个32位随机数"""
+    i = state[CURSOR]
+    if i >= len(draws):
+        raise RuntimeError("预取的随机数不足")
+    state[CURSOR] = i + 1
+    return np.int64(draws[i])
+
+
+@_jit
+def _random(draws, state):
+    """同random.random"""
+    a = _word(draws, state) >> 5
+    b = _word(draws, state) >> 6
+    return (a * 67108864.0 + b) * (1.0 / 9007199254740992.0)
+
+
+@_jit
+def _randbelow(n, draws, state):
+    """同random.Random._randbelow，n不超过2**32"""
+    k = 0
+    while (n >> k) > 0:
+        k += 1
+    r = _word(draws, state) >> (32 - k)
+    while r >= n:
+        r = _word(draws, state) >> (32 - k)
+    return r
+
+
+@_jit
+def _uniform(s, purpose, uniforms, draws, state):
+    """同Creature.roll中的随机数，uniforms为空时使用预取的Python随机数"""
+    if len(uniforms):
+        return uniforms[s, purpose]
+    return _random(draws, state)
+
+
+@_jit
+def _below(n, s, purpose, uniforms, draws, state):
+    """同Creature.choose和Genome.recombine中[0, n)的随机整数"""
+    if len(uniforms):
+        return np.int64(uniforms[s, purpose] * n)
+    return _randbelow(n, draws, state)
+
+
+@_jit
+def _set(_map, counts, x, y, value):
+    """同World.__setitem__"""
+    counts[_map[y, x]] -= 1
+    counts[value] += 1
+    _map[y, x] = value
+
+
+@_jit
+def _decode(words, s, ints, floats, table, offsets, window, padding, init_gene_count):
+    """同TraitDecoder.decode，并计算Creature中由性状决定的属性"""
+    nw = words.shape[1]
+    traits = np.zeros(len(padding), dtype=np.int64)
+    for offset in offsets:
+        index, shift = offset // 64, np.uint64(offset % 64)
+        value = words[s, index] >> shift
+        if offset % 64 + window > 64 and index + 1 < nw:
+            value |= words[s, index + 1] << (np.uint64(64) - shift)
+        row = table[value & np.uint64(2**window - 1)]
+        for t in range(len(traits)):
+            traits[t] += row[t]
+    traits -= padding
+    ones = 0
+    for i in range(nw):
+        word = words[s, i]
+        while word:
+            word &= word - np.uint64(1)
+            ones += 1
+    ints[s, PERCEPTION] = min(1 + traits[_INT], MAX_RADIUS)
+    ints[s, MOVEMENT] = min(1 + traits[_PHYSIQUE], MAX_RADIUS)
+    ints[s, SEX] = ones % 2
+    ints[s, LUCK] = traits[_LUCK]
+    floats[s, CHARM] = (traits[_LOOKS] * 2 + 0.5 * traits[_PHYSIQUE] + 0.5 * traits[_INT]) / init_gene_count
+    floats[s, COST] = (traits[_PHYSIQUE] + traits[_INT] - 0.5 * traits[_LOOKS]) / init_gene_count
+
+
+@_jit
+def _search_blank(_map, x, y, perception, dx, dy):
+    """同Creature.search_blank，返回一维索引，没有空地时为-1"""
+    height, width = _map.shape
+    for k in range(4 * perception * (perception + 1)):
+        nx, ny = x + dx[k], y + dy[k]
+        if 0 <= nx < width and 0 <= ny < height and _map[ny, nx] == BLANK:
+            return ny * width + nx
+    return -1
+
+
+@_jit
+def _target(field, centers_y, centers_x, block, x, y):
+    """同FoodField.direction的一层，返回食物最多的一块的中心，周围9块都没有食物时返回(-1, -1)"""
+    by, bx = y // block + 1, x // block + 1
+    best, ty, tx = 0, 0, 0
+    for k in range(len(NEIGHBOR_Y)):
+        value = field[by + NEIGHBOR_Y[k], bx + NEIGHBOR_X[k]]
+        if value > best:
+            best, ty, tx = value, by + NEIGHBOR_Y[k] - 1, bx + NEIGHBOR_X[k] - 1
+    if best == 0:
+        return -1, -1
+    return centers_x[tx], centers_y[ty]
+
+
+@_jit
+def _uphill(_map, field, centers_y, centers_x, coarse, coarse_y, coarse_x, block, x, y, radius):
+    """同Creature.uphill，field和coarse为FoodField.padded和FoodField.coarse.padded，返回一维索引，没有目标时为-1"""
+    cx, cy = _target(field, centers_y, centers_x, block, x, y)
+    if cx < 0:
+        cx, cy = _target(coarse, coarse_y, coarse_x, block * SCALE, x, y)
+        if cx < 0:
+            return -1
+    dx, dy = np.sign(cx - x), np.sign(cy - y)
+    if dx == 0 and dy == 0:
+        return -1
+    height, width = _map.shape
+    nx, ny = x + dx * radius, y + dy * radius
+    if 0 <= nx < width and 0 <= ny < height and _map[ny, nx] == BLANK:
+        return ny * width + nx
+    return -1
+
+
+@_jit
+def _event(events, event_food, state, kind, x, y, other_x, other_y, life, food):
+    row = events[state[EVENTS]]
+    row[0], row[1], row[2], row[3], row[4], row[5] = kind, x, y, other_x, other_y, life
+    event_food[state[EVENTS]] = food
+    state[EVENTS] += 1
+
+
+@_jit
+def _move(_map, counts, ints, s, cell, state):
+    """同Creature.move"""
+    width = _map.shape[1]
+    ints[s, X], ints[s, Y] = cell % width, cell // width
+    _set(_map, counts, ints[s, X], ints[s, Y], CREATURE)
+    state[MOVES] += 1
+
+
+@_jit
+def _step_all(
+    order, start, _map, index, counts, ints, floats, words, free, births, events, event_food, stepped,
+    draws, uniforms, state, dx, dy, radius, table, offsets, window, padding, field, centers_y, centers_x,
+    coarse, coarse_y, coarse_x, params,
+):  # fmt: skip
+    """从order[start]开始逐个模拟，剩余随机数不足MARGIN时返回下一个生物在order中的位置
+
+    Args:
+        order: 年初所有生物的槽位号，按槽位顺序排列
+        births: (n, 3)，新生生物的槽位号和双亲编号，双亲中第一个为发起交配的一方
+        stepped: order中各生物本年是否参与模拟，即未在轮到时死亡
+        uniforms: 使用keyed随机数时按槽位排列的World.draws，否则为空
+        field, centers_y, centers_x: 食物密度场的FoodField.padded和FoodField.centers，不使用时field为空
+        coarse, coarse_y, coarse_x: 粗一层密度场的padded和centers
+        params: 寿命、成年年龄、食物上限、初始基因数量、碱基数和食物密度场的块边长
+    """
+    max_life, adult_age, max_food, init_gene_count, base_num, block = params
+    height, width = _map.shape
+    nw = words.shape[1]
+    creatures = np.empty(4 * MAX_RADIUS * (MAX_RADIUS + 1), dtype=np.int64)
+    outer = np.empty_like(creatures)
+    for i in range(start, len(order)):
+        if not len(uniforms) and state[CURSOR] + MARGIN > len(draws):
+            return i
+        s = order[i]
+        x, y = ints[s, X], ints[s, Y]
+        if ints[s, LIFE] >= max_life:
+            _event(events, event_food, state, DEATH, x, y, -1, -1, ints[s, LIFE], floats[s, FOOD_])
+            _set(_map, counts, x, y, BLANK)
+            index[y, x] = -1
+            free[state[FREE]] = s
+            state[FREE] += 1
+            state[DEATHS] += 1
+            continue
+        stepped[i] = True
+        # 生物在移动期间不占据格子
+        _set(_map, counts, x, y, BLANK)
+        index[y, x] = -1
+
+        # 扫描周围，食物取半径最大的一圈中扫描顺序最靠前的一个
+        perception = ints[s, PERCEPTION]
+        ring = min(perception, ints[s, MOVEMENT])
+        food, food_radius, n_creatures, n_outer = -1, 0, 0, 0
+        for k in range(4 * perception * (perception + 1)):
+            nx, ny = x + dx[k], y + dy[k]
+            if not (0 <= nx < width and 0 <= ny < height):
+                continue
+            value = _map[ny, nx]
+            if value == FOOD and radius[k] > food_radius:
+                food, food_radius = ny * width + nx, radius[k]
+            elif value == CREATURE:
+                creatures[n_creatures] = ny * width + nx
+                n_creatures += 1
+            elif value == BLANK and radius[k] == ring:
+                outer[n_outer] = ny * width + nx
+                n_outer += 1
+        state[SCANNED] += 4 * perception * (perception + 1)
+
+        if food >= 0 and floats[s, FOOD_] <= max_food // 2:
+            floats[s, FOOD_] += 1
+            if field.size:
+                field[food // width // block + 1, food % width // block + 1] -= 1
+                coarse[food // width // (block * SCALE) + 1, food % width // (block * SCALE) + 1] -= 1
+            _move(_map, counts, ints, s, food, state)
+            _event(events, event_food, state, EAT, ints[s, X], ints[s, Y], -1, -1, 0, floats[s, FOOD_])
+        elif n_creatures and ints[s, LIFE] >= adult_age and floats[s, FOOD_] != 0:
+            cell = creatures[_below(n_creatures, s, PICK_CREATURE, uniforms, draws, state)]
+            o = index[cell // width, cell % width]
+            dst = _search_blank(_map, ints[o, X], ints[o, Y], ints[o, PERCEPTION], dx, dy)
+            if dst >= 0:
+                _move(_map, counts, ints, s, dst, state)
+                roll = _uniform(s, ROLL, uniforms, draws, state) - ints[s, LUCK] * 0.01
+                if ints[s, SEX] == ints[o, SEX]:
+                    state[FIGHTS] += 1
+                    if roll < 0.5:
+                        _event(
+                            events, event_food, state, FIGHT,
+                            ints[s, X], ints[s, Y], ints[o, X], ints[o, Y], 0, floats[o, FOOD_],
+                        )  # fmt: skip
+                        ints[o, LIFE] += 5
+                        floats[o, FOOD_] = 0.0
+                    else:
+                        _event(
+                            events, event_food, state, FIGHT,
+                            ints[o, X], ints[o, Y], ints[s, X], ints[s, Y], 0, floats[s, FOOD_],
+                        )  # fmt: skip
+                        ints[s, LIFE] += 5
+                        floats[o, FOOD_] += floats[s, FOOD_]
+                        floats[s, FOOD_] = 0.0
+                elif roll <= floats[s, CHARM]:
+                    child = _search_blank(_map, ints[o, X], ints[o, Y], ints[o, PERCEPTION], dx, dy)
+                    if child < 0:
+                        child = _search_blank(_map, ints[s, X], ints[s, Y], perception, dx, dy)
+                    if child >= 0:
+                        # 同Genome.recombine，保留position及以上的碱基，其余取自other
+                        position = _below(base_num, s, RECOMBINE, uniforms, draws, state) // 3 * 3
+                        if state[FREE]:
+                            state[FREE] -= 1
+                            c = free[state[FREE]]
+                        else:
+                            c = state[SLOTS]
+                            state[SLOTS] += 1
+                        for j in range(nw):
+                            low = min(max(position - 64 * j, 0), 64)
+                            mask = ~np.uint64(0) if low == 64 else (np.uint64(1) << np.uint64(low)) - np.uint64(1)
+                            words[c, j] = (words[s, j] & ~mask) | (words[o, j] & mask)
+                        _decode(words, c, ints, floats, table, offsets, window, padding, init_gene_count)
+                        ints[c, X], ints[c, Y] = child % width, child // width
+                        ints[c, LIFE], ints[c, ID] = 0, state[NEXT_ID]
+                        floats[c, FOOD_] = 0.0
+                        births[state[BIRTHS], 0] = c
+                        births[state[BIRTHS], 1] = ints[s, ID]
+                        births[state[BIRTHS], 2] = ints[o, ID]
+                        state[NEXT_ID] += 1
+                        state[BIRTHS] += 1
+                        _set(_map, counts, ints[c, X], ints[c, Y], CREATURE)
+                        index[ints[c, Y], ints[c, X]] = c
+                        _event(events, event_food, state, BIRTH, ints[c, X], ints[c, Y], ints[s, X], ints[s, Y], 0, 0.0)
+        elif n_outer:
+            cell = -1
+            if field.size:
+                cell = _uphill(_map, field, centers_y, centers_x, coarse, coarse_y, coarse_x, block, x, y, ring)
+            if cell < 0:
+                cell = outer[_below(n_outer, s, PICK_BLANK, uniforms, draws, state)]
+            _move(_map, counts, ints, s, cell, state)
+
+        # 衰老，同max(0, food - food_cost)
+        rest = floats[s, FOOD_] - floats[s, COST]
+        floats[s, FOOD_] = rest if rest > 0 else 0.0
+        ints[s, LIFE] += 1 + (floats[s, FOOD_] == 0) * 10
+        x, y = ints[s, X], ints[s, Y]
+        _set(_map, counts, x, y, CREATURE)
+        index[y, x] = s
+    return len(order)
+
+
+@_jit
+def _decode_all(order, words, ints, floats, table, offsets, window, padding, init_gene_count):
+    for s in order:
+        _decode(words, s, ints, floats, table, offsets, window, padding, init_gene_count)
+
+
+def _draw(count: int) -> np.ndarray:
+    """取出Python随机数生成器接下来的count个32位输出，getrandbits按低位在前的顺序填充"""
+    return np.frombuffer(random.getrandbits(32 * count).to_bytes(4 * count, "little"), dtype="<u4")
+
+
+def step(world: World) -> list[Creature]:
+    """用编译内核完成World.step中逐个模拟的循环，返回本年参与模拟的生物"""
+    creatures = world.creatures
+    n = len(creatures)
+    capacity = len(world._slots) + n  # 每个生物每年最多生育一次
+    pool = GenomePool.shared(config.gene.base_num)
+    decoder = TraitDecoder.get(pool.base_num)
+    order = np.array([creature.slot for creature in creatures], dtype=np.int64)
+    ints = np.zeros((capacity, 8), dtype=np.int64)
+    floats = np.zeros((capacity, 3), dtype=np.float64)
+    ints[order, X] = [creature._loc.x for creature in creatures]
+    ints[order, Y] = [creature._loc.y for creature in creatures]
+    ints[order, LIFE] = [creature.life for creature in creatures]
+    ints[order, ID] = [creature.id for creature in creatures]
+    floats[order, FOOD_] = [creature.food for creature in creatures]
+    words = np.zeros((capacity, pool.words.shape[1]), dtype=np.uint64)
+    words[order] = pool.words[[creature._genome._row for creature in creatures]]
+    decoder = (decoder.table, decoder.offsets, decoder.window, decoder.padding)
+    _decode_all(order, words, ints, floats, *decoder, config.gene.init_gene_count)
+
+    free = np.zeros(capacity, dtype=np.int64)
+    free[: len(world._free)] = world._free
+    state = np.zeros(10, dtype=np.int64)
+    state[FREE], state[SLOTS], state[NEXT_ID] = len(world._free), len(world._slots), world.lineage.size
+    births = np.zeros((n, 3), dtype=np.int64)
+    events = np.zeros((n, 6), dtype=np.int64)
+    event_food = np.zeros(n, dtype=np.float64)
+    stepped = np.zeros(n, dtype=bool)
+    dx, dy, radius = offset_table(MAX_RADIUS)
+    params = (
+        config.creature.life,
+        config.creature.adult_age,
+        config.creature.max_food,
+        config.gene.init_gene_count,
+        pool.base_num,
+        1 if world.food_field is None else world.food_field.block,
+    )
+    if world.food_field is None:
+        field = (np.zeros((0, 0), dtype=np.int32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)) * 2
+    else:
+        coarse = world.food_field.coarse
+        field = (world.food_field.padded, *world.food_field.centers, coarse.padded, *coarse.centers)
+    keyed = world.draws is not None
+    uniforms = np.zeros((capacity if keyed else 0, len(PURPOSES)))
+    if keyed:
+        uniforms[: len(world.draws)] = world.draws
+    i = 0
+    while i < n:
+        # 内核消耗的随机数个数在运行后才知道，先取出足够多的输出，再让生成器前进实际消耗的个数
+        saved = random.getstate()
+        draws = _draw(0 if keyed else DRAWS_PER_CREATURE * (n - i) + MARGIN)
+        state[CURSOR] = 0
+        i = _step_all(
+            order, i, world._map, world._index, world.counts, ints, floats, words, free, births, events, event_food,
+            stepped, draws, uniforms, state, dx, dy, radius, *decoder, *field, params,
+        )  # fmt: skip
+        random.setstate(saved)
+        random.getrandbits(32 * int(state[CURSOR]))
+
+    # 写回生物的状态，轮到时已死亡的生物让出槽位
+    food, life = floats[order, FOOD_].tolist(), ints[order, LIFE].tolist()
+    x, y = ints[order, X].tolist(), ints[order, Y].tolist()
+    for k, creature in enumerate(creatures):
+        creature.food, creature.life = food[k], life[k]
+        loc = creature._loc
+        if loc.x != x[k] or loc.y != y[k]:
+            creature._loc = Coordinate(x[k], y[k])
+        if not stepped[k]:
+            world._slots[creature.slot] = None
+    births = births[: state[BIRTHS]]
+    if len(births):
+        rows = pool.allocate(words[births[:, 0]])
+        ids = world.lineage.add(world.year, births[:, 1], births[:, 2])
+        world._slots.extend([None] * (int(state[SLOTS]) - len(world._slots)))
+        for slot, row, id in zip(births[:, 0].tolist(), rows.tolist(), ids.tolist()):
+            child = Creature(Coordinate(int(ints[slot, X]), int(ints[slot, Y])), world, Genome._from_row(pool, row))
+            # 新生的生物可能已作为交互的对象被修改
+            child.slot, child.id = slot, id
+            child.food, child.life = float(floats[slot, FOOD_]), int(ints[slot, LIFE])
+            world._slots[slot] = child
+    world._free = free[: state[FREE]].tolist()
+
+    if world.events is not None:
+        rows = events[: state[EVENTS]]
+        world.events.extend(rows[:, 0], world.year, *rows[:, 1:].T, food=event_food[: state[EVENTS]])
+    if world.metrics is not None:
+        names = ("scanned", "moves", "births", "deaths", "fights")
+        counts = state[[SCANNED, MOVES, BIRTHS, DEATHS, FIGHTS]].tolist()
+        world.metrics.lap("move", **dict(zip(names, counts)))
+    return [creature for creature, alive in zip(creatures, stepped.tolist()) if alive]
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def _ranges(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """拼接所有[lo, hi)区间内的整数"""
+    lengths = hi - lo
+    return np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+class Lineage:
+    """谱系：生物按出生顺序获得递增的编号，编号即为数组下标，每个生物只保存出生年份和双亲编号
+
+    子代的编号总是大于双亲，查询按代进行向量化的广度优先搜索。
+
+    Attributes:
+        parents (np.ndarray): (N, 2)，双亲编号，第一亲本为发起交配的一方，初始生物为-1
+        birth (np.ndarray): 出生年份
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self._parents = np.full((capacity, 2), -1, dtype=np.int64)
+        self._birth = np.zeros(capacity, dtype=np.int32)
+        self.size = 0
+        self._children: tuple[int, np.ndarray, np.ndarray] | None = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def parents(self) -> np.ndarray:
+        return self._parents[: self.size]
+
+    @property
+    def birth(self) -> np.ndarray:
+        return self._birth[: self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._parents.nbytes + self._birth.nbytes
+
+    def add(self, year: int, first=-1, second=-1) -> np.ndarray:
+        """登记year年出生的生物，返回新编号，双亲可以是标量或数组"""
+        first, second = np.broadcast_arrays(np.atleast_1d(first), np.atleast_1d(second))
+        n = len(first)
+        if self.size + n > len(self._birth):
+            capacity = max(2 * len(self._birth), self.size + n)
+            parents = np.full((capacity, 2), -1, dtype=np.int64)
+            birth = np.zeros(capacity, dtype=np.int32)
+            parents[: self.size], birth[: self.size] = self.parents, self.birth
+            self._parents, self._birth = parents, birth
+        ids = np.arange(self.size, self.size + n)
+        self._parents[ids, 0], self._parents[ids, 1] = first, second
+        self._birth[ids] = year
+        self.size += n
+        return ids
+
+    @classmethod
+    def restore(cls, parents: np.ndarray, birth: np.ndarray) -> Lineage:
+        lineage = cls(max(len(birth), 1024))
+        lineage.add(0, parents[:, 0], parents[:, 1])
+        lineage._birth[: len(birth)] = birth
+        return lineage
+
+    def ancestors(self, id: int) -> np.ndarray:
+        """所有祖先的编号，升序排列"""
+        found = np.zeros(self.size, dtype=bool)
+        frontier = np.array([id])
+        while len(frontier):
+            frontier = np.unique(self._parents[frontier])
+            frontier = frontier[frontier >= 0]
+            frontier = frontier[~found[frontier]]
+            found[frontier] = True
+        return np.flatnonzero(found)
+
+    def _child_index(self) -> tuple[np.ndarray, np.ndarray]:
+        """按亲本编号排序的(亲本, 子代)，登记新生物后重建"""
+        if self._children is None or self._children[0] != self.size:
+            flat = self.parents.reshape(-1)
+            child = np.repeat(np.arange(self.size), 2)
+            valid = flat >= 0
+            order = np.argsort(flat[valid], kind="stable")
+            self._children = (self.size, flat[valid][order], child[valid][order])
+        return self._children[1], self._children[2]
+
+    def descendants(self, id: int) -> np.ndarray:
+        """所有后代的编号，升序排列"""
+        keys, children = self._child_index()
+        found = np.zeros(self.size, dtype=bool)
+        frontier = np.array([id])
+        while len(frontier):
+            lo, hi = np.searchsorted(keys, frontier, "left"), np.searchsorted(keys, frontier, "right")
+            frontier = np.unique(children[_ranges(lo, hi)])
+            frontier = frontier[~found[frontier]]
+            found[frontier] = True
+        return np.flatnonzero(found)
+
+    def common_ancestor(self, a: int, b: int) -> int:
+        """最近共同祖先的编号，一方是另一方的祖先时返回该方，没有时返回-1
+
+        编号较大者不可能是编号较小者的祖先，因此共同祖先中编号最大的一个没有作为共同祖先的后代。
+        """
+        common = np.intersect1d(np.append(self.ancestors(a), a), np.append(self.ancestors(b), b))
+        return int(common[-1]) if len(common) else -1
+
+    def founders(self, ids: np.ndarray, line: int = 0) -> np.ndarray:
+        """沿第一(line=0)或第二(line=1)亲本一直追溯到的初始生物编号"""
+        parent = self.parents[:, line]
+        root = np.where(parent >= 0, parent, np.arange(self.size))
+        # 指针跳跃，每轮追溯的代数翻倍
+        while True:
+            jumped = root[root]
+            if np.array_equal(jumped, root):
+                break
+            root = jumped
+        return root[np.asarray(ids, dtype=np.int64)]
+
+    def surviving(self, ids: np.ndarray, line: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """仍有后代存活的支系：返回支系始祖的编号和其中存活的生物数量
+
+        Args:
+            ids: 存活生物的编号
+            line: 追溯的亲本，见founders
+        """
+        return np.unique(self.founders(ids, line), return_counts=True)
@@ -1,5 +1,22 @@
-from tqdm import tqdm
-from loguru import logger as log
+from functools import cache
 
-log.remove()
-log.add(lambda msg: tqdm.write(msg, end=""), format="{message}", colorize=True)
+
+@cache
+def load_logger():
+    """导入loguru并将日志输出到tqdm，避免打断进度条"""
+    from loguru import logger
+    from tqdm import tqdm
+
+    logger.remove()
+    logger.add(lambda msg: tqdm.write(msg, end=""), format="{message}", colorize=True)
+    return logger
+
+
+class _LazyLogger:
+    """第一次使用时才导入loguru和tqdm，不输出日志的进程不需要付出导入的开销"""
+
+    def __getattr__(self, name: str):
+        return getattr(load_logger(), name)
+
+
+log = _LazyLogger()
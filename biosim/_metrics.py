@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 一年中依次执行的阶段，逐个模拟时出生发生在interact中，birth为0；使用编译内核时逐个模拟的耗时全部计入move
+PHASES = ("death", "scan", "move", "interact", "age", "mutate", "birth", "refresh", "record")
+# 每年的计数，scanned为规划时扫描的格子数
+COUNTERS = ("scanned", "moves", "births", "deaths", "fights", "mutations")
+
+
+class Metrics:
+    """按年记录各阶段的耗时和计数，以结构化数组保存为时间序列，结构同Statistics
+
+    模拟代码在每个阶段结束时调用lap，耗时为距上一次lap的时间。未添加Metrics时World.metrics为None，
+    各阶段只有一次判断的开销。
+
+    Attributes:
+        path (Path | None): 每年追加一行JSON的指标文件
+    """
+
+    def __init__(self, path: str | Path | None = None, capacity: int = 256) -> None:
+        self.dtype = np.dtype(
+            [("year", np.int32), *((phase, np.float64) for phase in PHASES), *((name, np.int64) for name in COUNTERS)]
+        )
+        self._data = np.zeros(capacity, dtype=self.dtype)
+        self._size = 0
+        self._times = dict.fromkeys(PHASES, 0.0)
+        self._counts = dict.fromkeys(COUNTERS, 0)
+        self._last = time.perf_counter()
+        self.path = None if path is None else Path(path)
+        self._file = None if path is None else self.path.open("a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.data[field]
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    def start(self):
+        """开始计时，之后的第一次lap从此时算起"""
+        self._last = time.perf_counter()
+
+    def lap(self, phase: str, **counts: int):
+        """将距上一次lap的时间计入phase，并累加counts中的计数"""
+        now = time.perf_counter()
+        self._times[phase] += now - self._last
+        self._last = now
+        for name, value in counts.items():
+            self._counts[name] += value
+
+    def split(self, times: dict[str, float], **counts: int):
+        """将距上一次lap的时间按times中各阶段耗时的比例分配，用于在其他进程中计时的阶段，并累加counts中的计数"""
+        now = time.perf_counter()
+        total = sum(times.values())
+        for phase, value in times.items():
+            self._times[phase] += (now - self._last) * (value / total if total else 1 / len(times))
+        self._last = now
+        for name, value in counts.items():
+            self._counts[name] += value
+
+    def count(self, name: str, value: int = 1):
+        self._counts[name] += value
+
+    def end_year(self, year: int) -> np.ndarray:
+        """将本年的数据追加到时间序列并清零，返回本年的记录"""
+        if self._size == len(self._data):
+            self._data = np.concatenate([self._data, np.zeros_like(self._data)])
+        row = self._data[self._size]
+        row["year"] = year
+        for name, value in (*self._times.items(), *self._counts.items()):
+            row[name] = value
+        self._size += 1
+        if self._file is not None:
+            self._file.write(json.dumps({"year": year, **self._times, **self._counts}) + "\n")
+        self._times = dict.fromkeys(PHASES, 0.0)
+        self._counts = dict.fromkeys(COUNTERS, 0)
+        return row.copy()
+
+    def close(self):
+        """关闭指标文件，时间序列仍然保留"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from functools import cache
+from typing import NamedTuple
+
+import numpy as np
+
+from ._coordinate import Coordinate, Coordinates
+from .utils import spiral_scan
+
+BLANK, FOOD, CREATURE = 0, 1, 2  # 地图上格子的取值
+
+
+@cache
+def offset_table(max_radius: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按spiral_scan的顺序预先计算各格子相对原点的偏移，每个半径只计算一次
+
+    第r圈的格子位于表中[4r(r-1), 4r(r+1))的位置，因此小半径的表是大半径的表的前缀。
+
+    Returns:
+        dx, dy: 每个格子相对原点的偏移
+        radius: 每个格子所在圈的半径
+    """
+    steps = list(spiral_scan(max_radius))
+    radius = np.array([r for r, _ in steps], dtype=np.int32)
+    dx = np.cumsum([d.x for _, d in steps], dtype=np.int32)
+    dy = np.cumsum([d.y for _, d in steps], dtype=np.int32)
+    for table in (dx, dy, radius):
+        table.flags.writeable = False
+    return dx, dy, radius
+
+
+class Neighborhood(NamedTuple):
+    """某个格子周围的邻域，只包含地图内的格子，顺序与spiral_scan一致
+
+    Attributes:
+        x, y: 格子坐标
+        radius: 格子所在圈的半径
+        values: 格子的值
+    """
+
+    x: np.ndarray
+    y: np.ndarray
+    radius: np.ndarray
+    values: np.ndarray
+
+    def select(self, value: int, radius: int | None = None) -> np.ndarray:
+        """取值为value的格子在邻域中的序号，radius不为空时只返回该圈的格子"""
+        mask = self.values == value
+        if radius is not None:
+            mask &= self.radius == radius
+        return np.flatnonzero(mask)
+
+    def foods(self) -> np.ndarray:
+        return self.select(FOOD)
+
+    def creatures(self) -> np.ndarray:
+        return self.select(CREATURE)
+
+    def blanks(self, radius: int | None = None) -> np.ndarray:
+        return self.select(BLANK, radius)
+
+    def by_ring(self, index: np.ndarray) -> dict[int, np.ndarray]:
+        """将select返回的序号按所在圈分组"""
+        rings, starts = np.unique(self.radius[index], return_index=True)
+        return dict(zip(rings.tolist(), np.split(index, starts[1:])))
+
+    def location(self, i: int) -> Coordinate:
+        return Coordinate(int(self.x[i]), int(self.y[i]))
+
+    def locations(self, index: np.ndarray) -> Coordinates:
+        """select返回的一组序号对应的坐标"""
+        return Coordinates(self.x[index], self.y[index])
+
+
+def scan(_map: np.ndarray, center: Coordinate, radius: int) -> Neighborhood:
+    """对地图做一次裁剪到边界内的切片，返回center周围radius范围内的邻域"""
+    x0, y0 = max(center.x - radius, 0), max(center.y - radius, 0)
+    window = _map[y0 : center.y + radius + 1, x0 : center.x + radius + 1]
+    dx, dy, rings = offset_table(radius)
+    # 切片内的局部坐标
+    lx, ly = dx + (center.x - x0), dy + (center.y - y0)
+    inside = (0 <= lx) & (lx < window.shape[1]) & (0 <= ly) & (ly < window.shape[0])
+    lx, ly = lx[inside], ly[inside]
+    return Neighborhood(lx + x0, ly + y0, rings[inside], window[ly, lx])
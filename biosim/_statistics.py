@@ -0,0 +1,92 @@
+import numpy as np
+
+from ._config import config
+from ._genome import TRAITS
+
+
+class Statistics:
+    """在模拟进程中按年汇总的统计信息，以结构化数组保存为时间序列，容量不足时自动翻倍
+
+    每年一条记录，字段如下：
+        year: 年份
+        population: 生物数量
+        foods: 地图上的食物数量
+        food: 生物携带的食物总量
+        male, female: 雄性和雌性数量
+        traits: 各性状的基因总数，顺序同TRAITS
+        ages: 年龄分布，区间为bins
+    """
+
+    def __init__(self, capacity: int = 256) -> None:
+        self.bins = np.arange(0, config.creature.life + 1, 10)
+        self.dtype = np.dtype(
+            [
+                ("year", np.int32),
+                ("population", np.int32),
+                ("foods", np.int32),
+                ("food", np.float64),
+                ("male", np.int32),
+                ("female", np.int32),
+                ("traits", np.int64, (len(TRAITS),)),
+                ("ages", np.int32, (len(self.bins) - 1,)),
+            ]
+        )
+        self._data = np.zeros(capacity, dtype=self.dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.data[field]
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    def summarize(self, traits: np.ndarray, sex: np.ndarray, life: np.ndarray, food: np.ndarray) -> np.ndarray:
+        """汇总一组生物，返回year和foods为0的记录，参数同record"""
+        summary = np.zeros((), dtype=self.dtype)
+        male = int(np.count_nonzero(sex))
+        summary["population"] = len(sex)
+        summary["food"] = np.sum(food)
+        summary["male"], summary["female"] = male, len(sex) - male
+        summary["traits"] = traits.sum(axis=0)
+        summary["ages"] = np.histogram(life, bins=self.bins)[0]
+        return summary
+
+    def append(self, year: int, foods: int, summary: np.ndarray) -> np.ndarray:
+        """将summarize的结果作为year年的记录追加到时间序列，返回本年的记录"""
+        if self._size == len(self._data):
+            self._data = np.concatenate([self._data, np.zeros_like(self._data)])
+        self._data[self._size] = summary
+        self._data[self._size]["year"] = year
+        self._data[self._size]["foods"] = foods
+        self._size += 1
+        return self._data[self._size - 1].copy()
+
+    def record(
+        self,
+        year: int,
+        foods: int,
+        traits: np.ndarray,
+        sex: np.ndarray,
+        life: np.ndarray,
+        food: np.ndarray,
+    ) -> np.ndarray:
+        """汇总一年的数据并追加到时间序列，返回本年的记录
+
+        Args:
+            foods: 地图上的食物数量
+            traits: (n, len(TRAITS))，每个生物各性状的基因数量
+            sex, life, food: 每个生物的性别、年龄和食物量
+        """
+        return self.append(year, foods, self.summarize(traits, sex, life, food))
+
+    def restore(self, columns: dict[str, np.ndarray]):
+        """用按字段保存的时间序列替换当前数据"""
+        size = len(columns["year"])
+        self._data = np.zeros(max(size, len(self._data)), dtype=self.dtype)
+        for field, column in columns.items():
+            self._data[field][:size] = column
+        self._size = size
@@ -0,0 +1,44 @@
+"""按键生成的随机数：第year年编号为id的生物用于某个用途的随机数只由(种子, 年份, 编号, 用途)决定
+
+随机数由splitmix64对键逐级散列得到，不依赖任何生成器的状态。每年年初为所有参与模拟的生物一次性生成
+(n, len(PURPOSES))的均匀分布随机数，模拟中按行和用途取用，因此结果与生物的排列顺序和分块方式无关。
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# 每个生物每年的随机数用途，即draw返回的列
+PURPOSES = ("creature", "blank", "roll", "recombine", "mutate", "position")
+PICK_CREATURE, PICK_BLANK, ROLL, RECOMBINE, MUTATE, POSITION = range(len(PURPOSES))
+REFRESH = -1  # 刷新食物时作为编号，与生物编号不重复
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_M1, _M2 = np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB)
+
+
+def splitmix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64的输出函数，对uint64数组逐元素散列，溢出按2**64取模"""
+    z = np.atleast_1d(np.asarray(x, dtype=np.uint64)) + _GOLDEN
+    z = (z ^ (z >> np.uint64(30))) * _M1
+    z = (z ^ (z >> np.uint64(27))) * _M2
+    return z ^ (z >> np.uint64(31))
+
+
+def keys(seed, year: int, ids) -> np.ndarray:
+    """每个(种子, 年份, 编号)的键，seed可以是与ids等长的数组"""
+    seed = np.asarray(seed, dtype=np.int64).astype(np.uint64)
+    ids = np.asarray(ids, dtype=np.int64).astype(np.uint64)
+    return splitmix64(splitmix64(splitmix64(seed) + np.uint64(year)) + ids)
+
+
+def draw(seed, year: int, ids) -> np.ndarray:
+    """(len(ids), len(PURPOSES))，每个生物本年各用途的[0, 1)均匀分布随机数"""
+    bits = splitmix64(keys(seed, year, ids)[:, None] + np.arange(len(PURPOSES), dtype=np.uint64))
+    return (bits >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+
+def generator(seed: int, year: int) -> np.random.RandomState:
+    """刷新食物等全图操作使用的生成器，状态只由种子和年份决定"""
+    key = int(keys(seed, year, [REFRESH])[0])
+    return np.random.RandomState([key & 0xFFFFFFFF, key >> 32])
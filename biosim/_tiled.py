@@ -0,0 +1,935 @@
+from __future__ import annotations
+
+import os
+import pickle
+import time
+import traceback
+import weakref
+from multiprocessing import Barrier, Pipe, Process
+from multiprocessing.connection import Connection, wait
+from multiprocessing.shared_memory import SharedMemory
+from threading import BrokenBarrierError
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+
+import numpy as np
+
+from ._config import config
+from ._engine import LUCK, MAX_RADIUS, VectorEngine, first_claims, plan, search_blank
+from ._events import BIRTH, DEATH, EAT, EVENT_DTYPE, FIGHT, event_rows
+from ._genome import GenomePool, recombine_words
+from ._neighborhood import BLANK, CREATURE
+from ._statistics import Statistics
+
+if TYPE_CHECKING:
+    from ._creature import Creature
+    from ._world import World
+
+HALO = MAX_RADIUS  # 晕区宽度，等于感知范围的上限，块内的生物只能感知到块外这一范围内的生物
+HANDOFF = ("x", "y", "food", "life", "ids", "sex", "traits")  # 交接生物时传递的列，另有基因words和keyed随机数draws
+COUNTERS = ("scanned", "moves", "fights", "births", "deaths", "mutations")  # 各块累计的Metrics计数
+TIMED = ("death", "scan", "move", "interact", "birth", "age", "mutate")  # 工作进程中计时的阶段
+OUTBOX = 1 << 20  # 发件区的初始大小
+
+
+class _Events:
+    """工作进程中的事件缓冲，接口同EventLog.extend，年末交给主进程"""
+
+    def __init__(self) -> None:
+        self.rows: list[np.ndarray] = []
+
+    def extend(self, kind: int, year: int, x: np.ndarray, y: np.ndarray, other_x=-1, other_y=-1, life=0, food=0.0):
+        if len(x):
+            self.rows.append(event_rows(kind, year, x, y, other_x, other_y, life, food))
+
+    def flush(self) -> np.ndarray:
+        rows = np.concatenate([np.empty(0, dtype=EVENT_DTYPE), *self.rows])
+        self.rows.clear()
+        return rows
+
+
+class _Region:
+    """工作进程中代替World提供给Tile：共享的整张地图、本块写入的格子数量变化和事件缓冲"""
+
+    food_field = None
+    metrics = None
+
+    def __init__(self, _map: np.ndarray) -> None:
+        self._map = _map
+        self.year = 0
+        self.counts = np.zeros(3, dtype=np.int64)
+        self.events: _Events | None = None
+
+    def assign(self, cells: np.ndarray, value: int):
+        """同World.assign，格子数量只记录变化，年末由主进程累加"""
+        old = self._map.take(cells)
+        self.counts -= np.bincount(old, minlength=len(self.counts))
+        self._map.put(cells, value)
+        self.counts[value] += len(cells)
+
+
+class _Exchange:
+    """工作进程之间经共享内存交换各块的数据，不经过主进程
+
+    每个进程有两个发件区，按步的奇偶交替使用。一步中各块将交给其他块的数据post到缓冲，sync时按接收的进程
+    分段写入发件区并在屏障处等待所有进程，之后读取其他进程发件区中交给本进程的一段。进程写入下一步时使用另一个
+    发件区，而所有进程读完这一步的数据后才能通过下一步的屏障，因此不会覆盖尚未读取的数据。发件区不够大时以
+    新的代数重新创建，各发件区的代数记录在主进程创建的目录中。交给同一进程中的块的数据不经过共享内存。
+    """
+
+    def __init__(self, directory: str, owners: np.ndarray, barrier: Barrier, worker: int) -> None:
+        """
+        Args:
+            directory: 目录的共享内存名，也是各发件区名字的前缀
+            owners: 每块所在的进程
+        """
+        self.owners = owners
+        self.barrier = barrier
+        self.worker = worker
+        self.workers = int(owners.max()) + 1
+        self._directory = SharedMemory(directory)
+        self._generations = np.ndarray((self.workers, 2), dtype=np.int64, buffer=self._directory.buf)
+        self._outboxes: list[SharedMemory | None] = [None, None]
+        self._inboxes: dict[tuple[int, int], tuple[int, SharedMemory]] = {}
+        self._outgoing: list[list[tuple]] = [[] for _ in range(self.workers)]
+        self._received: dict[tuple[int | None, str], list[tuple[int, dict[str, np.ndarray]]]] = {}
+        self._parity = 0
+
+    def _name(self, worker: int, parity: int, generation: int) -> str:
+        return f"{self._directory.name.lstrip('/')}_{worker}_{parity}_{generation}"
+
+    def post(self, source: int, target: int | None, key: str, columns: dict[str, np.ndarray]):
+        """将source块的数据交给target块，target为None时交给所有块"""
+        workers = range(self.workers) if target is None else (int(self.owners[target]),)
+        for worker in workers:
+            self._outgoing[worker].append((source, target, key, columns))
+
+    def sync(self):
+        """写入本步的数据，等待所有进程后读取交给本进程的数据"""
+        parity = self._parity
+        payloads = [
+            b"" if w == self.worker else pickle.dumps(messages, pickle.HIGHEST_PROTOCOL)
+            for w, messages in enumerate(self._outgoing)
+        ]
+        header = np.array([len(payload) for payload in payloads], dtype=np.int64)
+        size = header.nbytes + int(header.sum())
+        outbox = self._outboxes[parity]
+        if outbox is None or outbox.size < size:
+            generation = int(self._generations[self.worker, parity]) + 1
+            capacity = max(size, 2 * (0 if outbox is None else outbox.size), OUTBOX)
+            self._outboxes[parity] = SharedMemory(self._name(self.worker, parity, generation), True, capacity)
+            if outbox is not None:
+                outbox.close()
+                outbox.unlink()
+            outbox = self._outboxes[parity]
+            self._generations[self.worker, parity] = generation
+        outbox.buf[: header.nbytes] = header.tobytes()
+        offset = header.nbytes
+        for payload in payloads:
+            outbox.buf[offset : offset + len(payload)] = payload
+            offset += len(payload)
+        local = self._outgoing[self.worker]
+        self._outgoing = [[] for _ in range(self.workers)]
+        self.barrier.wait()
+        self._parity = 1 - parity
+        received: dict[tuple[int | None, str], list[tuple[int, dict[str, np.ndarray]]]] = {}
+        for worker in range(self.workers):
+            messages = local if worker == self.worker else self._read(worker, parity)
+            for source, target, key, columns in messages:
+                received.setdefault((target, key), []).append((source, columns))
+        for messages in received.values():
+            messages.sort(key=lambda message: message[0])
+        self._received = received
+
+    def _read(self, worker: int, parity: int) -> list[tuple]:
+        """读取worker进程发件区中交给本进程的一段"""
+        generation = int(self._generations[worker, parity])
+        if not generation:
+            return []
+        cached = self._inboxes.get((worker, parity))
+        if cached is None or cached[0] != generation:
+            if cached is not None:
+                cached[1].close()
+            cached = self._inboxes[worker, parity] = (generation, SharedMemory(self._name(worker, parity, generation)))
+        inbox = cached[1]
+        header = np.frombuffer(inbox.buf[: 8 * self.workers], dtype=np.int64).copy()
+        start = header.nbytes + int(header[: self.worker].sum())
+        if not header[self.worker]:
+            return []
+        return pickle.loads(inbox.buf[start : start + int(header[self.worker])])
+
+    def receive(self, target: int | None, key: str) -> list[tuple[int, dict[str, np.ndarray]]]:
+        """上一步交给target块的数据，按来源的块号排列"""
+        return self._received.get((target, key), [])
+
+    def collect(self, target: int | None, key: str) -> dict[str, np.ndarray] | None:
+        """上一步交给target块的数据逐列拼接，没有数据时返回None"""
+        messages = self.receive(target, key)
+        return _concat([columns for _, columns in messages]) if messages else None
+
+    def close(self):
+        for _, inbox in self._inboxes.values():
+            inbox.close()
+        for outbox in self._outboxes:
+            if outbox is not None:
+                outbox.close()
+                outbox.unlink()
+        del self._generations
+        self._directory.close()
+
+
+def _concat(parts: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    """逐列拼接各块的结果"""
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def _select(columns: dict[str, np.ndarray], rows: np.ndarray) -> dict[str, np.ndarray]:
+    return {name: column[rows] for name, column in columns.items()}
+
+
+def _owner(edges: tuple[np.ndarray, np.ndarray], x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """坐标所在的块号，edges为各块行和列的边界"""
+    rows, columns = edges
+    row = np.searchsorted(rows, y, side="right") - 1
+    return row * (len(columns) - 1) + np.searchsorted(columns, x, side="right") - 1
+
+
+def _bounds(edges: tuple[np.ndarray, np.ndarray]) -> list[tuple[int, int, int, int]]:
+    """各块的(top, bottom, left, right)"""
+    rows, columns = edges
+    return [
+        (int(rows[r]), int(rows[r + 1]), int(columns[c]), int(columns[c + 1]))
+        for r, c in np.ndindex(len(rows) - 1, len(columns) - 1)
+    ]
+
+
+class Tile(VectorEngine):
+    """工作进程中的一块：保存块内的生物并模拟它们的一年，只写入共享地图中本块范围内的格子
+
+    各列始终按编号排列，因此块内冲突时编号小的生物获胜，与VectorEngine中序号小者获胜一致。
+    newborn标记本年出生的生物，pending标记本年尚未完成移动的生物。幽灵ghosts是其他块中位于本块四周HALO以内的
+    生物，只用于查找交互对象，交互对象以在[块内生物, 幽灵]中的序号表示。
+    使用全局随机数时，每块使用由种子、年份和块号决定的随机数生成器rng。
+    """
+
+    name = "tile"
+
+    def __init__(self, _map: np.ndarray, index: int, edges: tuple[np.ndarray, np.ndarray]) -> None:
+        super().__init__(_Region(_map))
+        self.index = index
+        self.edges = edges
+        self.bounds = _bounds(edges)
+        self.top, self.bottom, self.left, self.right = self.bounds[index]
+        # 交互时生物最远移动到对方感知范围的边缘，即本块之外2 * HALO处，只可能位于这些块四周HALO以内
+        reach = 3 * HALO
+        self.neighbours = [
+            t
+            for t, (top, bottom, left, right) in enumerate(self.bounds)
+            if top - reach < self.bottom
+            and self.top < bottom + reach
+            and left - reach < self.right
+            and self.left < right + reach
+        ]
+        self.newborn = np.zeros(0, dtype=bool)
+        self.pending = np.zeros(0, dtype=bool)
+        self.rng = np.random.RandomState()
+        self.ghosts = self._ghost_columns(np.zeros(0, dtype=np.int64))
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.next_id = 0  # 本轮出生的子代的第一个编号，各块相同
+        self._born: list[dict[str, np.ndarray]] = []  # 本年在本块出生的子代及其双亲
+        self._round: dict[str, np.ndarray] = {}  # 本轮各步之间保存的决策
+
+    def _take(self, keep: np.ndarray):
+        super()._take(keep)
+        self.newborn, self.pending = self.newborn[keep], self.pending[keep]
+        if self.draws is not None:
+            self.draws = self.draws[keep]
+
+    def _append(self, cells: np.ndarray, genome: np.ndarray, ids: np.ndarray):
+        super()._append(cells, genome, ids)
+        n = len(cells)
+        self.newborn = np.concatenate([self.newborn, np.ones(n, dtype=bool)])
+        self.pending = np.concatenate([self.pending, np.zeros(n, dtype=bool)])
+        if self.draws is not None:
+            self.draws = np.concatenate([self.draws, np.zeros((n, self.draws.shape[1]))])
+
+    def _random(self, rows: np.ndarray) -> np.ndarray:
+        if self.draws is not None:
+            return super()._random(rows)
+        return self.rng.random_sample(len(rows))
+
+    def _position(self, rows: np.ndarray) -> np.ndarray:
+        if self.draws is not None:
+            return super()._position(rows)
+        return self.rng.randint(0, self.base_num, len(rows)) // 3 * 3
+
+    def _mutate(self, rows: np.ndarray) -> np.ndarray:
+        if self.draws is not None:
+            return super()._mutate(rows)
+        return rows[self.pool.mutate(self.genome[rows], self.rng)]
+
+    def _plan(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self.draws is not None:
+            return super()._plan(rows)
+        columns = (self.world._map, self.x[rows], self.y[rows], self.perception[rows], self.movement[rows])
+        return plan(*columns, self.rng.random_sample)
+
+    def _inside(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return (self.top <= y) & (y < self.bottom) & (self.left <= x) & (x < self.right)
+
+    def _interior(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """距本块边界不少于HALO的格子，其中的生物不会被其他块感知"""
+        return (self.top + HALO <= y) & (y < self.bottom - HALO) & (self.left + HALO <= x) & (x < self.right - HALO)
+
+    def _near(self, x: np.ndarray, y: np.ndarray, owner: np.ndarray) -> Iterator[tuple[int, np.ndarray]]:
+        """依次返回四周HALO以内有指定位置、且不是位置所在块的邻块，以及位于其中的位置"""
+        for t in self.neighbours:
+            top, bottom, left, right = self.bounds[t]
+            near = (owner != t) & (top - HALO <= y) & (y < bottom + HALO) & (left - HALO <= x) & (x < right + HALO)
+            if near.any():
+                yield t, near
+
+    def _ghost_columns(self, rows: np.ndarray) -> dict[str, np.ndarray]:
+        """指定生物作为其他块的幽灵时的各列，owner为其所在的块"""
+        return {
+            "ids": self.ids[rows],
+            "x": self.x[rows],
+            "y": self.y[rows],
+            "sex": self.sex[rows],
+            "perception": self.perception[rows],
+            "words": self.pool.words[self.genome[rows]],
+            "owner": _owner(self.edges, self.x[rows], self.y[rows]),
+        }
+
+    def _post_ghosts(self, exchange: _Exchange, rows: np.ndarray):
+        """将指定生物作为幽灵交给四周HALO以内有其位置的其他块"""
+        ghosts = self._ghost_columns(rows)
+        for t, near in self._near(ghosts["x"], ghosts["y"], ghosts["owner"]):
+            exchange.post(self.index, t, "ghosts", _select(ghosts, near))
+
+    def _post_pending(self, exchange: _Exchange):
+        """将尚未完成移动的生物数量交给所有块，没有块需要移动时结束本年"""
+        exchange.post(self.index, None, "pending", {"count": np.array([np.count_nonzero(self.pending)])})
+
+    def _lookup(self, name: str, index: np.ndarray) -> np.ndarray:
+        """按[块内生物, 幽灵]中的序号读取一列，words为打包后的基因"""
+        n = len(self)
+        local = index < n
+        if name == "words":
+            own = self.pool.words[self.genome[index[local]]]
+        else:
+            own = getattr(self, name)[index[local]]
+        result = np.empty((len(index), *own.shape[1:]), dtype=own.dtype)
+        result[local] = own
+        result[~local] = self.ghosts[name][index[~local] - n]
+        return result
+
+    def _receive(self, columns: dict[str, np.ndarray] | None):
+        """加入其他块交出或主进程分配的生物，之后各列重新按编号排列"""
+        if columns is None or not len(columns["ids"]):
+            return
+        n = len(columns["ids"])
+        for name in HANDOFF:
+            setattr(self, name, np.concatenate([getattr(self, name), columns[name]]))
+        self.genome = np.concatenate([self.genome, self.pool.allocate(columns["words"])])
+        self.newborn = np.concatenate([self.newborn, np.zeros(n, dtype=bool)])
+        self.pending = np.concatenate([self.pending, np.zeros(n, dtype=bool)])
+        if self.draws is not None:
+            self.draws = np.concatenate([self.draws, columns["draws"]])
+        self._take(np.argsort(self.ids, kind="stable"))
+
+    def _leave(self, rows: np.ndarray) -> dict[str, np.ndarray]:
+        """交出指定生物，返回其各列"""
+        columns = {name: getattr(self, name)[rows] for name in HANDOFF}
+        columns["words"] = self.pool.words[self.genome[rows]]
+        if self.draws is not None:
+            columns["draws"] = self.draws[rows]
+        self.pool.release(self.genome[rows])
+        self._take(~rows)
+        return columns
+
+    def load(self, columns: dict[str, np.ndarray]):
+        self._receive(columns)
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """块内生物的各列和打包后的基因"""
+        return {**{name: getattr(self, name) for name in HANDOFF}, "words": self.pool.words[self.genome]}
+
+    def begin(self, exchange: _Exchange, year: int, events: bool, next_id: int):
+        """年初：死亡，准备本年的随机数，将晕区内的生物交给四周的块"""
+        world = self.world
+        self.year = world.year = year
+        world.events = _Events() if events else None
+        self.next_id = next_id
+        self.draws = None
+        alive = self.life < config.creature.life
+        if world.events is not None:
+            dead = ~alive
+            world.events.extend(DEATH, year, self.x[dead], self.y[dead], life=self.life[dead], food=self.food[dead])
+        world.assign(self.cells[~alive], BLANK)
+        self.pool.release(self.genome[~alive])
+        self._take(alive)
+        self.counters["deaths"] += len(alive) - len(self)
+        self.newborn[:] = False
+        self.pending[:] = True
+        if config.world.random == "keyed":
+            self.draws = self._draw(len(self))
+        else:
+            self.rng = np.random.RandomState([config.seed, year, self.index])
+        self._post_ghosts(exchange, np.flatnonzero(~self._interior(self.x, self.y)))
+        self._post_pending(exchange)
+
+    def plan(self, exchange: _Exchange, first: bool):
+        """一轮移动的决策，规则同VectorEngine._move，目标在其他块的申请交给该块
+
+        Args:
+            first: 是否为本年的第一轮，只统计第一轮扫描的格子数
+        """
+        self._receive(exchange.collect(self.index, "arrivals"))
+        ghosts = exchange.collect(self.index, "ghosts")
+        if ghosts is None:
+            ghosts = self._ghost_columns(np.zeros(0, dtype=np.int64))
+        self.ghosts = ghosts = _select(ghosts, np.argsort(ghosts["ids"], kind="stable"))
+        rows = np.flatnonzero(self.pending)
+        food, creature, outer = self._plan_all(rows)
+        if first:
+            radius = self.perception[rows]
+            self.counters["scanned"] += int((4 * radius * (radius + 1)).sum())
+        eat = (food >= 0) & (self.food[rows] <= config.creature.max_food // 2)
+        meet = ~eat & (creature >= 0) & (self.life[rows] >= config.creature.adult_age) & (self.food[rows] != 0)
+        wander = ~eat & ~meet & (outer >= 0)
+        width = self.world._map.shape[1]
+        x, y = np.concatenate([self.x, ghosts["x"]]), np.concatenate([self.y, ghosts["y"]])
+        cells = y.astype(np.int64) * width + x
+        partner = np.full(len(rows), -1, dtype=np.int64)
+        if meet.any():
+            # 在块内生物和幽灵中按格子查找交互对象
+            order = np.argsort(cells)
+            found = order[np.minimum(np.searchsorted(cells[order], creature[meet]), len(cells) - 1)]
+            partner[meet] = np.where(cells[found] == creature[meet], found, -1)
+            meet &= partner >= 0
+        target = np.full(len(rows), -1, dtype=np.int64)
+        target[eat] = food[eat]
+        target[wander] = outer[wander]
+        others = partner[meet]
+        perception = self._lookup("perception", others)
+        target[meet] = search_blank(self.world._map, x[others], y[others], perception, allowed=cells[rows[meet]])
+        claims = np.flatnonzero(target >= 0)
+        inside = self._inside(target[claims] % width, target[claims] // width)
+        cross = claims[~inside]
+        owner = _owner(self.edges, target[cross] % width, target[cross] // width)
+        for t in np.unique(owner).tolist():
+            mask = owner == t
+            exchange.post(self.index, t, "claims", {"cells": target[cross[mask]], "ids": self.ids[rows[cross[mask]]]})
+        self._round = {
+            "rows": rows,
+            "target": target,
+            "partner": partner,
+            "eat": eat,
+            "meet": meet,
+            "claims": claims,
+            "inside": inside,
+            "owner": owner,
+        }
+
+    def resolve(self, exchange: _Exchange):
+        """处理目标在本块的所有申请，编号最小者获胜并占据格子，其他块的申请是否获胜交回申请的块"""
+        state = self._round
+        local = state["claims"][state["inside"]]
+        incoming = exchange.receive(self.index, "claims")
+        cells = np.concatenate([state["target"][local], *(part["cells"] for _, part in incoming)])
+        ids = np.concatenate([self.ids[state["rows"][local]], *(part["ids"] for _, part in incoming)])
+        order = np.argsort(ids, kind="stable")
+        won = np.empty(len(order), dtype=bool)
+        won[order] = first_claims(cells[order])
+        self.world.assign(cells[won], CREATURE)
+        state["won"] = won[: len(local)]
+        offset = len(local)
+        for source, part in incoming:
+            count = len(part["cells"])
+            exchange.post(self.index, source, "won", {"won": won[offset : offset + count]})
+            offset += count
+
+    def move(self, exchange: _Exchange):
+        """移动获胜者并决定交互的结果，对其他块生物的战斗影响交给该块，晕区内生物的新位置交给四周的块"""
+        state = self._round
+        rows, claims, inside = state["rows"], state["claims"], state["inside"]
+        won = np.zeros(len(state["owner"]), dtype=bool)
+        for source, part in exchange.receive(self.index, "won"):
+            won[state["owner"] == source] = part["won"]
+        success = np.empty(len(claims), dtype=bool)
+        success[inside], success[~inside] = state["won"], won
+        index = claims[success]
+        movers = rows[index]
+        width = self.world._map.shape[1]
+        seen = movers[~self._interior(self.x[movers], self.y[movers])]
+        seen_x, seen_y = self.x[seen], self.y[seen]
+        old, new = self.cells[movers], state["target"][index]
+        # 交互时可能移动到自身所在的格子
+        self.world.assign(old[old != new], BLANK)
+        self.x[movers], self.y[movers] = new % width, new // width
+        self.pending[rows] = False
+        self.pending[rows[claims[~success]]] = True
+        moved = {"ids": self.ids[seen], "x": self.x[seen], "y": self.y[seen]}
+        # 按移动前的位置交给以其为幽灵的块
+        for t, near in self._near(seen_x, seen_y, np.full(len(seen), self.index)):
+            exchange.post(self.index, t, "moves", _select(moved, near))
+        eaten = movers[state["eat"][index]]
+        self.food[eaten] += 1
+        if self.world.events is not None:
+            self.world.events.extend(EAT, self.year, self.x[eaten], self.y[eaten], food=self.food[eaten])
+        self.counters["moves"] += len(movers)
+        # 同性战斗，异性交配，规则同VectorEngine._interact
+        meet = state["meet"][index]
+        actors, partners = movers[meet], state["partner"][index][meet]
+        roll = self._random(actors) - self.traits[actors, LUCK] * 0.01
+        same = self.sex[actors] == self._lookup("sex", partners)
+        win = same & (roll < 0.5)
+        lose = same & ~win
+        self.counters["fights"] += int(np.count_nonzero(same))
+        # 主动方获胜时对方食物清零，落败时食物归对方
+        fought = actors[same]
+        effects = {
+            "actor": self.ids[fought],
+            "ids": self._lookup("ids", partners[same]),
+            "win": win[same],
+            "loot": np.where(win[same], 0.0, self.food[fought]),
+            "x": self.x[fought],
+            "y": self.y[fought],
+        }
+        mate = ~same & (roll <= self.charm[actors])
+        state.update(losers=actors[lose], winners=partners[lose], selves=actors[mate], partners=partners[mate])
+        ghost = partners[same] >= len(self)
+        state["effects"] = _select(effects, ~ghost)
+        effects = _select(effects, ghost)
+        owner = self.ghosts["owner"][partners[same][ghost] - len(self)]
+        for t in np.unique(owner).tolist():
+            exchange.post(self.index, t, "effects", _select(effects, owner == t))
+
+    def interact(self, exchange: _Exchange):
+        """应用本轮的战斗结果，为交配的生物寻找生育的格子并重组基因，子代的申请交给所有块"""
+        state, ghosts = self._round, self.ghosts
+        for _, moved in exchange.receive(self.index, "moves"):
+            index = np.searchsorted(ghosts["ids"], moved["ids"])
+            ghosts["x"][index], ghosts["y"][index] = moved["x"], moved["y"]
+        # 与VectorEngine一致，先清零再按主动方编号依次累加战利品
+        incoming = exchange.collect(self.index, "effects")
+        effects = state["effects"] if incoming is None else _concat([state["effects"], incoming])
+        effects = _select(effects, np.argsort(effects["actor"], kind="stable"))
+        rows, win = np.searchsorted(self.ids, effects["ids"]), effects["win"]
+        losers, winners = state["losers"], state["winners"]
+        events = self.world.events
+        if events is not None:
+            year, x, y, beaten = self.year, self.x, self.y, rows[win]
+            ax, ay = effects["x"][win], effects["y"][win]
+            events.extend(FIGHT, year, ax, ay, x[beaten], y[beaten], food=self.food[beaten])
+            wx, wy = self._lookup("x", winners), self._lookup("y", winners)
+            events.extend(FIGHT, year, wx, wy, x[losers], y[losers], food=self.food[losers])
+        np.add.at(self.life, rows[win], 5)
+        self.food[rows[win]] = 0
+        np.add.at(self.food, rows[~win], effects["loot"][~win])
+        self.life[losers] += 5
+        self.food[losers] = 0
+        # 交配：优先在对方周围生育，其次在自身周围，冲突在place中处理
+        selves, partners = state["selves"], state["partners"]
+        x, y, perception = (self._lookup(name, partners) for name in ("x", "y", "perception"))
+        child = search_blank(self.world._map, x, y, perception)
+        child = np.where(child >= 0, child, self._search_blank(selves))
+        born = child >= 0
+        if not born.any():
+            return
+        selves, partners = selves[born], partners[born]
+        words = recombine_words(
+            self.pool.words[self.genome[selves]], self._lookup("words", partners), self._position(selves)
+        )
+        cells = child[born]
+        claims = {
+            "cells": cells,
+            "ids": self.ids[selves],
+            "partners": self._lookup("ids", partners),
+            "words": words,
+            "x": self.x[selves],
+            "y": self.y[selves],
+        }
+        # 所有块都需要全部申请来确定子代的编号，基因只交给子代所在的块
+        exchange.post(self.index, None, "births", {"cells": cells, "ids": claims["ids"]})
+        width = self.world._map.shape[1]
+        owner = _owner(self.edges, cells % width, cells // width)
+        for t in np.unique(owner).tolist():
+            exchange.post(self.index, t, "children", _select(claims, owner == t))
+
+    def place(self, exchange: _Exchange):
+        """加入子代，交出已移出本块的生物，将晕区内的生物交给四周的块
+
+        同一格子由编号最小的主动方获得，获胜的子代按主动方编号从next_id起依次编号，各块得到相同的结果。
+        """
+        claims = exchange.collect(None, "births")
+        if claims is not None:
+            order = np.argsort(claims["ids"], kind="stable")
+            winners = claims["ids"][order[first_claims(claims["cells"][order])]]
+            children = exchange.collect(self.index, "children")
+            if children is not None:
+                children = _select(children, np.isin(children["ids"], winners))
+                ids = self.next_id + np.searchsorted(winners, children["ids"])
+                order = np.argsort(ids)
+                children, ids = _select(children, order), ids[order]
+                cells = children["cells"]
+                self.world.assign(cells, CREATURE)
+                self._append(cells, self.pool.allocate(children["words"]), ids)
+                width = self.world._map.shape[1]
+                if self.world.events is not None:
+                    self.world.events.extend(
+                        BIRTH, self.year, cells % width, cells // width, children["x"], children["y"]
+                    )
+                self._born.append({"ids": ids, "first": children["ids"], "second": children["partners"]})
+                self.counters["births"] += len(ids)
+            self.next_id += len(winners)
+        self._post_ghosts(exchange, np.flatnonzero(~self._interior(self.x, self.y)))
+        leavers = self._leave(~self._inside(self.x, self.y))
+        owner = _owner(self.edges, leavers["x"], leavers["y"])
+        for t in np.unique(owner).tolist():
+            exchange.post(self.index, t, "arrivals", _select(leavers, owner == t))
+        self._post_pending(exchange)
+
+    def end(self, exchange: _Exchange, times: dict[str, float]) -> dict[str, Any]:
+        """年末：衰老和突变，返回本年的统计、出生、事件、计数和各阶段的耗时，当年出生的生物不参与"""
+        start = time.perf_counter()
+        self._receive(exchange.collect(self.index, "arrivals"))
+        rows = np.flatnonzero(~self.newborn)
+        self.food[rows] = np.maximum(0, self.food[rows] - self.food_cost[rows])
+        self.life[rows] += 1 + (self.food[rows] == 0) * 10
+        times["age"] += time.perf_counter() - start
+        start = time.perf_counter()
+        mutated = self._mutate(rows)
+        self._decode(mutated)
+        self.counters["mutations"] += len(mutated)
+        times["mutate"] += time.perf_counter() - start
+        world = self.world
+        empty = np.zeros(0, dtype=np.int64)
+        result = {
+            # 食物总量由主进程按编号顺序求和，与VectorEngine一致
+            "summary": Statistics(1).summarize(self.traits[rows], self.sex[rows], self.life[rows], self.food[rows]),
+            "ids": self.ids[rows],
+            "food": self.food[rows],
+            "born": _concat([{"ids": empty, "first": empty, "second": empty}, *self._born]),
+            "counts": world.counts.copy(),
+            "events": None if world.events is None else world.events.flush(),
+            "counters": self.counters,
+            "times": times,
+            "count": len(self),
+        }
+        world.counts[:] = 0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._born = []
+        return result
+
+
+class _Worker:
+    """工作进程中分配到的各块，每年依次在各块上执行每一步，步与步之间经_Exchange与其他进程交换数据并同步"""
+
+    def __init__(self, tiles: dict[int, Tile], exchange: _Exchange) -> None:
+        self.tiles = tiles
+        self.exchange = exchange
+
+    def _run(self, times: dict[int, dict[str, float]], phase: str, method: str, *args):
+        """在各块上执行一步并计时，之后同步"""
+        for index, tile in self.tiles.items():
+            start = time.perf_counter()
+            getattr(tile, method)(self.exchange, *args)
+            times[index][phase] += time.perf_counter() - start
+        self.exchange.sync()
+
+    def step(self, year: int, events: bool, next_id: int) -> dict[int, dict[str, Any]]:
+        """模拟各块的一年，返回每块年末的结果
+
+        Args:
+            next_id: 本年出生的第一个生物的编号
+        """
+        times = {index: dict.fromkeys(TIMED, 0.0) for index in self.tiles}
+        self._run(times, "death", "begin", year, events, next_id)
+        first = True
+        while self.exchange.collect(None, "pending")["count"].sum():
+            self._run(times, "scan" if first else "move", "plan", first)
+            self._run(times, "move", "resolve")
+            self._run(times, "move", "move")
+            self._run(times, "interact", "interact")
+            self._run(times, "birth", "place")
+            first = False
+        return {index: tile.end(self.exchange, times[index]) for index, tile in self.tiles.items()}
+
+
+def _serve(
+    connection: Connection,
+    name: str,
+    shape: tuple[int, int],
+    tiles: list[int],
+    edges: tuple[np.ndarray, np.ndarray],
+    directory: str,
+    owners: np.ndarray,
+    barrier: Barrier,
+    settings: dict,
+):
+    """工作进程：依次执行主进程发来的(方法, 参数, 配置)，配置不为None时先更新全局配置
+
+    方法为step时在本进程的所有块上模拟一年，参数为_Worker.step的参数，否则参数为{块号: Tile方法的参数}。
+    """
+    config.update(settings)
+    shared = SharedMemory(name)
+    _map = np.ndarray(shape, dtype=np.int8, buffer=shared.buf)
+    exchange = _Exchange(directory, owners, barrier, int(owners[tiles[0]]))
+    worker = _Worker({index: Tile(_map, index, edges) for index in tiles}, exchange)
+    try:
+        while (message := connection.recv()) is not None:
+            method, arguments, settings = message
+            try:
+                if settings is not None:
+                    config.update(settings)
+                if method == "step":
+                    result = worker.step(*arguments)
+                else:
+                    result = {index: getattr(worker.tiles[index], method)(*args) for index, args in arguments.items()}
+            except BrokenBarrierError:
+                # 其他进程出错，错误由该进程报告
+                connection.send(("broken", None))
+            except Exception:
+                # 中止屏障，使在屏障处等待本进程的其他进程退出本年
+                barrier.abort()
+                connection.send(("error", traceback.format_exc()))
+            else:
+                connection.send(("ok", result))
+    finally:
+        exchange.close()
+
+
+def _shutdown(connections: list[Connection], processes: list[Process], shared: list[SharedMemory]):
+    for connection in connections:
+        try:
+            connection.send(None)
+        except OSError:
+            pass
+    for process in processes:
+        process.join(1)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    for memory in shared:
+        memory.close()
+        memory.unlink()
+
+
+def _gathered(name: str) -> property:
+    return property(lambda self: self._gather()[name], doc=f"汇总自各块的{name}，只读")
+
+
+class TiledEngine(VectorEngine):
+    """将地图划分为若干块，每块由工作进程中的Tile保存块内的生物并模拟其一年，主进程只负责开始每年和汇总结果
+
+    地图放在共享内存中，world._map即为其视图，每块只写入自己范围内的格子。块与块之间的数据经共享内存直接在
+    工作进程之间交换，不经过主进程。每轮移动分为以下几步，步与步之间所有进程同步：
+        plan      各块基于本轮开始时的地图决策，目标在其他块的申请交给该块
+        resolve   各块处理目标在本块的所有申请，编号最小者获胜并占据格子
+        move      移动获胜者并决定战斗和交配，对其他块生物的影响交给该块
+        interact  应用战斗结果，寻找生育的格子，子代的申请交给所有块
+        place     各块按主动方编号处理冲突并为子代编号，子代加入所在的块，移出本块的生物交给所到的块
+    年初和每轮结束时，距块边界不足HALO的生物作为幽灵复制到四周的块。生物只与感知范围内的生物交互，因此幽灵
+    足以查找所有交互对象；幽灵在本轮移动后的位置也会交给这些块，用于在其周围生育。年末主进程按编号在谱系中
+    登记本年出生的生物。
+
+    规则和冲突处理与VectorEngine相同，使用keyed随机数时结果与VectorEngine一致。使用全局随机数时每块使用
+    由种子、年份和块号决定的随机数，相同种子和分块的结果与进程数无关。不支持食物密度场。
+
+    生物的各列（x、y、food等）按编号排列，读取时从各块汇总，模拟下一年前保持不变。
+    """
+
+    name = "tiled"
+    x, y, food, life = _gathered("x"), _gathered("y"), _gathered("food"), _gathered("life")
+    ids, sex, traits = _gathered("ids"), _gathered("sex"), _gathered("traits")
+    genome, pool = _gathered("genome"), _gathered("pool")
+
+    def __init__(
+        self,
+        world: World,
+        creatures: Iterable[Creature] = (),
+        tiles: tuple[int, int] | None = None,
+        workers: int | None = None,
+    ) -> None:
+        """
+        Args:
+            tiles: 分块的行数和列数，默认使用配置中的world.tiles
+            workers: 进程数，默认使用配置中的world.workers，每个进程负责若干块
+        """
+        if not isinstance(world._map, np.ndarray):
+            raise ValueError("tiled引擎只支持dense地图")
+        if world.food_field is not None:
+            raise ValueError("tiled引擎不支持食物密度场")
+        self.world = world
+        self.base_num = config.gene.base_num
+        self.year = world.year
+        self.draws = None
+        height, width = world._map.shape
+        self.tiles = tuple(tiles or config.world.tiles)
+        self.edges = (
+            np.linspace(0, height, self.tiles[0] + 1).astype(np.int64),
+            np.linspace(0, width, self.tiles[1] + 1).astype(np.int64),
+        )
+        self._bounds = _bounds(self.edges)
+        # 地图移入共享内存，之后不再复制
+        shared = SharedMemory(create=True, size=world._map.nbytes)
+        self._map = np.ndarray(world._map.shape, dtype=np.int8, buffer=shared.buf)
+        self._map[:] = world._map
+        world._map = self._map
+        count = len(self._bounds)
+        workers = min(workers or config.world.workers or os.cpu_count() or 1, count)
+        owners = np.arange(count) % workers
+        self._assignment = [np.flatnonzero(owners == w).tolist() for w in range(workers)]
+        # 各进程发件区的代数，见_Exchange
+        directory = SharedMemory(create=True, size=workers * 2 * 8)
+        directory.buf[:] = bytes(directory.size)
+        self._barrier = Barrier(workers)
+        settings = config.model_dump()
+        self._connections, self._processes = [], []
+        for tiles in self._assignment:
+            parent, child = Pipe()
+            process = Process(
+                target=_serve,
+                args=(
+                    child,
+                    shared.name,
+                    self._map.shape,
+                    tiles,
+                    self.edges,
+                    directory.name,
+                    owners,
+                    self._barrier,
+                    settings,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+        self._finalizer = weakref.finalize(self, _shutdown, self._connections, self._processes, [shared, directory])
+        self._count = 0
+        self._cache: dict[str, Any] | None = None
+        self._summary: np.ndarray | None = None
+        self._load(VectorEngine(world, creatures))
+        self.stepped = self._count
+
+    @classmethod
+    def from_columns(
+        cls,
+        world: World,
+        x: np.ndarray,
+        y: np.ndarray,
+        food: np.ndarray,
+        life: np.ndarray,
+        words: np.ndarray,
+        ids: np.ndarray,
+    ) -> TiledEngine:
+        engine = cls(world)
+        engine._load(VectorEngine.from_columns(world, x, y, food, life, words, ids))
+        engine.stepped = len(engine)
+        return engine
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        if self._finalizer.alive and self.world._map is self._map:
+            # 地图复制回普通数组，释放共享内存后仍可使用
+            self.world._map = self._map.copy()
+        self._finalizer()
+
+    def summarize(self, statistics: Statistics) -> np.ndarray:
+        return self._summary
+
+    def _call(self, method: str, arguments: dict[int, tuple] | tuple, settings: dict | None = None) -> dict[int, Any]:
+        """在各进程上调用，arguments为每块Tile方法的参数，method为step时为_Worker.step的参数，返回每块的结果"""
+        results, errors, exited = {}, [], False
+        pending = {}
+        for connection, process, tiles in zip(self._connections, self._processes, self._assignment):
+            try:
+                connection.send((method, arguments if method == "step" else {t: arguments[t] for t in tiles}, settings))
+            except OSError:
+                exited = True
+            else:
+                pending[connection] = process
+        if exited:
+            # 其他进程可能在屏障处等待已退出的进程
+            self._barrier.abort()
+        while pending:
+            sentinels = {process.sentinel: connection for connection, process in pending.items()}
+            for ready in wait([*pending, *sentinels]):
+                connection = sentinels.get(ready, ready)
+                if connection not in pending:
+                    continue
+                # 进程退出前可能已经发出结果
+                if ready is connection or connection.poll():
+                    try:
+                        status, result = connection.recv()
+                    except EOFError:
+                        status, result = "exit", None
+                else:
+                    status, result = "exit", None
+                del pending[connection]
+                if status == "ok":
+                    results.update(result)
+                elif status == "error":
+                    errors.append(result)
+                elif status == "exit":
+                    # 其他进程可能在屏障处等待已退出的进程
+                    self._barrier.abort()
+                    exited = True
+        if errors:
+            raise RuntimeError("tiled引擎的工作进程出错：\n" + errors[0])
+        if exited:
+            raise RuntimeError("tiled引擎的工作进程意外退出")
+        return results
+
+    def _load(self, engine: VectorEngine):
+        """将生物分配到所在的块"""
+        columns = {name: getattr(engine, name) for name in HANDOFF}
+        columns["words"] = engine.pool.words[engine.genome]
+        owner = _owner(self.edges, columns["x"], columns["y"])
+        self._call("load", {t: (_select(columns, owner == t),) for t in range(len(self._bounds))})
+        self._count += len(owner)
+        self._cache = None
+
+    def _gather(self) -> dict[str, Any]:
+        """汇总各块的生物，按编号排列"""
+        if self._cache is None:
+            parts = self._call("columns", {t: () for t in range(len(self._bounds))})
+            columns = _concat([parts[t] for t in sorted(parts)])
+            columns = _select(columns, np.argsort(columns["ids"], kind="stable"))
+            pool = GenomePool(self.base_num, capacity=max(len(columns["ids"]), 1024))
+            columns["genome"] = pool.allocate(columns.pop("words"))
+            columns["pool"] = pool
+            self._cache = columns
+        return self._cache
+
+    def step(self, year: int):
+        """模拟第year年：各块在工作进程中完成整年的模拟，主进程登记出生并汇总统计、事件和计数"""
+        self.year = year
+        self._cache = None
+        world, metrics = self.world, self.world.metrics
+        ended = self._call("step", (year, world.events is not None, len(world.lineage)), config.model_dump())
+        parts = [ended[t] for t in range(len(self._bounds))]
+        born = _concat([part["born"] for part in parts])
+        born = _select(born, np.argsort(born["ids"]))
+        world.lineage.add(year, born["first"], born["second"])
+        for part in parts:
+            world.counts += part["counts"]
+            if part["events"] is not None:
+                world.events.append(part["events"])
+        summary = parts[0]["summary"].copy()
+        for name in ("population", "male", "female", "traits", "ages"):
+            summary[name] = np.sum([part["summary"][name] for part in parts], axis=0)
+        ids, food = (np.concatenate([part[name] for part in parts]) for name in ("ids", "food"))
+        summary["food"] = np.sum(food[np.argsort(ids, kind="stable")])
+        self._summary = summary
+        self._count = sum(part["count"] for part in parts)
+        self.stepped = len(ids)
+        if metrics is not None:
+            # 各阶段在工作进程中计时，主进程等待的时间按各块耗时之和的比例分配
+            times = {phase: sum(part["times"][phase] for part in parts) for phase in TIMED}
+            metrics.split(times, **{name: sum(part["counters"][name] for part in parts) for name in COUNTERS})
@@ -1,77 +1,432 @@
 import time
+from pathlib import Path
 
 import numpy as np
-from numpy.random import choice, random
-from tqdm import trange
 
-from ._config import config
-from ._coordinate import Coordinate
+from . import _checkpoint
+from ._chunked import ChunkedMap
+from ._config import Engine, config
+from ._coordinate import Coordinate, Coordinates
 from ._creature import Creature
+from ._engine import VectorEngine
+from ._events import DEATH, EventLog
+from ._food import FoodField
+from ._genome import GenomePool, TraitDecoder, popcount
+from ._history import MapHistory
+from ._lineage import Lineage
 from ._log import log
-from .utils import Drawer, Recorder
+from ._metrics import Metrics
+from ._neighborhood import BLANK, CREATURE, FOOD
+from ._statistics import Statistics
+from ._streams import MUTATE, POSITION, draw, generator
+from ._tiled import TiledEngine
+from .utils import Drawer, FrameWriter, Recorder
+
+ENGINES: dict[Engine, type[VectorEngine]] = {"vector": VectorEngine, "tiled": TiledEngine}
+
+
+def food_rate(year: int) -> float:
+    """第year年新生成食物的概率，不刷新时为0。刷新分摊到多年时每年的概率使累计概率等于food_rate"""
+    spread = config.world.food_refresh_spread
+    if year % config.world.food_refresh_year >= spread:
+        return 0.0
+    rate = config.world.food_rate
+    return rate if spread == 1 else 1 - (1 - rate) ** (1 / spread)
+
+
+def sample_blanks(
+    _map: np.ndarray | ChunkedMap, count: int, blanks: int, rng: np.random.RandomState | None = None
+) -> np.ndarray:
+    """不放回地随机抽取count个空地，返回一维索引
+
+    空地较多或稀疏存储时随机抽取格子并拒绝非空地，避免生成整张地图大小的临时数组。
+
+    Args:
+        blanks: 地图上的空地数量
+    """
+    rng = np.random if rng is None else rng
+    count = min(count, blanks)
+    if 2 * blanks < _map.size and isinstance(_map, np.ndarray):
+        return rng.choice(np.flatnonzero(_map.reshape(-1) == BLANK), count, replace=False)
+    cells = np.empty(0, dtype=np.int64)
+    while len(cells) < count:
+        draw = rng.randint(0, _map.size, 2 * (count - len(cells)))
+        cells = np.concatenate([cells, draw[_map.take(draw) == BLANK]])
+        # 去重并保持抽取顺序
+        cells = cells[np.sort(np.unique(cells, return_index=True)[1])]
+    return cells[:count]
+
+
+def place_food(
+    _map: np.ndarray | ChunkedMap, blanks: int, rate: float, rng: np.random.RandomState | None = None
+) -> int:
+    """就地在空地上生成食物，返回新食物的数量
+
+    食物数量从二项分布B(blanks, rate)中抽取，与逐格按rate生成的分布相同。
+    """
+    rng = np.random if rng is None else rng
+    count = rng.binomial(blanks, rate)
+    if count:
+        _map.put(sample_blanks(_map, count, blanks, rng), FOOD)
+    return count
 
 
 class World:
-    def __init__(self) -> None:
-        self._map: np.ndarray = np.zeros((config.world.height, config.world.width), dtype=np.int8)
-        self.creatures: dict[Coordinate, Creature] = {}
-        self.drawer = Drawer("生物模拟器")
-        self.recorder = Recorder()
+    def __init__(self, engine: Engine | None = None, headless: bool = False) -> None:
+        """
+        Args:
+            engine: 模拟引擎，默认使用配置中的world.engine
+            headless: 无界面模式，不创建Drawer和Recorder进程，需要时可通过attach_drawer/attach_recorder添加
+        """
+        self._setup((config.world.height, config.world.width), headless)
         self.refresh_food()
-        blanks = np.where(self._map == 0)
-        for i in choice(np.arange(len(blanks[0])), config.world.init_count, replace=False):
-            x, y = int(blanks[1][i]), int(blanks[0][i])
-            creature = Creature(Coordinate(x, y), self)
+        width = self._map.shape[1]
+        cells = sample_blanks(self._map, config.world.init_count, int(self.counts[BLANK]))
+        for cell, id in zip(cells.tolist(), self.lineage.add(self.year, np.full(len(cells), -1)).tolist()):
+            creature = Creature(Coordinate(cell % width, cell // width), self)
+            creature.id = id
             self.add_creature(creature)
+        # 向量化引擎接管所有生物，初始状态与逐个模拟时完全一致
+        engine = engine or config.world.engine
+        if engine != "object":
+            self.engine = ENGINES[engine](self, self.creatures)
+            self._slots.clear()
+            # 引擎不使用槽位网格
+            self._index.put(self.engine.cells, -1)
+
+    def _setup(self, shape: tuple[int, int], headless: bool):
+        """创建空白的世界"""
+        # 每个格子上生物的槽位号，-1表示没有生物。生物保存在槽位列表中，死亡后槽位通过空闲列表复用
+        if config.world.storage == "sparse":
+            self._map: np.ndarray | ChunkedMap = ChunkedMap(shape, np.int8, BLANK, config.world.chunk_size)
+            self._index: np.ndarray | ChunkedMap = ChunkedMap(shape, np.int32, -1, config.world.chunk_size)
+        else:
+            self._map = np.zeros(shape, dtype=np.int8)
+            self._index = np.full(shape, -1, dtype=np.int32)
+        # 各类格子的数量，按格子的值索引，随地图的修改增量更新
+        self.counts = np.array([self._map.size, 0, 0], dtype=np.int64)
+        # 食物密度场，刷新食物时重建，同样随地图的修改增量更新
+        self.food_field = FoodField(shape, config.world.food_field) if config.world.food_field else None
+        self._slots: list[Creature | None] = []
+        self._free: list[int] = []
+        self.engine: VectorEngine | None = None
+        self.year = 0
+        self.lineage = Lineage()
+        self.statistics = Statistics()
+        self.drawer: Drawer | None = None
+        self.recorder: Recorder | None = None
+        self.writer: FrameWriter | None = None
+        self.events: EventLog | None = None
+        self.history: MapHistory | None = None
+        self.metrics: Metrics | None = None
+        # 使用keyed随机数时，逐个模拟的生物本年预先生成的随机数，按槽位排列
+        self.draws: np.ndarray | None = None
+        # object引擎逐个模拟的编译内核，见_jit
+        self._kernel = None
+        if config.world.jit and isinstance(self._map, np.ndarray):
+            from . import _jit
+
+            if _jit.available:
+                self._kernel = _jit.step
+            else:
+                log.warning("未安装numba，使用Python逐个模拟")
+        if not headless:
+            self.attach_drawer()
+            self.attach_recorder()
+
+    def __len__(self) -> int:
+        return len(self.engine) if self.engine is not None else len(self._slots) - len(self._free)
+
+    def _check_objects(self):
+        """向量化引擎以数组保存生物，没有Creature对象"""
+        if self.engine is not None:
+            raise RuntimeError(f"{self.engine.name}引擎中的生物没有Creature对象，请使用snapshot()或engine的各列")
+
+    @property
+    def creatures(self) -> list[Creature]:
+        """所有生物，按槽位顺序排列，只适用于object引擎
+
+        每次访问都重新生成列表，需要多次使用时应先保存到局部变量。
+        """
+        self._check_objects()
+        return [creature for creature in self._slots if creature is not None]
+
+    def creature_at(self, loc: Coordinate) -> Creature | None:
+        """loc处的生物，没有生物时为None，只适用于object引擎"""
+        self._check_objects()
+        slot = self._index[loc.y, loc.x]
+        return self._slots[slot] if slot >= 0 else None
+
+    def attach_drawer(self) -> Drawer:
+        if self.drawer is None:
+            self.drawer = Drawer("生物模拟器", self._map.shape)
+        return self.drawer
+
+    def attach_recorder(self) -> Recorder:
+        if self.recorder is None:
+            self.recorder = Recorder()
+        return self.recorder
+
+    def attach_writer(self, path: str | Path, every: int = 1, fps: float = 30, fourcc: str = "mp4v") -> FrameWriter:
+        """将每every年的地图写入视频文件或图片目录，见FrameWriter"""
+        if self.writer is None:
+            self.writer = FrameWriter(path, self._map.shape, every, fps, fourcc)
+        return self.writer
+
+    def attach_metrics(self, path: str | Path | None = None) -> Metrics:
+        """开始记录每年各阶段的耗时和计数，path不为None时同时逐年写入该文件"""
+        if self.metrics is None:
+            self.metrics = Metrics(path)
+        return self.metrics
+
+    def attach_events(self, path: str | Path, snapshot_every: int = 10, chunk_size: int = 1 << 16) -> EventLog:
+        """将出生、死亡、战斗、进食事件和每snapshot_every年的种群快照写入path目录，每个文件约chunk_size条事件"""
+        if self.events is None:
+            self.events = EventLog(path, snapshot_every, chunk_size)
+        return self.events
+
+    def attach_history(self, path: str | Path, keyframe_every: int = 100) -> MapHistory:
+        """将当前和之后每年年末的地图写入path目录，每keyframe_every年一个关键帧，见MapHistory"""
+        if self.history is None:
+            self.history = MapHistory(path, self._map.shape, keyframe_every)
+            self.history.record(self.year, self._map)
+        return self.history
+
+    def close(self):
+        """关闭已添加的Drawer、Recorder、FrameWriter、事件日志和地图历史，以及引擎的工作进程"""
+        for worker in (self.drawer, self.recorder, self.writer, self.engine):
+            if worker is not None:
+                worker.close()
+        if self.events is not None:
+            self.events.close(self.year)
+        if self.history is not None:
+            self.history.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        self.drawer = self.recorder = self.writer = self.events = self.history = None
+
+    def record_event(self, kind: int, loc: Coordinate, other: Coordinate | None = None, life=0, food=0.0):
+        """逐个模拟时记录事件，未添加事件日志时不做任何事"""
+        if self.events is not None:
+            other_x, other_y = (other.x, other.y) if other is not None else (-1, -1)
+            self.events.add(kind, self.year, loc.x, loc.y, other_x, other_y, life, food)
+
+    def snapshot(self) -> dict[str, np.ndarray]:
+        """所有生物的坐标、食物、年龄、编号、性别和性状"""
+        if self.engine is not None:
+            engine = self.engine
+            columns = ("x", "y", "food", "life", "sex", "traits")
+            return {"id": engine.ids, **{name: getattr(engine, name) for name in columns}}
+        creatures = self.creatures
+        pool = GenomePool.shared(config.gene.base_num)
+        words = pool.words[[c._genome._row for c in creatures]].reshape(-1, pool.words.shape[1])
+        return {
+            "x": np.array([c._loc.x for c in creatures], dtype=np.int32),
+            "y": np.array([c._loc.y for c in creatures], dtype=np.int32),
+            "food": np.array([c.food for c in creatures], dtype=np.float64),
+            "life": np.array([c.life for c in creatures], dtype=np.int32),
+            "id": np.array([c.id for c in creatures], dtype=np.int64),
+            "sex": popcount(words) % 2,
+            "traits": TraitDecoder.get(pool.base_num).decode(words),
+        }
 
     def add_creature(self, creature: Creature):
-        self[creature._loc] = 2
-        self.creatures[creature._loc] = creature
+        if self._free:
+            creature.slot = self._free.pop()
+            self._slots[creature.slot] = creature
+        else:
+            creature.slot = len(self._slots)
+            self._slots.append(creature)
+        self.place(creature)
 
     def remove_creature(self, creature: Creature) -> Creature | None:
-        self[creature._loc] = 0
-        return self.creatures.pop(creature._loc, None)
+        self.lift(creature)
+        self._slots[creature.slot] = None
+        self._free.append(creature.slot)
+        return creature
 
-    def refresh_food(self):
-        # 空地上随机生成食物并在地图上标记为1
-        food_mask = (random(self._map.shape) < config.world.food_rate) & (self._map == 0)
-        self._map = np.where(food_mask, 1, self._map)
+    def place(self, creature: Creature):
+        """将生物放到其所在的格子"""
+        loc = creature._loc
+        self[loc] = CREATURE
+        self._index[loc.y, loc.x] = creature.slot
 
-    def step(self, i: int) -> float:
-        start = time.time()
-        for creature in list(self.creatures.values()):
-            self.remove_creature(creature)
+    def lift(self, creature: Creature):
+        """将生物从地图上拿起，保留槽位"""
+        loc = creature._loc
+        self[loc] = BLANK
+        self._index[loc.y, loc.x] = -1
+
+    def assign(self, cells: np.ndarray, value: int):
+        """将一维索引cells处的格子设为value并更新格子数量，cells中不能有重复"""
+        old = self._map.take(cells)
+        self.counts -= np.bincount(old, minlength=len(self.counts))
+        self._map.put(cells, value)
+        self.counts[value] += len(cells)
+        if self.food_field is not None:
+            self.food_field.update(cells[(old == FOOD) != (value == FOOD)], 1 if value == FOOD else -1)
+
+    def recount(self):
+        """根据地图重新统计格子数量和食物密度场"""
+        if isinstance(self._map, ChunkedMap):
+            self.counts[:] = self._map.bincount(len(self.counts))
+        else:
+            self.counts[:] = np.bincount(self._map.reshape(-1), minlength=len(self.counts))
+        if self.food_field is not None:
+            self.food_field.rebuild(self._map)
+
+    def refresh_food(self, rate: float | None = None):
+        """空地上随机生成食物，直接修改地图"""
+        rate = config.world.food_rate if rate is None else rate
+        rng = generator(config.seed, self.year) if config.world.random == "keyed" else None
+        placed = place_food(self._map, int(self.counts[BLANK]), rate, rng)
+        self.counts[[BLANK, FOOD]] += -placed, placed
+        if placed and self.food_field is not None:
+            self.food_field.rebuild(self._map)
+
+    def _step_creatures(self) -> list[Creature]:
+        """按槽位顺序逐个模拟生物，返回本年参与模拟的生物"""
+        metrics = self.metrics
+        stepped = []
+        for creature in self.creatures:
+            # 生物在移动期间不占据格子
             if creature.is_alive():
+                self.lift(creature)
                 creature.step()
-                self.add_creature(creature)
-                self.recorder.record(creature)
-        self.recorder.done()
-        if i % config.world.food_refresh_year == 0:
-            self.refresh_food()
+                self.place(creature)
+                stepped.append(creature)
+            else:
+                self.record_event(DEATH, creature._loc, life=creature.life, food=creature.food)
+                self.remove_creature(creature)
+                if metrics is not None:
+                    metrics.lap("death", deaths=1)
+        return stepped
+
+    def step(self, i: int) -> float:
+        """模拟第i年，返回用时。事件、谱系、随机数和统计信息都使用i作为年份"""
+        self.year = i
+        start = time.time()
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.start()
+        if self.engine is not None:
+            engine = self.engine
+            engine.step(i)
+            summary = engine.summarize(self.statistics)
+        else:
+            self.draws = None
+            if config.world.random == "keyed":
+                ids = [-1 if creature is None else creature.id for creature in self._slots]
+                self.draws = draw(config.seed, self.year, ids)
+            stepped = self._kernel(self) if self._kernel is not None else self._step_creatures()
+            # 每年统一对参与模拟的生物进行突变，并批量计算统计信息
+            pool = GenomePool.shared(config.gene.base_num)
+            rows = [creature._genome._row for creature in stepped]
+            draws = None
+            if self.draws is not None:
+                draws = self.draws[[creature.slot for creature in stepped]][:, [MUTATE, POSITION]]
+            mutated = pool.mutate(rows, draws=draws)
+            if metrics is not None:
+                metrics.lap("mutate", mutations=len(mutated))
+            words = pool.words[rows]
+            summary = self.statistics.summarize(
+                TraitDecoder.get(pool.base_num).decode(words),
+                popcount(words) % 2,
+                np.array([creature.life for creature in stepped]),
+                np.array([creature.food for creature in stepped]),
+            )
+        rate = food_rate(i)
+        if rate:
+            self.refresh_food(rate)
+        if metrics is not None:
+            metrics.lap("refresh")
+        # 统计年末的地图，与绘制的地图一致
+        summary = self.statistics.append(i, int(self.counts[FOOD]), summary)
+        if self.recorder is not None:
+            self.recorder.update(summary)
+        if self.events is not None:
+            self.events.end_year(i, self.snapshot() if self.events.snapshot_due(i) else None)
+        if self.history is not None:
+            self.history.record(i, self._map)
+        if metrics is not None:
+            metrics.lap("record")
+            metrics.end_year(i)
         return time.time() - start
 
+    def show(self, delay: int = 1) -> bool:
+        """将当前地图提交给FrameWriter和Drawer，返回Drawer是否绘制，绘制进程繁忙时Drawer丢弃该帧"""
+        if self.drawer is None and self.writer is None:
+            return False
+        foods = int(self.counts[FOOD])
+        if self.writer is not None:
+            self.writer.draw(self._map, delay, foods, len(self))
+        return self.drawer is not None and self.drawer.draw(self._map, delay, foods, len(self))
+
     def start(self, max_round: int = 100):
+        """交互模式，按照second_per_year控制速度，结束后等待输入再关闭窗口"""
+        from tqdm import trange
+
         print(config.model_dump_json(indent=2))
-        for i in trange(1, max_round + 1):
+        for _ in trange(max_round):
+            self.year += 1
             try:
-                cost = self.step(i)
-                delay = max(1, int((config.world.second_per_year - cost) * 1000))
-                self.drawer.queue.put((self._map, delay))
+                cost = self.step(self.year)
+                self.show(max(1, int((config.world.second_per_year - cost) * 1000)))
             except KeyboardInterrupt:
                 if input("Input q to exit...\n") == "q":
                     break
-            if i % 5 == 0:
-                log.debug(f"第{i}年，共有{len(self.creatures)}个生物")
-        input("Wait...")
-        self.drawer.close()
-        self.recorder.close()
-
-    def __getitem__(self, loc: Coordinate):
-        if not all((0 <= loc.x < self._map.shape[1], 0 <= loc.y < self._map.shape[0])):
+            if self.year % 5 == 0:
+                log.debug(f"第{self.year}年，共有{len(self)}个生物")
+        if self.drawer is not None or self.recorder is not None:
+            input("Wait...")
+        self.close()
+
+    def run(self, years: int, checkpoint: str | Path | None = None, checkpoint_every: int = 0) -> int:
+        """批量模式，不限制速度地连续模拟years年后返回当前年份
+
+        Args:
+            checkpoint: 快照文件路径，每checkpoint_every年覆盖保存一次
+        """
+        for _ in range(years):
+            self.year += 1
+            self.step(self.year)
+            self.show()
+            if checkpoint is not None and checkpoint_every and self.year % checkpoint_every == 0:
+                self.save(checkpoint)
+        return self.year
+
+    def save(self, path: str | Path):
+        """保存快照，包括地图、生物、年份和随机数状态"""
+        _checkpoint.save(self, path)
+
+    @classmethod
+    def load(cls, path: str | Path, headless: bool = False) -> "World":
+        """从快照恢复，配置和随机数状态也一并恢复"""
+        return _checkpoint.load(path, headless)
+
+    def __getitem__(self, loc: Coordinate | Coordinates):
+        """读取格子，超出地图时Coordinate返回None，Coordinates中对应的值为-1"""
+        height, width = self._map.shape
+        if isinstance(loc, Coordinates):
+            inside = loc.inside((height, width))
+            values = np.full(len(loc), -1, dtype=np.int8)
+            values[inside] = self._map.take(loc[inside].index(width))
+            return values
+        if not (0 <= loc.x < width and 0 <= loc.y < height):
             return None
-        return self._map[loc.y][loc.x]
+        return self._map[loc.y, loc.x]
 
-    def __setitem__(self, loc: Coordinate, value: int):
-        if not all((0 <= loc.x < self._map.shape[1], 0 <= loc.y < self._map.shape[0])):
+    def __setitem__(self, loc: Coordinate | Coordinates, value: int):
+        """写入格子，忽略超出地图的坐标"""
+        height, width = self._map.shape
+        if isinstance(loc, Coordinates):
+            self.assign(np.unique(loc[loc.inside((height, width))].index(width)), value)
+            return
+        if not (0 <= loc.x < width and 0 <= loc.y < height):
             return None
-        self._map[loc.y][loc.x] = value
+        old = self._map[loc.y, loc.x]
+        self.counts[old] -= 1
+        self.counts[value] += 1
+        self._map[loc.y, loc.x] = value
+        if self.food_field is not None and (old == FOOD) != (value == FOOD):
+            self.food_field.update(loc.y * width + loc.x, 1 if value == FOOD else -1)
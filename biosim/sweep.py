@@ -0,0 +1,163 @@
+"""参数扫描：在进程池中并行运行多组配置的无界面世界，逐条写入JSON Lines结果文件
+
+配置是进程内的全局对象，因此每个模拟在工作进程中先恢复基准配置再应用自己的修改。
+单个模拟抛出异常时记录错误信息，不影响其他模拟。工作进程意外退出（内存不足被杀死、段错误等）时进程池失效，
+重建进程池继续运行未完成的模拟，两次遇到进程池失效的模拟改为单独运行，单独运行时仍然退出则记录为失败。
+
+命令行示例：
+    python -m biosim.sweep 500 --grid world.food_rate=0.005,0.01 --grid gene.mutation_rate=1e-5,1e-4 \\
+        --seeds 1 2 3 --output sweep.jsonl
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import random
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Iterable, Iterator, get_args
+
+import numpy as np
+
+from ._config import Engine, config
+from ._world import World
+
+
+def expand(grid: dict[str, Iterable[Any]], seeds: Iterable[int] = (0,)) -> list[dict[str, Any]]:
+    """将参数网格展开为每个模拟的配置修改，与seeds做笛卡尔积"""
+    keys = list(grid)
+    return [
+        {**dict(zip(keys, values)), "seed": seed}
+        for values in itertools.product(*grid.values())
+        for seed in seeds
+    ]
+
+
+def run(task: tuple[int, dict, dict, int, Engine | None]) -> dict[str, Any]:
+    """在工作进程中运行一个模拟，返回结果记录，异常时返回错误信息"""
+    index, base, overrides, years, engine = task
+    record: dict[str, Any] = {"run": index, "overrides": overrides}
+    start = time.time()
+    try:
+        config.update(base).update(overrides)
+        config.set_seed()
+        if not config.seed:
+            # 不固定种子时重新取系统熵，避免fork出的进程沿用相同的随机数状态
+            random.seed()
+            np.random.seed()
+        world = World(engine, headless=True)
+        world.run(years)
+        data = world.statistics.data
+        record["years"] = world.year
+        record["population"] = len(world)
+        record["statistics"] = {field: data[field].tolist() for field in data.dtype.names}
+    except Exception:
+        record["error"] = traceback.format_exc()
+    record["elapsed"] = time.time() - start
+    return record
+
+
+def _execute(tasks: list[tuple], processes: int) -> Iterator[dict[str, Any]]:
+    """在进程池中运行tasks，按完成顺序返回结果记录，工作进程意外退出时重建进程池"""
+    breaks = dict.fromkeys((task[0] for task in tasks), 0)  # 每个模拟遇到进程池失效的次数
+    pending = list(tasks)
+    while pending:
+        suspects = [task for task in pending if breaks[task[0]] >= 2]
+        batch = suspects[:1] or pending
+        finished = set()
+        start = time.time()
+        with ProcessPoolExecutor(min(processes, len(batch))) as executor:
+            futures = {executor.submit(run, task): task for task in batch}
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except BrokenProcessPool:
+                    continue
+                finished.add(record["run"])
+                yield record
+        for task in batch:
+            if task[0] in finished:
+                continue
+            if suspects:
+                index, _, overrides, _, _ = task
+                finished.add(index)
+                yield {"run": index, "overrides": overrides, "error": "工作进程意外退出", "elapsed": time.time() - start}
+            else:
+                breaks[task[0]] += 1
+        pending = [task for task in pending if task[0] not in finished]
+
+
+def sweep(
+    runs: Iterable[dict[str, Any]],
+    years: int,
+    output: str | Path | None = None,
+    engine: Engine | None = None,
+    processes: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """并行运行所有模拟，按完成顺序返回结果记录
+
+    Args:
+        runs: 每个模拟的配置修改，见Config.update
+        output: 结果文件，每完成一个模拟追加一行
+        processes: 进程数，默认为CPU核数
+    """
+    base = config.model_dump()
+    tasks = [(i, base, overrides, years, engine) for i, overrides in enumerate(runs)]
+    processes = min(processes or os.cpu_count() or 1, max(len(tasks), 1))
+    with (open(output, "w", encoding="utf-8") if output else nullcontext()) as fp:
+        for record in _execute(tasks, processes):
+            if fp is not None:
+                fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+                fp.flush()
+            yield record
+
+
+def _parse_value(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def main(argv: list[str] | None = None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog="python -m biosim.sweep", description="并行参数扫描")
+    parser.add_argument("years", type=int, help="每个模拟的年数")
+    parser.add_argument("--grid", action="append", default=[], help="参数网格，如world.food_rate=0.005,0.01")
+    parser.add_argument("--runs", default=None, help="JSON文件，内容为配置修改的列表，与--grid二选一")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="随机种子，0表示不固定种子")
+    parser.add_argument("--engine", choices=get_args(Engine), default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", default="sweep.jsonl")
+    args = parser.parse_args(argv)
+
+    if args.runs:
+        runs = [
+            {**overrides, "seed": seed}
+            for overrides in json.loads(Path(args.runs).read_text(encoding="utf-8"))
+            for seed in args.seeds
+        ]
+    else:
+        grid = {}
+        for item in args.grid:
+            key, values = item.split("=", 1)
+            grid[key] = [_parse_value(value) for value in values.split(",")]
+        runs = expand(grid, args.seeds)
+
+    failed = 0
+    for i, record in enumerate(sweep(runs, args.years, args.output, args.engine, args.processes), 1):
+        status = "失败" if "error" in record else f"{record['population']}个生物"
+        failed += "error" in record
+        print(f"[{i}/{len(runs)}] 第{record['run']}组 {record['overrides']}：{status}，用时{record['elapsed']:.2f}秒")
+    print(f"结果已写入{args.output}，失败{failed}组")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,37 +2,52 @@ from __future__ import annotations
 
 import signal
 import sys
+import threading
 import time
-import typing
-from functools import partial
-from multiprocessing import JoinableQueue, Process
-from typing import Iterator
+from functools import cache, partial
+from multiprocessing import JoinableQueue, Process, Semaphore
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Callable, Iterator
 
-import cv2
-import matplotlib.pyplot as plt
 import numpy as np
 
 from ._config import config
 from ._coordinate import Coordinate
+from ._genome import TRAITS
 
-if typing.TYPE_CHECKING:
-    from ._creature import Creature
+# 空地、食物、生物的BGR颜色
+PALETTE = np.array([[0, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
 
-UI_SIZE = (config.ui.width, config.ui.height)
-CV2_FONT_CONFIG = {
-    "fontFace": cv2.FONT_HERSHEY_COMPLEX,
-    "fontScale": 0.5,
-    "thickness": 1,
-}
-(_, CV2_TEXT_HEIGHT), _ = cv2.getTextSize("test", **CV2_FONT_CONFIG)
 
-match sys.platform:
-    case "win32":
-        plt.rcParams["font.sans-serif"] = ["SimHei"]
-    case "darwin":
-        plt.rcParams["font.sans-serif"] = ["PingFang HK"]
-    case _:
-        pass
+# cv2和matplotlib只在创建Drawer/Recorder时导入，无界面模式不需要安装图形环境
+@cache
+def load_cv2():
+    """导入cv2并计算文字参数，返回cv2模块、字体配置和行高"""
+    import cv2
+
+    font_config = {
+        "fontFace": cv2.FONT_HERSHEY_COMPLEX,
+        "fontScale": 0.5,
+        "thickness": 1,
+    }
+    (_, text_height), _ = cv2.getTextSize("test", **font_config)
+    return cv2, font_config, text_height
+
+
+@cache
+def load_pyplot():
+    """导入matplotlib.pyplot并设置中文字体"""
+    import matplotlib.pyplot as plt
+
+    match sys.platform:
+        case "win32":
+            plt.rcParams["font.sans-serif"] = ["SimHei"]
+        case "darwin":
+            plt.rcParams["font.sans-serif"] = ["PingFang HK"]
+        case _:
+            pass
+    return plt
 
 
 def spiral_scan(max_radius: int) -> Iterator[tuple[int, Coordinate]]:
@@ -86,105 +101,223 @@ class Worker:
     def handle(self, item):
         raise NotImplementedError()
 
+    def join(self) -> bool:
+        """等待队列中的任务全部完成，进程已退出时不再等待，返回是否全部完成"""
+        waiter = threading.Thread(target=self.queue.join, daemon=True)
+        waiter.start()
+        while waiter.is_alive() and self.process.is_alive():
+            waiter.join(0.1)
+        return not waiter.is_alive()
+
     def close(self):
         self.queue.close()
         self.process.terminate()
 
 
+class FrameRing:
+    """共享内存中的一组地图缓冲区，模拟进程按顺序写入，绘制进程读取后释放。
+    所有缓冲区都在使用中时写入失败，由调用方丢弃该帧，而不是阻塞模拟。
+    """
+
+    def __init__(self, shape: tuple[int, int], slots: int = 2) -> None:
+        self.shape, self.slots = shape, slots
+        self.shm = SharedMemory(create=True, size=slots * shape[0] * shape[1])
+        self.free = Semaphore(slots)  # 空闲缓冲区数量
+        self.next = 0  # 下一个写入的缓冲区
+        self._attach()
+
+    def _attach(self):
+        self.frames = np.ndarray((self.slots, *self.shape), dtype=np.int8, buffer=self.shm.buf)
+
+    def __getstate__(self) -> dict:
+        # 以spawn方式启动子进程时通过名字重新连接共享内存
+        state = self.__dict__.copy()
+        state.pop("frames")
+        state["shm"] = self.shm.name
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.shm = SharedMemory(name=state["shm"])
+        self._attach()
+
+    def put(self, _map: np.ndarray, block: bool = False, alive: Callable[[], bool] | None = None) -> int | None:
+        """写入一帧，返回缓冲区序号，没有空闲缓冲区时返回None
+
+        Args:
+            block: 等待空闲缓冲区
+            alive: 等待时定期检查读取端是否存活，返回False时放弃等待并返回None
+        """
+        if block and alive is not None:
+            while not self.free.acquire(timeout=0.1):
+                if not alive():
+                    return None
+        elif not self.free.acquire(block=block):
+            return None
+        slot = self.next
+        self.frames[slot] = _map
+        self.next = (slot + 1) % self.slots
+        return slot
+
+    def release(self, slot: int):
+        self.free.release()
+
+    def close(self):
+        del self.frames
+        self.shm.close()
+        self.shm.unlink()
+
+
 class Drawer(Worker):
-    """绘制地图的进程，从队列中获取地图和延迟，然后绘制地图"""
+    """绘制地图的进程，从共享内存读取地图，从队列中获取缓冲区序号、延迟和食物、生物数量，然后绘制地图"""
 
-    queue: JoinableQueue[tuple[np.ndarray, int]]
+    queue: JoinableQueue[tuple[int, int, int, int]]
 
-    def __init__(self, window_name: str) -> None:
+    def __init__(self, window_name: str, shape: tuple[int, int], slots: int = 2) -> None:
+        """
+        Args:
+            shape: 地图大小
+            slots: 缓冲区数量，绘制速度跟不上时丢弃新的帧
+        """
         self.window_name = window_name
         self.frames = 0
+        self.dropped = 0
         self.start_time = 0
         self.text_template = "FPS: {:.1f}\nFoods: {:d}\nCreatures: {:d}"
+        self.ring = FrameRing(shape, slots)
         super().__init__()
 
-    def handle(self, item: tuple[np.ndarray, int]):
+    def draw(self, _map: np.ndarray, delay: int, foods: int, creatures: int, block: bool = False) -> bool:
+        """提交一帧，绘制进程繁忙时丢弃并返回False，block为True时等待空闲缓冲区，绘制进程退出时返回False"""
+        slot = self.ring.put(_map, block, self.process.is_alive)
+        if slot is None:
+            self.dropped += 1
+            return False
+        self.queue.put((slot, delay, foods, creatures))
+        return True
+
+    def render(self, slot: int, foods: int, creatures: int) -> np.ndarray:
+        """将缓冲区中的地图转换为带有文字的uint8 BGR图像，复制后立即释放缓冲区"""
+        cv2, font_config, text_height = load_cv2()
         if not self.start_time:
             self.start_time = time.time()
-        _map, delay = item
-        # convert matrix to image
-        resized_map = cv2.resize(_map, UI_SIZE, interpolation=cv2.INTER_NEAREST)
-        color_map = (
-            np.stack([np.zeros_like(resized_map), (resized_map == 1), resized_map == 2])
-            .transpose(1, 2, 0)
-            .astype(np.float32)
-        ).copy()
-        # compute fps, foods and creatures
+        ui_size = (config.ui.width, config.ui.height)
+        resized_map = cv2.resize(self.ring.frames[slot], ui_size, interpolation=cv2.INTER_NEAREST)
+        self.ring.release(slot)
+        image = PALETTE[resized_map]
+        # compute fps
         self.frames += 1
         fps = self.frames / ((time.time() - self.start_time) or 1)
-        foods, creatures = (_map == 1).sum(), (_map == 2).sum()
         put_text = partial(
             cv2.putText,
-            color_map,
-            **CV2_FONT_CONFIG,
+            image,
+            **font_config,
             color=(255, 255, 255),
         )
         # add text to image
         for i, text in enumerate(self.text_template.format(fps, foods, creatures).split("\n")):
-            put_text(text, (10, 20 + i * CV2_TEXT_HEIGHT))
-        # display image
-        cv2.imshow(self.window_name, color_map)
+            put_text(text, (10, 20 + i * text_height))
+        return image
+
+    def handle(self, item: tuple[int, int, int, int]):
+        cv2 = load_cv2()[0]
+        slot, delay, foods, creatures = item
+        cv2.imshow(self.window_name, self.render(slot, foods, creatures))
         cv2.waitKey(delay)
 
     def close(self):
-        cv2.destroyAllWindows()
         super().close()
+        self.ring.close()
+        load_cv2()[0].destroyAllWindows()
+
+
+class FrameWriter(Drawer):
+    """离线绘制地图的进程，不需要图形界面，将帧写入视频文件或图片序列
+
+    path有后缀时通过cv2.VideoWriter编码为视频，没有后缀时作为目录，每帧保存为一张png图片。
+    编码速度跟不上时draw会等待空闲缓冲区而不是丢弃帧。
+    """
+
+    def __init__(
+        self, path: str | Path, shape: tuple[int, int], every: int = 1, fps: float = 30, fourcc: str = "mp4v"
+    ) -> None:
+        """
+        Args:
+            every: 每every次draw写入一帧
+            fps: 视频的帧率
+            fourcc: 视频的编码格式
+        """
+        self.path = Path(path)
+        self.every = every
+        self.fps = fps
+        self.fourcc = fourcc
+        self.calls = 0
+        self.writer = None
+        if not self.path.suffix:
+            self.path.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(self.path), shape, slots=4)
+
+    def draw(self, _map: np.ndarray, delay: int, foods: int, creatures: int, block: bool = True) -> bool:
+        """提交一帧，抽帧时跳过并返回False，总是等待空闲缓冲区，写入进程退出时返回False"""
+        self.calls += 1
+        if (self.calls - 1) % self.every:
+            return False
+        slot = self.ring.put(_map, True, self.process.is_alive)
+        if slot is None:
+            return False
+        self.queue.put((slot, delay, foods, creatures))
+        return True
+
+    def handle(self, item: tuple[int, int, int, int] | None):
+        cv2 = load_cv2()[0]
+        if item is None:
+            if self.writer is not None:
+                self.writer.release()
+            return
+        slot, _, foods, creatures = item
+        image = self.render(slot, foods, creatures)
+        if not self.path.suffix:
+            cv2.imwrite(str(self.path / f"frame-{self.frames:08d}.png"), image)
+            return
+        if self.writer is None:
+            fourcc = cv2.VideoWriter_fourcc(*self.fourcc)
+            self.writer = cv2.VideoWriter(str(self.path), fourcc, self.fps, (image.shape[1], image.shape[0]))
+        self.writer.write(image)
+
+    def close(self):
+        """等待所有帧写入完成后关闭，写入进程已退出时直接关闭"""
+        self.queue.put(None)
+        self.join()
+        Worker.close(self)
+        self.ring.close()
 
 
 class Recorder(Worker):
-    queue: JoinableQueue[Creature | None]
+    """绘制统计图表的进程，从队列中获取每年的汇总统计（Statistics中的一条记录）"""
+
+    queue: JoinableQueue[np.ndarray]
 
     def __init__(self) -> None:
-        self.clear()
-        self.years = 0
-        self.fig = plt.figure(figsize=(12, 6), dpi=100)
+        self.fig = load_pyplot().figure(figsize=(12, 6), dpi=100)
         self.trait_ax = self.fig.add_subplot(1, 2, 1)
         self.trait_ax.set_xlabel("特征分布")
         self.age_ax = self.fig.add_subplot(1, 2, 2)
         self.age_ax.set_xlabel("年龄分布")
         super().__init__()
 
-    def handle(self, creature: Creature | None):
-        if creature is None:
-            self.draw()
-            return
-        for trait, value in creature.traits.items():
-            self.statistics["traits"][trait] += value
-        sex = "雄性" if creature.sex else "雌性"
-        self.statistics["traits"][sex] += 1
-        self.statistics["ages"].append(creature.life)
-
-    def draw(self):
-        self.years += 1
-        self.fig.suptitle(f"第 {self.years} 年")
+    def handle(self, summary: np.ndarray):
+        traits = dict(zip(TRAITS, summary["traits"].tolist()))
+        values = {trait: traits[trait] for trait in ("智力", "体力", "幸运", "外貌")}
+        values.update({"雄性": int(summary["male"]), "雌性": int(summary["female"])})
+        bins = np.arange(0, config.creature.life + 1, 10)
+        self.fig.suptitle(f"第 {summary['year']} 年")
         self.trait_ax.clear()
-        self.trait_ax.bar(
-            list(self.statistics["traits"].keys()), self.statistics["traits"].values()
-        )
+        self.trait_ax.bar(list(values.keys()), values.values())
         self.age_ax.clear()
-        self.age_ax.hist(
-            self.statistics["ages"],
-            bins=range(0, config.creature.life + 1, 10),
-            rwidth=0.8,
-            range=(0, config.creature.life),
-        )
+        self.age_ax.bar(bins[:-1], summary["ages"], width=np.diff(bins) * 0.8, align="edge")
         self.fig.canvas.draw()
-        plt.pause(0.01)
-        self.clear()
-
-    def done(self):
-        self.queue.put(None)
-
-    def record(self, creature: Creature):
-        self.queue.put(creature)
+        load_pyplot().pause(0.01)
 
-    def clear(self):
-        self.statistics = {
-            "traits": {"智力": 0, "体力": 0, "幸运": 0, "外貌": 0, "雄性": 0, "雌性": 0},
-            "ages": [],
-        }
+    def update(self, summary: np.ndarray):
+        """提交一年的汇总统计"""
+        self.queue.put(summary)
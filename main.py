@@ -1,10 +1,70 @@
-from biosim import World
+import time
+from typing import get_args
+
+from biosim import World, config, read_history
+from biosim._config import Engine, RandomSource
+from biosim.utils import Drawer, FrameWriter
 
 if __name__ == "__main__":
     from argparse import ArgumentParser
 
     parser = ArgumentParser()
     parser.add_argument("years", type=int, default=500, nargs="?")
+    parser.add_argument("--engine", choices=get_args(Engine), default=None)
+    parser.add_argument("--random", choices=get_args(RandomSource), default=None, help="随机数来源，见world.random")
+    parser.add_argument("--jit", action="store_true", help="object引擎使用numba编译的内核，未安装numba时忽略")
+    parser.add_argument("--food-field", type=int, default=None, help="食物密度场的块边长，见world.food_field")
+    parser.add_argument("--headless", action="store_true", help="无界面模式，不限速运行后退出")
+    parser.add_argument("--checkpoint", default=None, help="无界面模式下定期保存快照的路径")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="快照间隔年数")
+    parser.add_argument("--resume", default=None, help="从快照恢复后继续模拟")
+    parser.add_argument("--events", default=None, help="记录事件和种群快照的目录")
+    parser.add_argument("--history", default=None, help="逐年记录地图变化的目录，之后可用--replay回放")
+    parser.add_argument("--keyframe-every", type=int, default=100, help="地图历史的关键帧间隔年数")
+    parser.add_argument("--replay", default=None, help="不模拟，回放地图历史目录，指定--video时写入视频")
+    parser.add_argument("--metrics", default=None, help="逐年写入各阶段耗时和计数的JSON Lines文件")
+    parser.add_argument("--video", default=None, help="无界面模式下写入的视频文件，没有后缀时作为图片目录")
+    parser.add_argument("--video-every", type=int, default=1, help="每隔多少年写入一帧")
     args = parser.parse_args()
     print(args)
-    World().start(args.years)
+    if args.jit:
+        config.update({"world.jit": True})
+    if args.random:
+        config.update({"world.random": args.random})
+    if args.food_field is not None:
+        config.update({"world.food_field": args.food_field})
+    if args.replay:
+        history = read_history(args.replay)
+        if args.video:
+            writer = FrameWriter(args.video, history.shape, args.video_every)
+            history.replay(writer)
+            writer.close()
+        else:
+            drawer = Drawer("生物模拟器", history.shape)
+            history.replay(drawer, delay=max(1, int(config.world.second_per_year * 1000)))
+            drawer.join()
+            input("Wait...")
+            drawer.close()
+    elif args.headless:
+        start = time.time()
+        world = World.load(args.resume, headless=True) if args.resume else World(args.engine, headless=True)
+        if args.events:
+            world.attach_events(args.events)
+        if args.history:
+            world.attach_history(args.history, args.keyframe_every)
+        if args.video:
+            world.attach_writer(args.video, args.video_every)
+        if args.metrics:
+            world.attach_metrics(args.metrics)
+        world.run(args.years, args.checkpoint, args.checkpoint_every)
+        world.close()
+        print(f"模拟{args.years}年，用时{time.time() - start:.2f}秒，共有{len(world)}个生物")
+    else:
+        world = World.load(args.resume) if args.resume else World(args.engine)
+        if args.events:
+            world.attach_events(args.events)
+        if args.history:
+            world.attach_history(args.history, args.keyframe_every)
+        if args.metrics:
+            world.attach_metrics(args.metrics)
+        world.start(args.years)
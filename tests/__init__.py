@@ -0,0 +1,12 @@
+from unittest import TestCase
+
+from biosim import config
+
+
+class ConfigTestCase(TestCase):
+    """每个测试结束后恢复全局配置，子类在setUp中修改配置前调用super().setUp()"""
+
+    def setUp(self) -> None:
+        backup = config.model_copy(deep=True)
+        for name in type(config).model_fields:
+            self.addCleanup(setattr, config, name, getattr(backup, name))
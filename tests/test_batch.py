@@ -0,0 +1,55 @@
+import random
+
+import numpy as np
+
+from biosim import World, WorldBatch, config
+from tests import ConfigTestCase
+
+
+class TestWorldBatch(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 30, "world.height": 24, "world.init_count": 50, "gene.mutation_rate": 0.02})
+        self.seeds = [3, 5, 8]
+
+    def standalone(self, seed: int, years: int) -> World:
+        config.set_seed(seed)
+        world = World("vector", headless=True)
+        world.run(years)
+        return world
+
+    def test_equivalent(self):
+        # 批量模拟中每个世界的结果与单独运行一致
+        batch = WorldBatch(self.seeds)
+        self.assertEqual(batch.run(30), 30)
+        for b, seed in enumerate(self.seeds):
+            world = self.standalone(seed, 30)
+            np.testing.assert_array_equal(batch.statistics[b].data, world.statistics.data)
+            np.testing.assert_array_equal(batch.maps[b, : batch.shape[0]], world._map)
+            self.assertEqual(batch.populations()[b], len(world))
+        # 隔离带保持不变
+        self.assertTrue((batch.maps[:, batch.shape[0] :] == -1).all())
+
+    def test_extract(self):
+        batch = WorldBatch(self.seeds)
+        batch.run(15)
+        world = batch.extract(1)
+        world.run(10)
+        batch.run(10)
+        np.testing.assert_array_equal(world.statistics.data, batch.statistics[1].data)
+        np.testing.assert_array_equal(world._map, batch.maps[1, : batch.shape[0]])
+
+    def test_seeds(self):
+        # 种子为0的世界取系统熵生成新的种子，创建后全局随机数状态和config.seed不变
+        config.set_seed(7)
+        state = random.getstate()
+        value = np.random.random_sample()
+        config.set_seed(7)
+        batch = WorldBatch([3, 0])
+        self.assertNotIn(batch.seeds[1], (0, 3))
+        self.assertFalse(np.array_equal(batch.maps[0], batch.maps[1]))
+        self.assertEqual(config.seed, 7)
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(np.random.random_sample(), value)
+        with self.assertRaises(ValueError):
+            WorldBatch([3, 5, 3])
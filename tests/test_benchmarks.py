@@ -0,0 +1,43 @@
+import importlib.util
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+spec = importlib.util.spec_from_file_location("suite", Path(__file__).parents[1] / "benchmarks" / "suite.py")
+suite = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(suite)
+
+
+class TestCompare(TestCase):
+    def test_compare(self):
+        params = {"engine": "vector", "size": 64, "repeat": 3}
+        base = {"results": [{"name": "world", "params": params, "metrics": {"steps_per_s": 100.0, "peak_mb": 50.0}}]}
+        new = {
+            "results": [
+                {"name": "world", "params": {**params, "repeat": 1}, "metrics": {"steps_per_s": 80.0, "peak_mb": 52.0}},
+                {"name": "world", "params": {**params, "size": 128}, "metrics": {"steps_per_s": 1.0}},
+            ]
+        }
+        changes = {change["metric"]: change for change in suite.compare(base, new, threshold=0.1)}
+        self.assertEqual(set(changes), {"steps_per_s", "peak_mb"})
+        # 吞吐量下降20%为退化，内存增加4%在阈值内
+        self.assertTrue(changes["steps_per_s"]["regression"])
+        self.assertAlmostEqual(changes["steps_per_s"]["change"], -0.2)
+        self.assertFalse(changes["peak_mb"]["regression"])
+        self.assertFalse(suite.compare(base, base)[0]["regression"])
+
+    def test_speedup(self):
+        # 加速比越大越好
+        params = {"size": 512, "workers": 4}
+        base = {"results": [{"name": "scaling", "params": params, "metrics": {"speedup": 3.6}}]}
+        new = {"results": [{"name": "scaling", "params": params, "metrics": {"speedup": 2.4}}]}
+        self.assertTrue(suite.compare(base, new)[0]["regression"])
+        self.assertFalse(suite.compare(new, base)[0]["regression"])
+
+    def test_equilibrium(self):
+        # 食物存量增长20年后按30年的时间常数衰减
+        years = np.arange(300)
+        foods = np.where(years < 20, years * 50, 50 + 950 * np.exp(-(years - 20) / 30))
+        self.assertAlmostEqual(suite.equilibrium_years(foods), 20 + 30, delta=10)
+        self.assertEqual(suite.equilibrium_years(np.full(100, 5.0)), 10)
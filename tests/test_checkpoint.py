@@ -0,0 +1,66 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from biosim import World, config
+from biosim._checkpoint import read
+from tests import ConfigTestCase
+
+
+class TestCheckpoint(ConfigTestCase):
+    def setUp(self) -> None:
+        # 恢复快照时会覆盖全局配置
+        super().setUp()
+        config.world = config.world.model_copy(update={"width": 32, "height": 32, "init_count": 40})
+        config.gene = config.gene.model_copy(update={"mutation_rate": 0.01})
+        config.set_seed(7)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "world.ckpt"
+
+    def resume(self, engine: str):
+        world = World(engine, headless=True)
+        self.addCleanup(world.close)
+        world.run(20, checkpoint=self.path, checkpoint_every=10)
+        # 快照之后继续运行的结果作为对照
+        world.run(15)
+        expected = world.statistics.data.copy()
+        restored = World.load(self.path, headless=True)
+        self.assertEqual(restored.year, 20)
+        self.assertEqual(len(restored.statistics), 20)
+        restored.run(15)
+        np.testing.assert_array_equal(restored.statistics.data, expected)
+        np.testing.assert_array_equal(np.asarray(restored._map), np.asarray(world._map))
+        np.testing.assert_array_equal(restored.lineage.parents, world.lineage.parents)
+        return restored
+
+    def test_object(self):
+        world = self.resume("object")
+        np.testing.assert_array_equal(world._index >= 0, world._map == 2)
+
+    def test_vector(self):
+        world = self.resume("vector")
+        self.assertIsNotNone(world.engine)
+
+    def test_tiled(self):
+        config.world.tiles = (2, 2)
+        world = self.resume("tiled")
+        self.addCleanup(world.close)
+        self.assertEqual(world.engine.name, "tiled")
+
+    def test_sparse(self):
+        config.world.storage = "sparse"
+        world = self.resume("vector")
+        self.assertEqual(world.counts[2], len(world))
+
+    def test_format(self):
+        world = World("vector", headless=True)
+        world.run(3)
+        world.save(self.path)
+        header, arrays = read(self.path)
+        self.assertEqual(header["year"], 3)
+        # 数组直接映射自文件
+        self.assertIsInstance(arrays["map"].base, np.memmap)
+        np.testing.assert_array_equal(arrays["map"], world._map)
+        np.testing.assert_array_equal(arrays["life"], world.engine.life)
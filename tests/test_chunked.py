@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+import numpy as np
+
+from biosim import World, config
+from biosim._chunked import ChunkedMap
+from tests import ConfigTestCase
+
+
+class TestChunkedMap(TestCase):
+    def test_dense_equivalent(self):
+        rng = np.random.default_rng(0)
+        dense = np.zeros((37, 53), dtype=np.int8)
+        sparse = ChunkedMap(dense.shape, chunk=8)
+        for _ in range(100):
+            cells = rng.choice(dense.size, rng.integers(1, 40), replace=False)
+            values = rng.integers(0, 3, len(cells)).astype(np.int8)
+            dense.put(cells, values)
+            sparse.put(cells, values)
+            query = rng.integers(0, dense.size, 100)
+            np.testing.assert_array_equal(sparse.take(query), dense.take(query))
+        np.testing.assert_array_equal(np.asarray(sparse), dense)
+        np.testing.assert_array_equal(sparse[3:20, 40:60], dense[3:20, 40:60])
+        self.assertEqual(sparse[5, 7], dense[5, 7])
+        np.testing.assert_array_equal(sparse.bincount(3), np.bincount(dense.reshape(-1), minlength=3))
+        restored = ChunkedMap.from_chunks(dense.shape, 8, *sparse.chunks())
+        np.testing.assert_array_equal(np.asarray(restored), dense)
+        # 清空后释放所有块
+        sparse.put(np.arange(dense.size), 0)
+        self.assertEqual(len(sparse.keys), 0)
+
+    def test_memory(self):
+        sparse = ChunkedMap((1 << 20, 1 << 20))
+        cells = np.random.default_rng(1).choice(sparse.size, 1000, replace=False)
+        sparse.put(cells, 1)
+        self.assertEqual(sparse.bincount(2)[1], 1000)
+        self.assertLess(sparse.nbytes, 1 << 20)
+
+
+class TestSparseWorld(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 40, "world.height": 30, "world.init_count": 60, "world.food_rate": 0.05})
+
+    def run_world(self, engine: str, storage: str) -> World:
+        config.update({"world.storage": storage, "world.chunk_size": 8})
+        config.set_seed(9)
+        world = World(engine, headless=True)
+        world.run(20)
+        return world
+
+    def test_same_as_dense(self):
+        # 存储方式不影响模拟结果
+        for engine in ("object", "vector"):
+            dense, sparse = self.run_world(engine, "dense"), self.run_world(engine, "sparse")
+            self.assertIsInstance(sparse._map, ChunkedMap)
+            np.testing.assert_array_equal(sparse.statistics.data, dense.statistics.data)
+            np.testing.assert_array_equal(np.asarray(sparse._map), dense._map)
+            np.testing.assert_array_equal(sparse.counts, dense.counts)
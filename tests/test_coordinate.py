@@ -1,6 +1,11 @@
-from biosim import Coordinate
 from unittest import TestCase
 
+import numpy as np
+
+from biosim import Coordinate, Coordinates, World, config
+from biosim._neighborhood import BLANK, CREATURE, FOOD
+from tests import ConfigTestCase
+
 
 class TestCoordinate(TestCase):
     def test_operator(self):
@@ -9,3 +14,48 @@ class TestCoordinate(TestCase):
         right = Coordinate(1, 0)
         self.assertEqual(origin + left, left)
         self.assertEqual(origin - right, left)
+
+    def test_batch(self):
+        points = Coordinates([0, 3, -2], [1, 4, 5])
+        self.assertEqual(len(points), 3)
+        self.assertEqual(points[1], Coordinate(3, 4))
+        self.assertEqual(list(points), [Coordinate(0, 1), Coordinate(3, 4), Coordinate(-2, 5)])
+        moved = points + Coordinate(1, -1)
+        np.testing.assert_array_equal(moved.x, [1, 4, -1])
+        np.testing.assert_array_equal((moved - points).y, [-1, -1, -1])
+        np.testing.assert_array_equal(points == Coordinate(3, 4), [False, True, False])
+        # 与标量Coordinate的结果一致
+        other = Coordinate(2, 2)
+        np.testing.assert_array_equal(points.distance(other), [p.distance(other) for p in points])
+        np.testing.assert_array_equal(points.radius(other), [p.radius(other) for p in points])
+        np.testing.assert_array_equal(points.inside((5, 4)), [True, True, False])
+        clipped = points.clip((5, 4))
+        np.testing.assert_array_equal(clipped.x, [0, 3, 0])
+        np.testing.assert_array_equal(clipped.y, [1, 4, 4])
+        index = clipped.index(4)
+        np.testing.assert_array_equal(index, [4, 19, 16])
+        restored = Coordinates.from_index(index, 4)
+        self.assertTrue(np.all(restored == clipped))
+
+
+class TestWorldIndexing(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 16, "world.height": 8, "world.init_count": 10})
+        config.set_seed(1)
+
+    def test_batch(self):
+        world = World("vector", headless=True)
+        points = Coordinates.from_index(np.arange(world._map.size))
+        np.testing.assert_array_equal(world[points], world._map.reshape(-1))
+        self.assertEqual([world[p] for p in points[:5]], world[points[:5]].tolist())
+        outside = Coordinates([-1, 16, 0], [0, 0, 8])
+        np.testing.assert_array_equal(world[outside], [-1, -1, -1])
+        self.assertIsNone(world[outside[0]])
+        # 重复和越界的坐标不影响计数
+        blanks = points[world[points] == BLANK][:3]
+        world[Coordinates.of([*blanks, blanks[0]])] = FOOD
+        world[outside] = FOOD
+        self.assertTrue(np.all(world[blanks] == FOOD))
+        np.testing.assert_array_equal(world.counts, np.bincount(world._map.reshape(-1), minlength=3))
+        self.assertEqual(world.counts[CREATURE], len(world))
@@ -1,6 +1,12 @@
+import pickle
+import random
+from collections import Counter
 from unittest import TestCase
 
+import numpy as np
+
 from biosim import config, Genome
+from biosim._genome import TRAITS, GenomePool, TraitDecoder, pack_genes
 
 
 class TestGenome(TestCase):
@@ -8,6 +14,8 @@ class TestGenome(TestCase):
         self.gene = Genome()
         # 设置随机种子，调整突变概率为100%
         config.set_seed(1)
+        self.addCleanup(setattr, config.gene, "mutation_rate", config.gene.mutation_rate)
+        self.addCleanup(setattr, config.gene, "init_gene_count", config.gene.init_gene_count)
         config.gene.mutation_rate = 1.0
         config.gene.init_gene_count = 8
 
@@ -26,3 +34,67 @@ class TestGenome(TestCase):
         genome_b = Genome()  # 100100011011011101011001
         new_genome = genome_a.recombine(genome_b)
         self.assertEqual(str(new_genome), "001000100110010110110010")
+
+
+class TestGenomePool(TestCase):
+    def setUp(self) -> None:
+        config.set_seed(1)
+        self.pool = GenomePool(24, capacity=4)
+        self.genes = [random.randint(1, 2**24 - 1) for _ in range(10)]
+        self.rows = self.pool.allocate(pack_genes(self.genes, 24))
+
+    def test_allocate(self):
+        # 容量不足时自动扩容，释放的行被复用
+        self.assertEqual([self.pool.get(row) for row in self.rows], self.genes)
+        self.pool.release(self.rows[:3])
+        self.assertEqual(len(self.pool), 7)
+        rows = self.pool.allocate(pack_genes([1, 2], 24))
+        self.assertTrue(set(rows) <= set(self.rows[:3]))
+
+    def test_mutate(self):
+        self.addCleanup(setattr, config.gene, "mutation_rate", config.gene.mutation_rate)
+        config.gene.mutation_rate = 1.0
+        index = self.pool.mutate(self.rows)
+        self.assertEqual(sorted(index), list(range(10)))
+        for row, gene in zip(self.rows, self.genes):
+            self.assertEqual((self.pool.get(row) ^ gene).bit_count(), 1)
+        config.gene.mutation_rate = 0.0
+        self.assertEqual(len(self.pool.mutate()), 0)
+
+    def test_recombine(self):
+        position = np.array([0, 3, 21, 12, 9])
+        children = self.pool.recombine(self.rows[:5], self.rows[5:], position)
+        for child, a, b, p in zip(children, self.genes[:5], self.genes[5:], position):
+            self.assertEqual(self.pool.get(child), (a >> p << p) | (b & (2**p - 1)))
+
+    def test_view(self):
+        genome = Genome(12345, self.pool)
+        self.assertEqual(genome._gene, 12345)
+        self.assertEqual(pickle.loads(pickle.dumps(genome))._gene, 12345)
+        row = genome._row
+        del genome
+        self.assertFalse(self.pool.alive[row])
+
+    def test_traits_cache(self):
+        # 基因池中的突变会使缓存的性状失效
+        genome = Genome(0b101111, self.pool)
+        self.assertEqual(genome.traits, Genome(0b101111, self.pool).traits)
+        traits, version = genome.traits, self.pool.version[genome._row]
+        self.pool.set(genome._row, 0b010111)
+        self.assertNotEqual(self.pool.version[genome._row], version)
+        self.assertIsNot(genome.traits, traits)
+        self.assertEqual(genome.sex, 0)
+
+
+class TestTraitDecoder(TestCase):
+    def test_decode(self):
+        base_num = 22 * config.gene.coden_length  # 分段跨越word边界且最后一段不完整
+        genes = [random.randint(1, 2**base_num - 1) for _ in range(20)]
+        counts = TraitDecoder.get(base_num).decode(pack_genes(genes, base_num))
+        mask = 2**config.gene.coden_length - 1
+        for gene, row in zip(genes, counts):
+            expected = Counter(
+                config.gene.coden_table[gene >> i & mask]
+                for i in range(0, base_num, config.gene.coden_length)
+            )
+            self.assertEqual({t: c for t, c in zip(TRAITS, row) if c}, expected)
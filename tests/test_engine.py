@@ -0,0 +1,58 @@
+import numpy as np
+
+from biosim import World, config
+from tests import ConfigTestCase
+
+
+class TestVectorEngine(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.world.width = config.world.height = 32
+        config.world.init_count = 40
+        config.gene.mutation_rate = 0.01
+
+    def run_world(self, years: int = 30) -> tuple[World, np.ndarray]:
+        config.set_seed(7)
+        world = World("vector", headless=True)
+        for i in range(1, years + 1):
+            world.step(i)
+            # 地图上的生物与引擎中的生物一一对应
+            self.assertEqual((world._map == 2).sum(), len(world))
+            self.assertEqual(len(np.unique(world.engine.cells)), len(world))
+        return world, world.statistics.data
+
+    def test_reproducible(self):
+        world_a, statistics_a = self.run_world()
+        world_b, statistics_b = self.run_world()
+        np.testing.assert_array_equal(statistics_a, statistics_b)
+        np.testing.assert_array_equal(world_a._map, world_b._map)
+
+    def test_statistics(self):
+        world, (summary,) = self.run_world(1)
+        self.assertEqual(summary["year"], 1)
+        self.assertEqual(summary["male"] + summary["female"], summary["population"])
+        self.assertEqual(summary["traits"].sum(), summary["population"] * config.gene.init_gene_count)
+        self.assertEqual(summary["foods"], (world._map == 1).sum())
+
+    def test_object_trajectory(self):
+        # 多个种子平均后，种群数量和食物数量的变化与object引擎一致
+        config.update({"world.width": 64, "world.height": 64, "world.init_count": 150, "world.food_rate": 0.02})
+        trajectories = {}
+        for engine in ("object", "vector"):
+            data = []
+            for seed in range(1, 7):
+                config.set_seed(seed)
+                world = World(engine, headless=True)
+                world.run(60)
+                data.append(world.statistics.data[["population", "foods"]])
+                world.close()
+            data = np.array(data)
+            # 每10年的平均值
+            trajectories[engine] = np.array([data["population"].mean(0), data["foods"].mean(0)]).reshape(2, 6, 10)
+        vector, expected = trajectories["vector"], trajectories["object"]
+        windows = vector.mean(-1) / expected.mean(-1)
+        np.testing.assert_allclose(windows[0], 1, atol=0.2)
+        np.testing.assert_allclose(windows[1], 1, atol=0.25)
+        total = vector.sum((1, 2)) / expected.sum((1, 2))
+        self.assertAlmostEqual(total[0], 1, delta=0.08)
+        self.assertAlmostEqual(total[1], 1, delta=0.15)
@@ -0,0 +1,63 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from biosim import World, config, read_events, read_snapshots
+from biosim._events import BIRTH, DEATH, EAT
+from tests import ConfigTestCase
+
+
+class TestEvents(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 32, "world.height": 32, "world.init_count": 40})
+        config.set_seed(3)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+
+    def check(self, engine: str):
+        world = World(engine, headless=True)
+        world.attach_events(self.path, snapshot_every=10, chunk_size=20)
+        populations = {}
+        for _ in range(30):
+            world.run(1)
+            populations[world.year] = len(world)
+        world.close()
+        self.assertGreater(len(list((self.path / "events").glob("*.npy"))), 1)
+        events = read_events(self.path)
+        self.assertTrue(np.all(np.diff(events["year"]) >= 0))
+        births, deaths = (np.count_nonzero(events["kind"] == kind) for kind in (BIRTH, DEATH))
+        self.assertEqual(config.world.init_count + births - deaths, len(world))
+        self.assertGreater(np.count_nonzero(events["kind"] == EAT), 0)
+        # 按年份范围读取的结果与完整读取后筛选一致
+        part = read_events(self.path, 12, 25, kind=EAT)
+        mask = (events["year"] >= 12) & (events["year"] < 25) & (events["kind"] == EAT)
+        np.testing.assert_array_equal(part, events[mask])
+        snapshots = read_snapshots(self.path)
+        self.assertEqual(sorted(snapshots), [10, 20, 30])
+        for year, snapshot in snapshots.items():
+            self.assertEqual(len(snapshot), populations[year])
+        self.assertEqual(list(read_snapshots(self.path, 15, 30)), [20])
+
+    def test_object(self):
+        self.check("object")
+
+    def test_vector(self):
+        self.check("vector")
+
+    def test_tiled(self):
+        self.check("tiled")
+
+    def test_step_year(self):
+        # 直接调用step(i)时所有引擎都以i作为事件的年份
+        for engine in ("object", "vector"):
+            world = World(engine, headless=True)
+            world.attach_events(self.path / engine, snapshot_every=0)
+            world.step(7)
+            world.close()
+            events = read_events(self.path / engine)
+            self.assertGreater(len(events), 0)
+            self.assertTrue((events["year"] == 7).all())
+            self.assertEqual(world.year, 7)
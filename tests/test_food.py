@@ -0,0 +1,107 @@
+from unittest import TestCase, skipUnless
+
+import numpy as np
+
+from biosim import World, config
+from biosim._food import FoodField
+from biosim._jit import available
+from tests import ConfigTestCase
+
+
+class TestFoodField(TestCase):
+    def setUp(self) -> None:
+        rng = np.random.RandomState(0)
+        self.map = (rng.random_sample((45, 70)) < 0.1).astype(np.int8)
+        self.field = FoodField(self.map.shape, 16)
+        self.field.rebuild(self.map)
+
+    def test_rebuild(self):
+        self.assertEqual(self.field.counts.shape, (3, 5))
+        for by in range(3):
+            for bx in range(5):
+                block = self.map[by * 16 : by * 16 + 16, bx * 16 : bx * 16 + 16]
+                self.assertEqual(self.field.counts[by, bx], (block == 1).sum())
+        np.testing.assert_array_equal(self.field.centers[0], [7, 23, 38])
+        np.testing.assert_array_equal(self.field.centers[1], [7, 23, 39, 55, 66])
+
+    def test_update(self):
+        cells = np.flatnonzero(self.map == 1)[::3]
+        self.map.reshape(-1)[cells] = 0
+        self.field.update(cells, -1)
+        expected = FoodField(self.map.shape, 16)
+        expected.rebuild(self.map)
+        np.testing.assert_array_equal(self.field.padded, expected.padded)
+        np.testing.assert_array_equal(self.field.coarse.padded, expected.coarse.padded)
+
+    def test_direction(self):
+        y, x = np.divmod(np.arange(self.map.size), self.map.shape[1])
+        dx, dy = self.field.directions(x, y)
+        self.assertEqual([self.field.direction(*p) for p in zip(x, y)], list(zip(dx, dy)))
+        # 两层周围都没有食物时不移动
+        self.field.counts[:] = 0
+        self.field.coarse.counts[:] = 0
+        self.assertEqual(self.field.direction(30, 30), (0, 0))
+        self.field.counts[2, 2] = 1
+        self.assertEqual(self.field.direction(30, 30), (1, 1))
+        self.assertEqual(self.field.direction(66, 40), (0, 0))
+
+    def test_coarse(self):
+        # 周围9块都没有食物时朝粗一层中食物最多的一块移动
+        self.assertEqual(self.field.coarse.counts.shape, (1, 2))
+        self.field.counts[:] = 0
+        self.field.coarse.counts[:] = [[0, 1]]
+        self.assertEqual(self.field.direction(5, 38), (1, -1))
+        dx, dy = self.field.directions(np.array([5, 30]), np.array([38, 30]))
+        np.testing.assert_array_equal(dx, [1, 1])
+        np.testing.assert_array_equal(dy, [-1, -1])
+        # 细一层有食物时不查询粗一层
+        self.field.counts[2, 0] = 1
+        self.assertEqual(self.field.direction(5, 38), (1, 0))
+
+
+class TestFoodWorld(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update(
+            {
+                "world.width": 64,
+                "world.height": 64,
+                "world.init_count": 200,
+                "world.food_rate": 0.05,
+                "world.food_field": 16,
+                "gene.mutation_rate": 0.05,
+            }
+        )
+
+    def run_world(self, engine: str, years: int = 20, **overrides) -> World:
+        config.update(overrides)
+        config.set_seed(3)
+        world = World(engine, headless=True)
+        self.addCleanup(world.close)
+        world.run(years)
+        return world
+
+    def assertField(self, world: World):
+        # 增量更新的结果与重新统计一致
+        expected = FoodField(world.food_field.shape, world.food_field.block)
+        expected.rebuild(world._map)
+        np.testing.assert_array_equal(world.food_field.padded, expected.padded)
+
+    def test_incremental(self):
+        for engine, storage in (("object", "dense"), ("vector", "dense"), ("vector", "sparse")):
+            world = self.run_world(engine, **{"world.storage": storage})
+            self.assertGreater(len(world), 0)
+            self.assertField(world)
+
+    def test_disabled(self):
+        config.update({"world.food_field": 0})
+        self.assertIsNone(World("vector", headless=True).food_field)
+
+    @skipUnless(available, "未安装numba")
+    def test_jit(self):
+        expected = self.run_world("object")
+        world = self.run_world("object", **{"world.jit": True})
+        self.assertIsNotNone(world._kernel)
+        np.testing.assert_array_equal(world.statistics.data, expected.statistics.data)
+        np.testing.assert_array_equal(world._map, expected._map)
+        self.assertField(world)
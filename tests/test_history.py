@@ -0,0 +1,98 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from biosim import MapHistory, World, config, read_history
+from biosim.utils import PALETTE, FrameWriter, load_cv2
+from tests import ConfigTestCase
+
+
+class TestHistory(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update(
+            {
+                "world.width": 40,
+                "world.height": 30,
+                "world.init_count": 60,
+                "world.food_rate": 0.1,
+                "ui.width": 160,
+                "ui.height": 120,
+            }
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+
+    def record(self, engine: str, years: int = 30) -> dict[int, np.ndarray]:
+        """运行并记录地图历史，返回每年年末的地图"""
+        config.set_seed(4)
+        world = World(engine, headless=True)
+        world.attach_history(self.path / "history", keyframe_every=8)
+        maps = {0: np.asarray(world._map).copy()}
+        for _ in range(years):
+            world.run(1)
+            maps[world.year] = np.asarray(world._map).copy()
+        world.close()
+        return maps
+
+    def test_random_access(self):
+        for engine, storage in (("vector", "dense"), ("object", "sparse")):
+            config.update({"world.storage": storage})
+            maps = self.record(engine)
+            history = read_history(self.path / "history")
+            np.testing.assert_array_equal(history.years, sorted(maps))
+            # 第一条记录和每8年一个关键帧
+            self.assertTrue(history.index["keyframe"][[0, 8, 16, 24]].all())
+            self.assertLess(history.index["keyframe"].sum(), len(history))
+            for year in (30, 0, 17, 8, 5):
+                np.testing.assert_array_equal(history[year], maps[year])
+            frames = list((year, _map.copy()) for year, _map in history.frames(10, 20))
+            self.assertEqual([year for year, _ in frames], list(range(10, 20)))
+            for year, _map in frames:
+                np.testing.assert_array_equal(_map, maps[year])
+            self.assertNotIn(31, history)
+            with self.assertRaises(KeyError):
+                history[31]
+
+    def test_resume(self):
+        # 重新写入已有的年份时删除这些记录，之后的记录接在前面的记录之后
+        maps = self.record("vector", 20)
+        history = MapHistory(self.path / "history", (30, 40), keyframe_every=8)
+        _map = np.zeros((30, 40), dtype=np.int8)
+        history.record(12, _map)
+        _map[3, 4:9] = 1
+        history.record(13, _map)
+        history.close()
+        history = read_history(self.path / "history")
+        np.testing.assert_array_equal(history.years, np.arange(14))
+        np.testing.assert_array_equal(history[11], maps[11])
+        np.testing.assert_array_equal(history[13], _map)
+        with self.assertRaises(ValueError):
+            MapHistory(self.path / "history", (40, 40))
+
+    def test_replay(self):
+        maps = self.record("vector", 10)
+        history = read_history(self.path / "history")
+        writer = FrameWriter(self.path / "frames", history.shape)
+        self.assertEqual(history.replay(writer, 3, 9), 6)
+        writer.close()
+        files = sorted((self.path / "frames").glob("*.png"))
+        self.assertEqual(len(files), 6)
+        image = load_cv2()[0].imread(str(files[-1]))
+        # 图像下半部分没有文字，与第8年的地图一致
+        expected = PALETTE[np.repeat(np.repeat(maps[8], 4, axis=0), 4, axis=1)]
+        np.testing.assert_array_equal(image[-60:], expected[-60:])
+
+    def test_replay_stopped(self):
+        # 写入进程已退出时回放立即结束，关闭时也不等待
+        self.record("vector", 10)
+        history = read_history(self.path / "history")
+        writer = FrameWriter(self.path / "frames", history.shape)
+        writer.process.terminate()
+        writer.process.join()
+        self.assertEqual(history.replay(writer), 0)
+        # 4个缓冲区写满后不再等待
+        self.assertEqual([writer.draw(history[5], 1, 0, 0) for _ in range(5)], [True] * 4 + [False])
+        writer.close()
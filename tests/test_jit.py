@@ -0,0 +1,55 @@
+import random
+import tempfile
+from unittest import skipUnless
+
+import numpy as np
+
+from biosim import World, config, read_events
+from biosim._jit import available
+from tests import ConfigTestCase
+
+
+class TestJit(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 48, "world.height": 48, "world.init_count": 400, "world.food_rate": 0.3})
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+
+    def run_world(self, jit: bool, name: str) -> tuple[World, tuple]:
+        config.update({"world.jit": jit})
+        config.set_seed(9)
+        world = World("object", headless=True)
+        world.attach_events(f"{self.path}/{name}", snapshot_every=0)
+        world.attach_metrics()
+        world.run(30)
+        world.close()
+        return world, random.getstate()
+
+    @skipUnless(available, "未安装numba")
+    def test_same_as_python(self):
+        (expected, expected_state), (world, state) = self.run_world(False, "python"), self.run_world(True, "jit")
+        self.assertIsNotNone(world._kernel)
+        self.assertIsNone(expected._kernel)
+        np.testing.assert_array_equal(world.statistics.data, expected.statistics.data)
+        np.testing.assert_array_equal(world._map, expected._map)
+        np.testing.assert_array_equal(world._index, expected._index)
+        np.testing.assert_array_equal(world.counts, expected.counts)
+        np.testing.assert_array_equal(world.lineage.parents, expected.lineage.parents)
+        self.assertEqual(world._free, expected._free)
+        self.assertEqual(state, expected_state)
+        columns = lambda w: [(c.slot, c.id, c._loc.x, c._loc.y, c.food, c.life, c._genome._gene) for c in w.creatures]
+        self.assertEqual(columns(world), columns(expected))
+        np.testing.assert_array_equal(read_events(f"{self.path}/jit"), read_events(f"{self.path}/python"))
+        for name in ("scanned", "moves", "births", "deaths", "fights", "mutations"):
+            np.testing.assert_array_equal(world.metrics[name], expected.metrics[name])
+        self.assertGreater(world.metrics["births"].sum(), 0)
+        self.assertGreater(world.metrics["fights"].sum(), 0)
+
+    def test_fallback(self):
+        config.update({"world.jit": True, "world.storage": "sparse"})
+        world = World("object", headless=True)
+        self.assertIsNone(world._kernel)
+        world.run(3)
+        self.assertGreater(len(world), 0)
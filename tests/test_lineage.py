@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+import numpy as np
+
+from biosim import Lineage, World, WorldBatch, config
+from tests import ConfigTestCase
+
+
+class TestLineage(TestCase):
+    def setUp(self) -> None:
+        # 0 1 2 3为初始生物
+        # 4 = 0 x 1, 5 = 2 x 3, 6 = 4 x 5, 7 = 1 x 4
+        self.lineage = Lineage(capacity=2)
+        self.lineage.add(0, np.full(4, -1))
+        self.lineage.add(1, [0, 2], [1, 3])
+        self.lineage.add(2, [4, 1], [5, 4])
+
+    def test_query(self):
+        lineage = self.lineage
+        self.assertEqual(len(lineage), 8)
+        np.testing.assert_array_equal(lineage.birth, [0, 0, 0, 0, 1, 1, 2, 2])
+        np.testing.assert_array_equal(lineage.ancestors(6), [0, 1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(lineage.ancestors(0), [])
+        np.testing.assert_array_equal(lineage.descendants(1), [4, 6, 7])
+        np.testing.assert_array_equal(lineage.descendants(5), [6])
+        self.assertEqual(lineage.common_ancestor(6, 7), 4)
+        self.assertEqual(lineage.common_ancestor(4, 7), 4)
+        self.assertEqual(lineage.common_ancestor(2, 3), -1)
+        np.testing.assert_array_equal(lineage.founders([6, 7]), [0, 1])
+        founders, counts = lineage.surviving([5, 6, 7])
+        np.testing.assert_array_equal(founders, [0, 1, 2])
+        np.testing.assert_array_equal(counts, [1, 1, 1])
+        founders, _ = lineage.surviving([5, 6, 7], line=1)
+        np.testing.assert_array_equal(founders, [1, 3])
+
+
+class TestWorldLineage(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 32, "world.height": 32, "world.init_count": 40})
+
+    def test_world(self):
+        for engine in ("object", "vector"):
+            config.set_seed(2)
+            world = World(engine, headless=True)
+            world.run(30)
+            lineage, ids = world.lineage, world.snapshot()["id"]
+            self.assertGreater(len(lineage), config.world.init_count)
+            self.assertEqual(len(np.unique(ids)), len(world))
+            # 子代编号大于双亲，出生年份不早于双亲
+            children = np.arange(config.world.init_count, len(lineage))
+            parents = lineage.parents[children]
+            self.assertTrue(np.all((parents >= 0) & (parents < children[:, None])))
+            self.assertTrue(np.all(lineage.birth[parents] <= lineage.birth[children, None]))
+            founders, counts = lineage.surviving(ids)
+            self.assertTrue(np.all(founders < config.world.init_count))
+            self.assertEqual(counts.sum(), len(world))
+
+    def test_batch(self):
+        batch = WorldBatch([1, 2])
+        batch.run(20)
+        for b, seed in enumerate([1, 2]):
+            config.set_seed(seed)
+            world = World("vector", headless=True)
+            world.run(20)
+            np.testing.assert_array_equal(batch.lineages[b].parents, world.lineage.parents)
+            np.testing.assert_array_equal(batch.extract(b).engine.ids, world.engine.ids)
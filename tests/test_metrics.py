@@ -0,0 +1,38 @@
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from biosim import World, config
+from biosim._metrics import COUNTERS, PHASES
+from tests import ConfigTestCase
+
+
+class TestMetrics(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 32, "world.height": 32, "world.init_count": 40, "gene.mutation_rate": 0.05})
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "metrics.jsonl"
+
+    def test_metrics(self):
+        for engine in ("object", "vector", "tiled"):
+            config.set_seed(4)
+            world = World(engine, headless=True)
+            self.assertIsNone(world.metrics)
+            metrics = world.attach_metrics(self.path)
+            world.run(20)
+            world.close()
+            np.testing.assert_array_equal(metrics["year"], np.arange(1, 21))
+            self.assertEqual(config.world.init_count + metrics["births"].sum() - metrics["deaths"].sum(), len(world))
+            self.assertEqual(metrics["births"].sum(), len(world.lineage) - config.world.init_count)
+            for name in ("scanned", "moves", "mutations"):
+                self.assertGreater(metrics[name].sum(), 0)
+            self.assertTrue(all(np.all(metrics[phase] >= 0) for phase in PHASES))
+            self.assertGreater(metrics["scan"].sum(), 0)
+            lines = [json.loads(line) for line in self.path.read_text(encoding="utf-8").splitlines()[-20:]]
+            self.assertEqual([line["year"] for line in lines], list(range(1, 21)))
+            self.assertEqual([line["births"] for line in lines], metrics["births"].tolist())
+            self.assertEqual(set(lines[0]), {"year", *PHASES, *COUNTERS})
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+import numpy as np
+
+from biosim._coordinate import Coordinate
+from biosim._neighborhood import offset_table, scan
+from biosim.utils import spiral_scan
+
+
+class TestNeighborhood(TestCase):
+    def setUp(self) -> None:
+        self.map = np.random.default_rng(0).integers(0, 3, (12, 9), dtype=np.int8)
+
+    def spiral(self, center: Coordinate, radius: int) -> list[tuple[int, int, int, int]]:
+        """逐格遍历spiral_scan得到的邻域，作为对照"""
+        result, location = [], center
+        for r, direction in spiral_scan(radius):
+            location += direction
+            if 0 <= location.x < self.map.shape[1] and 0 <= location.y < self.map.shape[0]:
+                result.append((location.x, location.y, r, self.map[location.y, location.x]))
+        return result
+
+    def test_offset_table(self):
+        dx, dy, radius = offset_table(4)
+        self.assertEqual(len(dx), 4 * 2 * sum(range(4 + 1)))
+        # 小半径的表是大半径的表的前缀
+        small = offset_table(2)
+        for a, b in zip(small, (dx, dy, radius)):
+            np.testing.assert_array_equal(a, b[: len(a)])
+
+    def test_scan(self):
+        # 中心、边缘和角落
+        for center in (Coordinate(4, 6), Coordinate(0, 3), Coordinate(8, 11)):
+            near = scan(self.map, center, 3)
+            self.assertEqual(list(zip(*(t.tolist() for t in near))), self.spiral(center, 3))
+
+    def test_by_ring(self):
+        near = scan(self.map, Coordinate(4, 6), 3)
+        blanks = near.blanks()
+        rings = near.by_ring(blanks)
+        np.testing.assert_array_equal(np.concatenate(list(rings.values())), blanks)
+        for radius, index in rings.items():
+            np.testing.assert_array_equal(index, near.blanks(radius))
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+from pathlib import Path
+from unittest import TestCase
+
+
+class TestStartup(TestCase):
+    def test_lazy_imports(self):
+        # 可视化和日志依赖只在使用时导入
+        code = "import sys, biosim; print(*(m for m in ('cv2', 'matplotlib', 'loguru', 'tqdm') if m in sys.modules))"
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=Path(__file__).parents[1], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_logger(self):
+        from biosim._log import log, load_logger
+
+        self.assertIs(log.debug.__self__, load_logger())
+
+    def test_lazy_config(self):
+        # 导入时不读取配置文件，第一次访问时读取
+        code = "from biosim import _config; a = _config.get_config.cache_info().currsize; _config.config.seed; "
+        code += "print(a, _config.get_config.cache_info().currsize)"
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=Path(__file__).parents[1], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.split(), ["0", "1"])
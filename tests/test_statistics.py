@@ -0,0 +1,23 @@
+from unittest import TestCase
+
+import numpy as np
+
+from biosim._genome import TRAITS
+from biosim._statistics import Statistics
+
+
+class TestStatistics(TestCase):
+    def test_record(self):
+        statistics = Statistics(capacity=2)
+        traits = np.ones((3, len(TRAITS)), dtype=np.int32)
+        for year in range(1, 6):
+            summary = statistics.record(
+                year, 3, traits, np.array([1, 0, 1]), np.array([5, 15, 79]), np.full(3, 0.5)
+            )
+        # 超出容量时自动扩容
+        self.assertEqual(len(statistics), 5)
+        self.assertEqual(statistics["year"].tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual((summary["population"], summary["foods"], summary["food"]), (3, 3, 1.5))
+        self.assertEqual((summary["male"], summary["female"]), (2, 1))
+        self.assertEqual(summary["traits"].tolist(), [3] * len(TRAITS))
+        self.assertEqual(summary["ages"].sum(), 3)
@@ -0,0 +1,89 @@
+import random
+from unittest import TestCase, skipUnless
+
+import numpy as np
+
+from biosim import World, WorldBatch, config
+from biosim._genome import GenomePool
+from biosim._jit import available
+from biosim._streams import PURPOSES, draw, generator
+from tests import ConfigTestCase
+
+
+class TestStreams(TestCase):
+    def test_draw(self):
+        ids = np.arange(1000)
+        draws = draw(7, 3, ids)
+        self.assertEqual(draws.shape, (1000, len(PURPOSES)))
+        self.assertTrue(((0 <= draws) & (draws < 1)).all())
+        self.assertAlmostEqual(draws.mean(), 0.5, delta=0.02)
+        # 每个生物的随机数与其他生物和排列顺序无关
+        order = np.random.RandomState(0).permutation(ids)
+        np.testing.assert_array_equal(draw(7, 3, order), draws[order])
+        np.testing.assert_array_equal(draw(7, 3, ids[100:200]), draws[100:200])
+        np.testing.assert_array_equal(draw(np.full(1000, 7), 3, ids), draws)
+        for other in (draw(8, 3, ids), draw(7, 4, ids)):
+            self.assertTrue((other != draws).all())
+        self.assertEqual(len(np.unique(draws)), draws.size)
+
+    def test_generator(self):
+        np.testing.assert_array_equal(generator(7, 3).random_sample(8), generator(7, 3).random_sample(8))
+        self.assertFalse(np.array_equal(generator(7, 3).random_sample(8), generator(7, 4).random_sample(8)))
+
+    def test_mutate(self):
+        self.addCleanup(setattr, config.gene, "mutation_rate", config.gene.mutation_rate)
+        config.gene.mutation_rate = 0.5
+        pool = GenomePool(24, capacity=4)
+        rows = pool.allocate(np.zeros((3, 1), dtype=np.uint64))
+        draws = np.array([[0.0, 0.5], [0.99, 0.1], [0.0, 0.99]])
+        np.testing.assert_array_equal(pool.mutate(rows, draws=draws), [0, 2])
+        np.testing.assert_array_equal(pool.words[rows, 0], [1 << 12, 0, 1 << 23])
+
+
+class TestKeyedWorld(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update(
+            {
+                "world.width": 40,
+                "world.height": 40,
+                "world.init_count": 150,
+                "world.food_rate": 0.2,
+                "world.random": "keyed",
+                "gene.mutation_rate": 0.05,
+            }
+        )
+
+    def run_world(self, engine: str, years: int = 20, **overrides) -> World:
+        config.update(overrides)
+        config.set_seed(5)
+        world = World(engine, headless=True)
+        self.addCleanup(world.close)
+        # 初始化后打乱全局随机数，keyed随机数不受影响
+        random.random()
+        np.random.random()
+        world.run(years)
+        return world
+
+    def assertSameWorld(self, world: World, expected: World):
+        np.testing.assert_array_equal(world.statistics.data, expected.statistics.data)
+        np.testing.assert_array_equal(world._map, expected._map)
+        np.testing.assert_array_equal(world.lineage.parents, expected.lineage.parents)
+
+    def test_partition(self):
+        # 结果与分块方式和批量模拟中的位置无关
+        expected = self.run_world("vector")
+        self.assertGreater(expected.statistics["population"][-1], 0)
+        for tiles in ((2, 2), (1, 3)):
+            self.assertSameWorld(self.run_world("tiled", **{"world.tiles": tiles, "world.workers": 2}), expected)
+        config.set_seed(5)
+        batch = WorldBatch([2, 5])
+        batch.run(20)
+        self.assertSameWorld(batch.extract(1), expected)
+
+    @skipUnless(available, "未安装numba")
+    def test_object(self):
+        expected = self.run_world("object")
+        world = self.run_world("object", **{"world.jit": True})
+        self.assertIsNotNone(world._kernel)
+        self.assertSameWorld(world, expected)
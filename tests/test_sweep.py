@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from biosim import config
+from biosim.sweep import expand, run, sweep
+from tests import ConfigTestCase
+
+
+def crash(task: tuple) -> dict:
+    """overrides中有crash时直接退出工作进程"""
+    if task[2].get("crash"):
+        os._exit(1)
+    return run(task)
+
+
+class TestSweep(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 24, "world.height": 24, "world.init_count": 20})
+
+    def test_update(self):
+        config.update({"world.food_rate": 0.2, "creature": {"life": 60}})
+        self.assertEqual(config.world.food_rate, 0.2)
+        self.assertEqual(config.creature.life, 60)
+        self.assertEqual(config.creature.max_food, 3)
+        with self.assertRaises(KeyError):
+            config.update({"world.food": 0.2})
+
+    def test_expand(self):
+        runs = expand({"world.food_rate": [0.01, 0.02], "creature.life": [60, 80, 100]}, seeds=[1, 2])
+        self.assertEqual(len(runs), 12)
+        self.assertEqual(runs[0], {"world.food_rate": 0.01, "creature.life": 60, "seed": 1})
+
+    def test_sweep(self):
+        # 初始生物数量超过格子数，配置校验失败，只影响这一组
+        runs = expand({"world.food_rate": [0.05, 0.1]}, seeds=[1, 2]) + [{"world.init_count": 10**6}]
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "sweep.jsonl"
+            records = list(sweep(runs, 5, output, processes=2))
+            lines = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(sorted(r["run"] for r in lines), list(range(5)))
+        records = {r["run"]: r for r in records}
+        self.assertIn("error", records[4])
+        for i in range(4):
+            self.assertEqual(records[i]["statistics"]["year"], [1, 2, 3, 4, 5])
+            self.assertEqual(records[i]["overrides"], runs[i])
+        # 相同配置和种子的结果一致
+        repeat = {r["run"]: r for r in sweep(runs[:1], 5, processes=1)}
+        self.assertEqual(repeat[0]["statistics"], records[0]["statistics"])
+        # 工作进程中的修改不影响主进程
+        self.assertEqual(config.world.width, 24)
+
+    def test_crash(self):
+        # 工作进程退出时只有这一组失败，其他模拟正常完成
+        runs = expand({"world.food_rate": [0.05, 0.1]}, seeds=[1, 2])
+        runs.insert(1, {"crash": True})
+        with mock.patch("biosim.sweep.run", crash):
+            records = {r["run"]: r for r in sweep(runs, 3, processes=2)}
+        self.assertEqual(sorted(records), list(range(5)))
+        self.assertIn("退出", records[1]["error"])
+        for i in (0, 2, 3, 4):
+            self.assertNotIn("error", records[i])
+            self.assertEqual(records[i]["statistics"]["year"], [1, 2, 3])
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import numpy as np
+
+from biosim import World, config, _tiled
+from biosim._tiled import HALO, TiledEngine
+from tests import ConfigTestCase
+
+
+class TestTiledEngine(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 48, "world.height": 40, "world.init_count": 120, "gene.mutation_rate": 0.01})
+
+    def run_world(self, tiles: tuple[int, int], workers: int, years: int = 25, engine: str = "tiled") -> World:
+        config.set_seed(3)
+        config.update({"world.tiles": tiles, "world.workers": workers})
+        world = World(engine, headless=True)
+        self.addCleanup(world.close)
+        for _ in range(years):
+            world.run(1)
+            self.assertEqual((world._map == 2).sum(), len(world))
+            self.assertEqual(len(np.unique(world.engine.cells)), len(world))
+        return world
+
+    def test_handoff(self):
+        # 每块只保存位于块内的生物，移出的生物交给所到的块
+        world = self.run_world((3, 4), 2, years=15)
+        engine = world.engine
+        self.assertIsInstance(engine, TiledEngine)
+        self.assertIs(world._map, engine._map)
+        parts = engine._call("columns", {t: () for t in range(12)})
+        for t, (top, bottom, left, right) in enumerate(engine._bounds):
+            x, y = parts[t]["x"], parts[t]["y"]
+            self.assertTrue(((top <= y) & (y < bottom) & (left <= x) & (x < right)).all())
+            self.assertTrue((np.diff(parts[t]["ids"]) > 0).all())
+        self.assertEqual(sum(len(part["ids"]) for part in parts.values()), len(world))
+        np.testing.assert_array_equal(engine.ids, np.sort(np.concatenate([part["ids"] for part in parts.values()])))
+
+    def test_vector(self):
+        # 使用keyed随机数时与VectorEngine一致，块比晕区窄时交互对象和目标可以跨越多块
+        config.update({"world.random": "keyed"})
+        expected = self.run_world((1, 1), 1, engine="vector")
+        world = self.run_world((4, 6), 3)
+        self.assertLess(world._map.shape[1] // 6, HALO)
+        np.testing.assert_array_equal(world.statistics.data, expected.statistics.data)
+        np.testing.assert_array_equal(world._map, expected._map)
+        np.testing.assert_array_equal(world.lineage.parents, expected.lineage.parents)
+        np.testing.assert_array_equal(world.snapshot()["food"], expected.snapshot()["food"])
+
+    def test_reproducible(self):
+        # 相同种子和分块的结果与进程数无关
+        a = self.run_world((2, 3), 1)
+        b = self.run_world((2, 3), 3)
+        np.testing.assert_array_equal(a.statistics.data, b.statistics.data)
+        np.testing.assert_array_equal(a._map, b._map)
+
+    def test_outbox(self):
+        # 发件区不够大时重新创建，结果不变
+        expected = self.run_world((2, 3), 1, years=10)
+        with patch.object(_tiled, "OUTBOX", 64):
+            world = self.run_world((2, 3), 3, years=10)
+        np.testing.assert_array_equal(world.statistics.data, expected.statistics.data)
+        np.testing.assert_array_equal(world._map, expected._map)
+
+    def test_exit(self):
+        # 工作进程意外退出时报错，而不是在屏障处等待
+        world = self.run_world((2, 2), 2, years=2)
+        process = world.engine._processes[0]
+        process.kill()
+        process.join()
+        with self.assertRaises(RuntimeError):
+            world.run(1)
+
+    def test_close(self):
+        # 关闭后地图复制回普通数组
+        world = self.run_world((2, 2), 2, years=3)
+        expected = world._map.copy()
+        self.assertIsNotNone(world._map.base)
+        world.close()
+        self.assertIsNone(world._map.base)
+        np.testing.assert_array_equal(world._map, expected)
+
+    def test_food_field(self):
+        config.update({"world.food_field": 16})
+        with self.assertRaises(ValueError):
+            World("tiled", headless=True)
@@ -1,7 +1,13 @@
+import tempfile
+from pathlib import Path
 from unittest import TestCase
 
+import numpy as np
+
+from biosim import World, config
 from biosim._coordinate import Coordinate
-from biosim.utils import spiral_scan
+from biosim.utils import PALETTE, FrameRing, load_cv2, spiral_scan
+from tests import ConfigTestCase
 
 
 class TestUtils(TestCase):
@@ -32,3 +38,51 @@ class TestUtils(TestCase):
         self.assertEqual(len(coordinates), 4 * 2 * sum(range(radiums + 1)))
         self.assertEqual(len(targets), len(coordinates))
         self.assertEqual(coordinates, targets)
+
+
+class TestFrameRing(TestCase):
+    def test_put(self):
+        ring = FrameRing((3, 4), slots=2)
+        self.addCleanup(ring.close)
+        frames = [np.full((3, 4), i, dtype=np.int8) for i in range(3)]
+        self.assertEqual(ring.put(frames[0]), 0)
+        self.assertEqual(ring.put(frames[1]), 1)
+        # 缓冲区都未释放时丢弃新的帧
+        self.assertIsNone(ring.put(frames[2]))
+        ring.release(0)
+        self.assertEqual(ring.put(frames[2]), 0)
+        np.testing.assert_array_equal(ring.frames[0], frames[2])
+        np.testing.assert_array_equal(ring.frames[1], frames[1])
+        # 等待空闲缓冲区时读取端已退出，放弃等待
+        self.assertIsNone(ring.put(frames[0], block=True, alive=lambda: False))
+
+
+class TestFrameWriter(ConfigTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        config.update({"world.width": 32, "world.height": 32, "world.init_count": 40, "ui.width": 64, "ui.height": 128})
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+
+    def test_images(self):
+        world = World("vector", headless=True)
+        world.attach_writer(self.path / "frames", every=3)
+        world.run(10)
+        world.close()
+        files = sorted((self.path / "frames").glob("*.png"))
+        self.assertEqual(len(files), 4)
+        image = load_cv2()[0].imread(str(files[-1]))
+        self.assertEqual(image.shape, (128, 64, 3))
+        # 文字以外的像素都是调色板中的颜色
+        colors = np.unique(image[-64:].reshape(-1, 3), axis=0)
+        self.assertTrue(all((color == PALETTE).all(axis=1).any() for color in colors))
+
+    def test_video(self):
+        world = World("vector", headless=True)
+        world.attach_writer(self.path / "world.avi", fps=10, fourcc="MJPG")
+        world.run(5)
+        world.close()
+        capture = load_cv2()[0].VideoCapture(str(self.path / "world.avi"))
+        self.addCleanup(capture.release)
+        self.assertEqual(int(capture.get(7)), 5)
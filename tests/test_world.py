@@ -0,0 +1,87 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+import numpy as np
+
+from biosim import Coordinate, World, config
+from biosim._world import food_rate, place_food
+
+
+class TestWorld(TestCase):
+    def test_headless(self):
+        # 无界面模式不创建子进程，也不导入cv2和matplotlib
+        code = (
+            "import sys, multiprocessing\n"
+            "from biosim import World\n"
+            "for engine in ('object', 'vector'):\n"
+            "    world = World(engine, headless=True)\n"
+            "    assert world.run(3) == 3 and world.drawer is None and world.recorder is None\n"
+            "print(multiprocessing.active_children(), 'cv2' in sys.modules, 'matplotlib' in sys.modules)\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.split(), ["[]", "False", "False"])
+
+    def test_index(self):
+        backup = config.world.model_copy()
+        self.addCleanup(setattr, config, "world", backup)
+        config.world.width = config.world.height = 32
+        config.world.init_count = 60
+        world = World("object", headless=True)
+        for _ in range(20):
+            world.run(1)
+            creatures = world.creatures
+            # 槽位网格与生物位置一一对应，地图上的生物数量一致
+            self.assertEqual(len(creatures), len(world))
+            self.assertEqual((world._index >= 0).sum(), len(world))
+            self.assertEqual((world._map == 2).sum(), len(world))
+            for creature in creatures:
+                self.assertIs(world.creature_at(creature._loc), creature)
+        np.testing.assert_array_equal(world._index >= 0, world._map == 2)
+        # 向量化引擎没有Creature对象，不能返回空列表或None
+        world = World("vector", headless=True)
+        world.run(2)
+        with self.assertRaises(RuntimeError):
+            world.creatures
+        with self.assertRaises(RuntimeError):
+            world.creature_at(Coordinate(int(world.engine.x[0]), int(world.engine.y[0])))
+
+    def test_counts(self):
+        backup = config.world.model_copy()
+        self.addCleanup(setattr, config, "world", backup)
+        config.world = config.world.model_copy(
+            update={"width": 32, "height": 32, "init_count": 60, "food_refresh_year": 4, "food_refresh_spread": 2}
+        )
+        for engine in ("object", "vector"):
+            world = World(engine, headless=True)
+            for _ in range(12):
+                world.run(1)
+                # 增量维护的格子数量与地图一致
+                np.testing.assert_array_equal(world.counts, np.bincount(world._map.reshape(-1), minlength=3))
+                self.assertEqual(world.statistics["foods"][-1], world.counts[1])
+
+    def test_place_food(self):
+        rng = np.random.RandomState(0)
+        # 空地较多时使用拒绝采样，较少时从所有空地中抽取
+        for fill in (0.1, 0.9):
+            _map = (rng.random_sample((64, 64)) < fill).astype(np.int8) * 2
+            before = _map.copy()
+            blanks = int((_map == 0).sum())
+            placed = place_food(_map, blanks, 0.3, rng)
+            self.assertEqual((_map == 1).sum(), placed)
+            self.assertTrue((before[_map == 1] == 0).all())
+            self.assertTrue((_map[_map != 1] == before[_map != 1]).all())
+            self.assertAlmostEqual(placed / blanks, 0.3, delta=0.05)
+
+    def test_food_rate(self):
+        backup = config.world.model_copy()
+        self.addCleanup(setattr, config, "world", backup)
+        config.world = config.world.model_copy(
+            update={"food_rate": 0.19, "food_refresh_year": 5, "food_refresh_spread": 2}
+        )
+        rates = [food_rate(year) for year in range(5, 15)]
+        self.assertEqual([rate > 0 for rate in rates], [True, True, False, False, False] * 2)
+        # 分摊后的累计概率不变
+        self.assertAlmostEqual(1 - (1 - rates[0]) ** 2, 0.19)